@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/3.1/ref/settings/
 """
 
+from importlib.util import find_spec
 from pathlib import Path
 import os
 
@@ -38,6 +39,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'rest_framework.authtoken',
     'core',
@@ -46,6 +48,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.ServerTimingMiddleware',
+    'core.compression.CompressionMiddleware',
+    'core.routing.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -57,6 +62,20 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = 'app.urls'
 
+# Served over ASGI (app.asgi), requests resolve against ASYNC_URLCONF, in
+# which the read-heavy endpoints are async views running their ORM work on
+# a pool of ASYNC_ORM_WORKERS threads. That bounds the database connections
+# and threads a worker needs however many clients it keeps connected.
+ASYNC_URLCONF = 'app.urls_async'
+ASYNC_ORM_WORKERS = int(os.environ.get('ASYNC_ORM_WORKERS', 8))
+# Streaming bodies such as exports run on their own ASYNC_STREAM_WORKERS
+# threads, and are abandoned when a client takes more than
+# ASYNC_STREAM_SEND_TIMEOUT seconds to accept a chunk.
+ASYNC_STREAM_WORKERS = int(os.environ.get('ASYNC_STREAM_WORKERS', 4))
+ASYNC_STREAM_SEND_TIMEOUT = float(
+    os.environ.get('ASYNC_STREAM_SEND_TIMEOUT', 30)
+)
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
@@ -86,9 +105,46 @@ DATABASES = {
         'NAME': os.environ.get('DB_NAME'),
         'USER': os.environ.get('DB_USER'),
         'PASSWORD': os.environ.get('DB_PASS'),
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 0)),
     }
 }
 
+# Read replicas: every host in DB_REPLICA_HOSTS (comma separated) becomes
+# a database alias replica1, replica2, ... with the primary's credentials.
+# Safe requests read from a healthy replica, unless the same client wrote
+# in the last DB_STICKY_SECONDS. Replicas are probed at most once every
+# DB_REPLICA_CHECK_INTERVAL seconds and dropped while unreachable or more
+# than DB_REPLICA_MAX_LAG seconds behind. A probe of an unreachable replica
+# gives up after DB_REPLICA_CONNECT_TIMEOUT seconds.
+DB_REPLICA_CONNECT_TIMEOUT = int(
+    os.environ.get('DB_REPLICA_CONNECT_TIMEOUT', 2)
+)
+DATABASES.update(
+    (f'replica{index}', dict(
+        DATABASES['default'], HOST=host, TEST={'MIRROR': 'default'},
+        OPTIONS={'connect_timeout': DB_REPLICA_CONNECT_TIMEOUT},
+    ))
+    for index, host in enumerate(
+        filter(None, os.environ.get('DB_REPLICA_HOSTS', '').split(',')), 1
+    )
+)
+DB_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+DATABASE_ROUTERS = ['core.routing.ReplicaRouter']
+# Always read from the primary. A token issued by a login is used on the
+# very next request, before a lagging replica may have it.
+DB_PRIMARY_MODELS = ['authtoken.Token', 'core.User']
+DB_STICKY_SECONDS = int(os.environ.get('DB_STICKY_SECONDS', 5))
+DB_STICKY_CACHE_ALIAS = 'default'
+DB_REPLICA_CHECK_INTERVAL = int(
+    os.environ.get('DB_REPLICA_CHECK_INTERVAL', 10)
+)
+DB_REPLICA_MAX_LAG = float(os.environ.get('DB_REPLICA_MAX_LAG', 5))
+
+# Open and validate the database connections while the app loads (and on
+# every ASGI ORM thread) so the first requests do not pay connect latency.
+# Only useful with DB_CONN_MAX_AGE set, which keeps connections open.
+DB_WARM_UP = bool(int(os.environ.get('DB_WARM_UP', 0)))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.1/ref/settings/#auth-password-validators
@@ -108,6 +164,28 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Passwords are hashed with PBKDF2 at PASSWORD_HASH_ITERATIONS; hashes made
+# with another count or hasher are upgraded on the user's next login.
+PASSWORD_HASHERS = [
+    'core.hashers.TunablePBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+]
+PASSWORD_HASH_ITERATIONS = int(
+    os.environ.get('PASSWORD_HASH_ITERATIONS', 216000)
+)
+
+# Hashing and verifying passwords runs on a bounded thread pool so a burst
+# of logins or signups cannot occupy every request thread. Requests beyond
+# workers + queue size get a 503 with Retry-After. Set the worker count to
+# 0 to hash on the request thread.
+PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 4))
+PASSWORD_HASH_QUEUE_SIZE = int(
+    os.environ.get('PASSWORD_HASH_QUEUE_SIZE', 16)
+)
+PASSWORD_HASH_RETRY_AFTER = 2
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/3.1/topics/i18n/
@@ -133,5 +211,145 @@ MEDIA_ROOT = 'vol/web/media'
 STATIC_ROOT = 'vol/web/static'
 AUTH_USER_MODEL = 'core.User'
 
+# JSON is encoded and parsed with orjson. With the optional msgpack package
+# installed, clients may also send and ask for application/msgpack.
+REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': [
+        'core.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'core.renderers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+}
+if find_spec('msgpack'):
+    REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'].append(
+        'core.renderers.MessagePackRenderer'
+    )
+    REST_FRAMEWORK['DEFAULT_PARSER_CLASSES'].append(
+        'core.renderers.MessagePackParser'
+    )
+
+# Keyset pagination for the recipe, tag and ingredient list endpoints.
+# Clients may ask for a smaller or larger page with ?page_size= but never
+# more than RECIPE_MAX_PAGE_SIZE rows.
+RECIPE_PAGE_SIZE = int(os.environ.get('RECIPE_PAGE_SIZE', 100))
+RECIPE_MAX_PAGE_SIZE = int(os.environ.get('RECIPE_MAX_PAGE_SIZE', 1000))
+
+# Uploaded recipe images are decoded, verified and resized on a bounded
+# thread pool. Uploads beyond workers + queue size get a 503. Set the
+# worker count to 0 to process images on the request thread.
+RECIPE_IMAGE_WORKERS = int(os.environ.get('RECIPE_IMAGE_WORKERS', 2))
+RECIPE_IMAGE_QUEUE_SIZE = int(os.environ.get('RECIPE_IMAGE_QUEUE_SIZE', 32))
+RECIPE_IMAGE_RETRY_AFTER = 5
+# Uploads pending for longer are picked up by `manage.py requeue_images`
+RECIPE_IMAGE_STALE_AFTER = int(
+    os.environ.get('RECIPE_IMAGE_STALE_AFTER', 600)
+)
+RECIPE_IMAGE_RENDITIONS = {
+    'thumbnail': (200, 200),
+    'medium': (800, 800),
+}
+# 'uuid' gives every upload a fresh file name. 'content' stores images
+# under their sha256 so identical uploads share one reference counted file.
+RECIPE_IMAGE_STORAGE = os.environ.get('RECIPE_IMAGE_STORAGE', 'uuid')
+
+# Text search configuration used for the recipe ?q= search
+RECIPE_SEARCH_CONFIG = 'english'
+
+# Most matches returned by the tag and ingredient ?prefix= autocomplete
+RECIPE_AUTOCOMPLETE_LIMIT = 10
+
+# Largest number of items accepted by /api/recipe/recipe/bulk/
+RECIPE_BULK_MAX_BATCH = int(os.environ.get('RECIPE_BULK_MAX_BATCH', 500))
+
+# Recipes read per server-side cursor fetch by the streaming export, and
+# per batch of tag and ingredient name lookups
+RECIPE_EXPORT_CHUNK_SIZE = int(
+    os.environ.get('RECIPE_EXPORT_CHUNK_SIZE', 500)
+)
+
+# Token -> user lookups are cached per process for TOKEN_CACHE_TTL seconds.
+# Set TOKEN_CACHE_ALIAS to a shared cache (e.g. memcached or redis) so all
+# workers reuse each other's lookups.
+TOKEN_CACHE_SIZE = int(os.environ.get('TOKEN_CACHE_SIZE', 10000))
+TOKEN_CACHE_TTL = int(os.environ.get('TOKEN_CACHE_TTL', 30))
+TOKEN_CACHE_SHARED_TTL = int(os.environ.get('TOKEN_CACHE_SHARED_TTL', 300))
+TOKEN_CACHE_ALIAS = os.environ.get('TOKEN_CACHE_ALIAS') or None
+
+# Every response carries a Server-Timing header with its query count and
+# db/serializer/view/render times, and every request logs the same as one
+# JSON line on the core.timing logger: at INFO, or at WARNING when a view
+# runs more queries than its query_budgets allow.
+SERVER_TIMING_HEADER = True
+
+# Request, database and cache metrics are exposed at /metrics for
+# Prometheus. To aggregate several worker processes, point the
+# prometheus_multiproc_dir environment variable at an empty directory
+# shared by the workers and wiped before they start.
+METRICS_ENABLED = True
+# Only these addresses or networks may scrape /metrics, plus anyone sending
+# `Authorization: Bearer <METRICS_TOKEN>` when a token is set. Behind a
+# reverse proxy REMOTE_ADDR is the proxy's, so prefer the token there.
+METRICS_ALLOWED_IPS = [
+    network.strip() for network in os.environ.get(
+        'METRICS_ALLOWED_IPS', '127.0.0.1,::1'
+    ).split(',') if network.strip()
+]
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'core.timing': {
+            'handlers': ['console'],
+            'level': os.environ.get('TIMING_LOG_LEVEL', 'WARNING'),
+            'propagate': False,
+        },
+    },
+}
+
+# Responses of at least COMPRESS_MIN_SIZE bytes and one of these types are
+# compressed with brotli when the brotli package is installed and the
+# client accepts it, otherwise with gzip. Media under MEDIA_URL never is.
+# Cached list responses keep their compressed bodies, so hits do not pay
+# for compression again.
+COMPRESS_MIN_SIZE = int(os.environ.get('COMPRESS_MIN_SIZE', 1024))
+COMPRESS_CONTENT_TYPES = (
+    'application/json',
+    'application/x-ndjson',
+    'application/javascript',
+    'text/csv',
+    'text/css',
+    'text/html',
+    'text/plain',
+    'image/svg+xml',
+)
+COMPRESS_GZIP_LEVEL = 6
+COMPRESS_BROTLI_QUALITY = 4
+
+# Cache
+# https://docs.djangoproject.com/en/3.1/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+# List responses of the recipe API are cached per user under a version
+# number that every write to the user's recipes, tags or ingredients bumps.
+# Set the timeout to 0 to disable the cache.
+RECIPE_CACHE_ALIAS = 'default'
+RECIPE_RESPONSE_CACHE_TIMEOUT = int(
+    os.environ.get('RECIPE_RESPONSE_CACHE_TIMEOUT', 300)
+)
+
 #docker-compose run --rm app sh -c "python manage.py test"ker-compose run app sh -c "python manage.py makemigrations core"
 #docker-compose run --rm app sh -c "python manage.py test"
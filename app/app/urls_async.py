@@ -0,0 +1,18 @@
+"""app URL Configuration for ASGI
+
+Same routes as app.urls, with the read-heavy ones swapped for the async
+views from each app's `async_urlpatterns`.
+"""
+from django.urls import path,include
+from django.conf.urls.static import static
+from django.conf import settings
+from django.contrib import admin
+from core.views import metrics_view
+from recipe import urls as recipe_urls
+from user import urls as user_urls
+urlpatterns = [
+    path('admin/', admin.site.urls),
+    path('metrics', metrics_view, name='metrics'),
+    path('api/user/',include((user_urls.async_urlpatterns, 'user'))),
+    path('api/recipe/',include((recipe_urls.async_urlpatterns, 'recipe'))),
+] + static(settings.MEDIA_URL, document_root= settings.MEDIA_ROOT)
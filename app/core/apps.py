@@ -1,5 +1,19 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save, pre_delete
 
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        from rest_framework.authtoken.models import Token
+        from .authentication import invalidate_token, invalidate_user
+        from .metrics import connection_created as count_connection
+        from .models import User
+
+        post_save.connect(invalidate_token, sender=Token)
+        post_delete.connect(invalidate_token, sender=Token)
+        post_save.connect(invalidate_user, sender=User)
+        pre_delete.connect(invalidate_user, sender=User)
+        connection_created.connect(count_connection)
@@ -0,0 +1,248 @@
+import asyncio
+import contextvars
+import functools
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIHandler
+from django.db import close_old_connections
+from django.http import JsonResponse
+from django.urls import URLPattern
+
+from . import readiness, timing
+from .exceptions import ServiceUnavailable
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_executor = None
+_workers = None
+_stream_executor = None
+_stream_slots = None
+_stream_workers = None
+
+
+def _pool():
+    """Return the ORM thread pool, sized by ASYNC_ORM_WORKERS"""
+    global _executor, _workers
+    with _lock:
+        if _workers != settings.ASYNC_ORM_WORKERS:
+            if _executor is not None:
+                _executor.shutdown(wait=False)
+            _workers = settings.ASYNC_ORM_WORKERS
+            _executor = ThreadPoolExecutor(
+                max_workers=_workers, thread_name_prefix='orm'
+            )
+        return _executor
+
+
+def _stream_pool():
+    """Return the (executor, slots) pair streaming bodies are produced on
+
+    Sized by ASYNC_STREAM_WORKERS and kept apart from the ORM pool, so
+    slow downloads holding a thread and a cursor never starve the views.
+    """
+    global _stream_executor, _stream_slots, _stream_workers
+    with _lock:
+        if _stream_workers != settings.ASYNC_STREAM_WORKERS:
+            if _stream_executor is not None:
+                _stream_executor.shutdown(wait=False)
+            _stream_workers = settings.ASYNC_STREAM_WORKERS
+            _stream_executor = ThreadPoolExecutor(
+                max_workers=_stream_workers, thread_name_prefix='stream'
+            )
+            _stream_slots = threading.BoundedSemaphore(_stream_workers)
+        return _stream_executor, _stream_slots
+
+
+def warm_up():
+    """Open the database connections of every ORM pool thread"""
+    workers = settings.ASYNC_ORM_WORKERS
+    # Every task waits for all the others, so each lands on its own thread
+    barrier = threading.Barrier(workers)
+
+    def task():
+        barrier.wait(timeout=30)
+        return readiness.warm_up()
+
+    executor = _pool()
+    futures = [executor.submit(task) for _ in range(workers)]
+    return [future.result() for future in futures]
+
+
+def _run(view, request, args, kwargs):
+    """Run a sync view to a rendered response on an ORM thread"""
+    close_old_connections()
+    try:
+        timings = timing.current()
+        with timing.instrument(timings) if timings else nullcontext():
+            response = view(request, *args, **kwargs)
+            if callable(getattr(response, 'render', None)):
+                # Rendering here keeps the serializer work off the single
+                # thread Django would otherwise render on.
+                response.render()
+        return response
+    finally:
+        close_old_connections()
+
+
+async def run_in_pool(func, *args, executor=None):
+    """Run func(*args) on executor, the ORM pool by default, in context"""
+    context = contextvars.copy_context()
+    return await asyncio.get_running_loop().run_in_executor(
+        executor or _pool(), functools.partial(context.run, func, *args)
+    )
+
+
+def _produce(iterable, put, stopped):
+    """Pass iterable's items to put until it runs out or is stopped"""
+    close_old_connections()
+    try:
+        for item in iterable:
+            put(('item', item))
+            if stopped.is_set():
+                return
+        put(('done', None))
+    except Exception as exc:
+        put(('error', exc))
+    finally:
+        # Closed here, so whatever it holds is released on its own thread
+        close = getattr(iterable, 'close', None)
+        if close is not None:
+            close()
+        close_old_connections()
+
+
+async def iterate_in_pool(iterable, buffer=4, executor=None):
+    """Yield the items of a sync iterable advanced on one pool thread
+
+    For bodies that query as they stream, like the recipe export: their
+    cursor stays on one thread and its connection, and the event loop only
+    ever waits. At most buffer items are read ahead, and iterable is closed
+    on that thread once done. executor defaults to the ORM pool.
+    """
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue(buffer)
+    stopped = threading.Event()
+
+    def put(message):
+        asyncio.run_coroutine_threadsafe(queue.put(message), loop).result()
+
+    producer = asyncio.ensure_future(
+        run_in_pool(_produce, iterable, put, stopped, executor=executor)
+    )
+    try:
+        while True:
+            kind, value = await queue.get()
+            if kind == 'done':
+                return
+            if kind == 'error':
+                raise value
+            yield value
+    finally:
+        # Unblock a producer waiting on a full queue, then let it finish
+        stopped.set()
+        while not producer.done():
+            while not queue.empty():
+                queue.get_nowait()
+            await asyncio.wait([producer], timeout=0.1)
+
+
+def async_view(view):
+    """Wrap a sync view so it runs on the ORM pool under ASGI
+
+    The event loop only parks the connection while the view runs, so a
+    worker's idle keep-alive connections cost no threads and at most
+    ASYNC_ORM_WORKERS requests hold a database connection at once.
+    """
+
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        return await run_in_pool(_run, view, request, args, kwargs)
+
+    return wrapper
+
+
+def async_routes(patterns, names):
+    """Return patterns with the routes called one of names made async"""
+    return [
+        URLPattern(pattern.pattern, async_view(pattern.callback),
+                   pattern.default_args, pattern.name)
+        if isinstance(pattern, URLPattern) and pattern.name in names
+        else pattern
+        for pattern in patterns
+    ]
+
+
+class AsyncViewsASGIHandler(ASGIHandler):
+    """ASGI handler that resolves requests with ASYNC_URLCONF
+
+    Streaming bodies are produced on the stream pool. Django 3.1 iterates
+    them on the event loop, where a body that queries the database as it
+    goes fails with SynchronousOnlyOperation. A full stream pool answers
+    503, and a client that takes longer than ASYNC_STREAM_SEND_TIMEOUT to
+    accept a chunk has its body abandoned, closing its cursor.
+    """
+
+    def create_request(self, scope, body_file):
+        request, error_response = super().create_request(scope, body_file)
+        if request is not None:
+            request.urlconf = settings.ASYNC_URLCONF
+        return request, error_response
+
+    async def send_response(self, response, send):
+        if not response.streaming:
+            return await super().send_response(response, send)
+        executor, slots = _stream_pool()
+        if not slots.acquire(blocking=False):
+            await sync_to_async(response.close, thread_sensitive=True)()
+            unavailable = JsonResponse(
+                {'detail': str(ServiceUnavailable.default_detail)},
+                status=ServiceUnavailable.status_code,
+            )
+            unavailable['Retry-After'] = '1'
+            return await super().send_response(unavailable, send)
+        try:
+            await self._stream(response, send, executor)
+        finally:
+            slots.release()
+
+    async def _stream(self, response, send, executor):
+        """Send a streaming response produced on executor"""
+        headers = [
+            (header.encode('ascii') if isinstance(header, str) else header,
+             value.encode('latin1') if isinstance(value, str) else value)
+            for header, value in response.items()
+        ]
+        headers.extend(
+            (b'Set-Cookie', cookie.output(header='').encode('ascii').strip())
+            for cookie in response.cookies.values()
+        )
+        await send({
+            'type': 'http.response.start',
+            'status': response.status_code,
+            'headers': headers,
+        })
+        # The response is closed on the thread that produced its body
+        parts = iterate_in_pool(response, executor=executor)
+        try:
+            async for part in parts:
+                for chunk, _ in self.chunk_bytes(part):
+                    try:
+                        await asyncio.wait_for(send({
+                            'type': 'http.response.body',
+                            'body': chunk,
+                            'more_body': True,
+                        }), settings.ASYNC_STREAM_SEND_TIMEOUT)
+                    except asyncio.TimeoutError:
+                        logger.warning(
+                            'Client too slow, abandoning streamed body'
+                        )
+                        return
+        finally:
+            await parts.aclose()
+        await send({'type': 'http.response.body'})
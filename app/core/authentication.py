@@ -0,0 +1,181 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import router
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from . import metrics, timing
+
+
+def _user_fields():
+    """Return the user columns worth caching; the password hash is not"""
+    return [
+        field.attname for field in get_user_model()._meta.concrete_fields
+        if field.attname != 'password'
+    ]
+
+
+def _snapshot(user, token):
+    """Return the plain values needed to rebuild (user, token)"""
+    return (
+        {name: getattr(user, name) for name in _user_fields()},
+        {'key': token.key, 'created': token.created},
+    )
+
+
+def _restore(snapshot):
+    """Build a fresh (user, token) pair from a snapshot
+
+    The password is left deferred and only loaded if something reads it.
+    """
+    user_values, token_values = snapshot
+    User = get_user_model()
+    user = User.from_db(
+        router.db_for_read(User), list(user_values),
+        list(user_values.values()),
+    )
+    token = Token.from_db(
+        router.db_for_read(Token), ['key', 'user_id', 'created'],
+        [token_values['key'], user.pk, token_values['created']],
+    )
+    token.user = user
+    return user, token
+
+
+class TokenCache:
+    """Two tier cache of token key -> (user, token)
+
+    The first tier is a per-process LRU dict whose entries expire after
+    TOKEN_CACHE_TTL seconds. When TOKEN_CACHE_ALIAS names a Django cache the
+    entries are also written there, so a worker that has never seen a token
+    can still skip the database. Invalidations clear both tiers; other
+    workers' local copies age out within TOKEN_CACHE_TTL.
+
+    Both tiers hold plain column values without the password hash, and
+    every hit gets its own model instances.
+    """
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def maxsize(self):
+        return getattr(settings, 'TOKEN_CACHE_SIZE', 10000)
+
+    @property
+    def ttl(self):
+        return getattr(settings, 'TOKEN_CACHE_TTL', 30)
+
+    @property
+    def shared(self):
+        alias = getattr(settings, 'TOKEN_CACHE_ALIAS', None)
+        return caches[alias] if alias else None
+
+    def _shared_key(self, key):
+        digest = hashlib.sha256(key.encode()).hexdigest()
+        return f'auth:token:{digest}'
+
+    def get(self, key):
+        """Return the cached (user, token) pair for a key or None"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    return _restore(entry[1])
+                del self._entries[key]
+
+        shared = self.shared
+        if shared is None:
+            return None
+        value = shared.get(self._shared_key(key))
+        if value is None:
+            return None
+        self._store_local(key, value, now)
+        return _restore(value)
+
+    def set(self, key, user, token):
+        """Cache the user and token for a key in every tier"""
+        value = _snapshot(user, token)
+        self._store_local(key, value, time.monotonic())
+        shared = self.shared
+        if shared is not None:
+            shared.set(
+                self._shared_key(key), value,
+                getattr(settings, 'TOKEN_CACHE_SHARED_TTL', 300)
+            )
+
+    def _store_local(self, key, value, now):
+        with self._lock:
+            self._entries[key] = (now + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        """Drop a token key from every tier"""
+        with self._lock:
+            self._entries.pop(key, None)
+        shared = self.shared
+        if shared is not None:
+            shared.delete(self._shared_key(key))
+
+    def delete_user(self, user_id, keys=()):
+        """Drop every cached token of a user"""
+        with self._lock:
+            pk_name = get_user_model()._meta.pk.attname
+            stale = [
+                key for key, (_, (user, _)) in self._entries.items()
+                if user[pk_name] == user_id
+            ]
+        for key in set(stale) | set(keys):
+            self.delete(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+token_cache = TokenCache()
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """Drop-in TokenAuthentication that caches the token -> user lookup"""
+
+    def authenticate_credentials(self, key):
+        cached = token_cache.get(key)
+        if cached is not None:
+            metrics.cache_hit('token')
+            return cached
+
+        metrics.cache_miss('token')
+        # Query budgets are per view; a cold cache must not push them over
+        with timing.unbudgeted():
+            user, token = super().authenticate_credentials(key)
+        token_cache.set(key, user, token)
+        return (user, token)
+
+
+def invalidate_token(sender, instance, **kwargs):
+    """Drop a saved or deleted token from the cache"""
+    token_cache.delete(instance.key)
+
+
+def invalidate_user(sender, instance, **kwargs):
+    """Drop the tokens of a changed, deactivated or deleted user"""
+    from rest_framework.authtoken.models import Token
+
+    keys = []
+    if token_cache.shared is not None:
+        keys = Token.objects.filter(
+            user_id=instance.pk
+        ).values_list('key', flat=True)
+    token_cache.delete_user(instance.pk, keys)
@@ -0,0 +1,483 @@
+import asyncio
+import io
+import itertools
+import json
+import platform
+import statistics
+import tempfile
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+import django
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import AsyncClient, Client
+from django.test.utils import (
+    CaptureQueriesContext, override_settings, setup_test_environment,
+    teardown_test_environment,
+)
+from django.urls import reverse
+from PIL import Image
+from rest_framework.authtoken.models import Token
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from recipe.models import Recipe
+from recipe.serializers import RecipeDetailSerializer, RecipeSerializer
+
+from . import renderers as fast_renderers
+from .seeding import Seeder
+
+BENCHMARK_PASSWORD = 'benchmark-password'
+
+
+def percentile(samples, pct):
+    """Return the pct-th percentile of samples by linear interpolation"""
+    ordered = sorted(samples)
+    if len(ordered) == 1:
+        return ordered[0]
+    rank = (len(ordered) - 1) * pct / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def seed(users=5, recipes=200, tags=20, ingredients=40, random_seed=0):
+    """Create benchmark data and return the user to benchmark as"""
+    return Seeder(
+        users=users, recipes=recipes, tags=tags, ingredients=ingredients,
+        seed=random_seed, password=BENCHMARK_PASSWORD, prefix='bench',
+    ).run()
+
+
+class Endpoint:
+    """One request to benchmark
+
+    `prepare(index)` runs outside the timed region and returns the url and
+    payload of the index-th call, creating whatever the call consumes.
+    `overrides` are settings the calls run with.
+    """
+
+    def __init__(self, name, method, prepare, format='json', overrides=None):
+        self.name = name
+        self.method = method
+        self.prepare = prepare
+        self.format = format
+        self.overrides = overrides or {}
+
+
+def jpeg(name='benchmark.jpg', size=(640, 480)):
+    """Return an uploadable JPEG of the given size"""
+    buffer = io.BytesIO()
+    Image.new('RGB', size, 'orange').save(buffer, format='JPEG')
+    return SimpleUploadedFile(name, buffer.getvalue(), 'image/jpeg')
+
+
+def endpoints(user):
+    """Return an Endpoint for every route of the recipe and user apps"""
+    recipe = Recipe.objects.filter(user=user).order_by('id').first()
+    tag = recipe.tag.first()
+    detail = reverse('recipe:recipe-detail', args=[recipe.id])
+
+    def fixed(url, data=None):
+        return lambda index: (url, data)
+
+    def new_recipe(index):
+        return Recipe.objects.create(
+            user=user, title=f'disposable {index}', time_minutes=5, price=1
+        )
+
+    def payload(index):
+        return {
+            'title': f'benchmark {index}', 'time_minutes': 10,
+            'price': '4.50', 'tag': [tag.id], 'ingredients': [],
+        }
+
+    def bulk_update(index):
+        ids = Recipe.objects.filter(user=user).order_by('id').values_list(
+            'id', flat=True
+        )[:10]
+        return reverse('recipe:recipe-bulk'), [
+            {'id': pk, 'time_minutes': 10 + index % 50} for pk in ids
+        ]
+
+    return [
+        Endpoint('recipe:api-root', 'get', fixed(reverse('recipe:api-root'))),
+        Endpoint('recipe:tag-list', 'get', fixed(reverse('recipe:tag-list'))),
+        Endpoint('recipe:tag-list?with_counts', 'get', fixed(
+            reverse('recipe:tag-list'),
+            {'assigned_only': 1, 'with_counts': 1}
+        )),
+        Endpoint('recipe:tag-list POST', 'post', lambda index: (
+            reverse('recipe:tag-list'), {'name': f'bench tag {index}'}
+        )),
+        Endpoint('recipe:tag-autocomplete', 'get', fixed(
+            reverse('recipe:tag-autocomplete'), {'prefix': tag.name[:2]}
+        )),
+        Endpoint('recipe:ingredients-list', 'get', fixed(
+            reverse('recipe:ingredients-list')
+        )),
+        Endpoint('recipe:ingredients-list POST', 'post', lambda index: (
+            reverse('recipe:ingredients-list'),
+            {'name': f'bench ingredient {index}'}
+        )),
+        Endpoint('recipe:ingredients-autocomplete', 'get', fixed(
+            reverse('recipe:ingredients-autocomplete'), {'prefix': 'sa'}
+        )),
+        Endpoint('recipe:recipe-list', 'get', fixed(
+            reverse('recipe:recipe-list')
+        )),
+        Endpoint('recipe:recipe-list?tag', 'get', fixed(
+            reverse('recipe:recipe-list'), {'tag': tag.id}
+        )),
+        Endpoint('recipe:recipe-list?fields', 'get', fixed(
+            reverse('recipe:recipe-list'), {'fields': 'id,title,time_minutes'}
+        )),
+        Endpoint('recipe:recipe-list?q', 'get', fixed(
+            reverse('recipe:recipe-list'), {'q': recipe.title.split()[0]}
+        )),
+        Endpoint('recipe:recipe-list POST', 'post', lambda index: (
+            reverse('recipe:recipe-list'), payload(index)
+        )),
+        Endpoint('recipe:recipe-detail', 'get', fixed(detail)),
+        Endpoint('recipe:recipe-detail PATCH', 'patch', lambda index: (
+            detail, {'time_minutes': 10 + index % 50}
+        )),
+        Endpoint('recipe:recipe-detail DELETE', 'delete', lambda index: (
+            reverse('recipe:recipe-detail', args=[new_recipe(index).id]),
+            None
+        )),
+        Endpoint('recipe:recipe-upload-image', 'get', fixed(
+            reverse('recipe:recipe-upload-image', args=[recipe.id])
+        )),
+        # Processed inline, so the renditions are part of the timing and a
+        # full pool can never fail the run
+        Endpoint('recipe:recipe-upload-image POST', 'post', lambda index: (
+            reverse('recipe:recipe-upload-image', args=[recipe.id]),
+            {'image': jpeg()}
+        ), format='multipart', overrides={'RECIPE_IMAGE_WORKERS': 0}),
+        Endpoint('recipe:recipe-export', 'get', fixed(
+            reverse('recipe:recipe-export')
+        )),
+        Endpoint('recipe:recipe-export?type=csv', 'get', fixed(
+            reverse('recipe:recipe-export'), {'type': 'csv'}
+        )),
+        Endpoint('recipe:recipe-bulk POST', 'post', lambda index: (
+            reverse('recipe:recipe-bulk'),
+            [payload(f'{index}.{item}') for item in range(10)]
+        )),
+        Endpoint('recipe:recipe-bulk PATCH', 'patch', bulk_update),
+        Endpoint('user:create', 'post', lambda index: (
+            reverse('user:create'), {
+                'email': f'signup{index}@benchmark.com',
+                'password': BENCHMARK_PASSWORD,
+                'name': 'Benchmark',
+            }
+        )),
+        Endpoint('user:token', 'post', fixed(
+            reverse('user:token'),
+            {'email': user.email, 'password': BENCHMARK_PASSWORD}
+        )),
+        Endpoint('user:me', 'get', fixed(reverse('user:me'))),
+        Endpoint('user:me PATCH', 'patch', lambda index: (
+            reverse('user:me'), {'name': f'Benchmark {index}'}
+        )),
+    ]
+
+
+def _call(client, endpoint, index):
+    url, data = endpoint.prepare(index)
+    start = time.perf_counter()
+    with override_settings(**endpoint.overrides):
+        response = getattr(client, endpoint.method)(
+            url, data, format=endpoint.format
+        )
+        if response.streaming:
+            # Streamed bodies do their queries as they are read
+            b''.join(response.streaming_content)
+    elapsed = time.perf_counter() - start
+    if response.status_code >= 400:
+        raise AssertionError(
+            f'{endpoint.name} returned {response.status_code}: '
+            f'{response.content[:200]!r}'
+        )
+    return elapsed
+
+
+def measure(client, endpoint, iterations, warmup=5):
+    """Time an endpoint, then count the queries and memory of one call"""
+    for index in range(warmup):
+        _call(client, endpoint, index)
+    samples = [
+        _call(client, endpoint, warmup + index) * 1000
+        for index in range(iterations)
+    ]
+
+    # Tracing slows every allocation down, so queries and memory are
+    # measured on a separate call instead of skewing the timings.
+    tracemalloc.start()
+    try:
+        with CaptureQueriesContext(connection) as queries:
+            _call(client, endpoint, warmup + iterations)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'p50_ms': round(percentile(samples, 50), 3),
+        'p95_ms': round(percentile(samples, 95), 3),
+        'p99_ms': round(percentile(samples, 99), 3),
+        'mean_ms': round(statistics.mean(samples), 3),
+        'queries': len(queries),
+        'peak_kib': round(peak / 1024, 1),
+    }
+
+
+def run(user, iterations=50, warmup=5, only=None, progress=None):
+    """Benchmark every endpoint as user and return the results by name"""
+    token, _ = Token.objects.get_or_create(user=user)
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+    results = {}
+    # Uploads go to a scratch media directory, not the real one
+    with tempfile.TemporaryDirectory() as media, \
+            override_settings(MEDIA_ROOT=media):
+        for endpoint in endpoints(user):
+            if only and not any(name in endpoint.name for name in only):
+                continue
+            results[endpoint.name] = measure(
+                client, endpoint, iterations, warmup
+            )
+            if progress:
+                progress(endpoint.name, results[endpoint.name])
+    return results
+
+
+SERVING_ROUTES = (
+    'recipe:recipe-list', 'recipe:recipe-detail', 'recipe:tag-list',
+    'recipe:ingredients-list', 'user:me',
+)
+
+
+def _check(url, response):
+    if response.status_code >= 400:
+        raise AssertionError(
+            f'{url} returned {response.status_code}: '
+            f'{response.content[:200]!r}'
+        )
+
+
+def _wsgi(urls, requests, workers, key):
+    """Serve requests the WSGI way, one thread per request in flight"""
+    counter = itertools.count()
+    latencies = []
+
+    def worker():
+        client = Client()
+        try:
+            index = next(counter)
+            while index < requests:
+                url = urls[index % len(urls)]
+                start = time.perf_counter()
+                response = client.get(url, HTTP_AUTHORIZATION=key)
+                latencies.append(time.perf_counter() - start)
+                _check(url, response)
+                index = next(counter)
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=worker) for _ in range(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies
+
+
+def _asgi(urls, requests, concurrency, key):
+    """Serve requests through the async views, concurrency at a time"""
+    client = AsyncClient()
+    latencies = []
+
+    async def one(index, gate):
+        url = urls[index % len(urls)]
+        async with gate:
+            start = time.perf_counter()
+            response = await client.get(url, authorization=key)
+            latencies.append(time.perf_counter() - start)
+        _check(url, response)
+
+    async def main():
+        gate = asyncio.Semaphore(concurrency)
+        await asyncio.gather(*(one(index, gate) for index in range(requests)))
+
+    asyncio.run(main())
+    return latencies
+
+
+def _serve(handler, requests):
+    """Return throughput and latency of handler, then its peak memory"""
+    start = time.perf_counter()
+    samples = [latency * 1000 for latency in handler(requests)]
+    elapsed = time.perf_counter() - start
+
+    # As in measure(), memory is traced on a separate, shorter run.
+    tracemalloc.start()
+    try:
+        handler(max(requests // 10, 1))
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'req_per_s': round(len(samples) / elapsed, 1),
+        'p50_ms': round(percentile(samples, 50), 3),
+        'p99_ms': round(percentile(samples, 99), 3),
+        'peak_kib': round(peak / 1024, 1),
+    }
+
+
+def serve(user, requests=500, workers=8, concurrency=100):
+    """Compare serving the read-heavy routes over WSGI and ASGI
+
+    Both modes get the same `workers` threads, and so the same database
+    connections and roughly the same memory: WSGI serves one request per
+    thread, while ASGI keeps `concurrency` requests in flight and runs
+    their views on an ORM pool of that many threads.
+    """
+    token, _ = Token.objects.get_or_create(user=user)
+    key = f'Token {token.key}'
+    recipe = Recipe.objects.filter(user=user).order_by('id').first()
+    urls = [
+        reverse(name, args=[recipe.id]) if name.endswith('-detail')
+        else reverse(name)
+        for name in SERVING_ROUTES
+    ]
+
+    results = {'wsgi': _serve(
+        lambda count: _wsgi(urls, count, workers, key), requests
+    )}
+    with override_settings(ROOT_URLCONF=settings.ASYNC_URLCONF,
+                           ASYNC_ORM_WORKERS=workers):
+        results['asgi'] = _serve(
+            lambda count: _asgi(urls, count, concurrency, key), requests
+        )
+    for mode in ('wsgi', 'asgi'):
+        results[mode]['threads'] = workers
+    results['asgi']['in_flight'] = concurrency
+    results['wsgi']['in_flight'] = workers
+    return results
+
+
+def render_times(user, iterations=50):
+    """Compare the renderers on the user's recipes, as lists and details
+
+    Returns the median encode time and the bytes per recipe of every
+    renderer, with DRF's stdlib JSONRenderer as the reference.
+    """
+    recipes = Recipe.objects.filter(user=user).prefetch_related(
+        'tag', 'ingredients'
+    )
+    payloads = {
+        'list': RecipeSerializer(recipes, many=True).data,
+        'detail': RecipeDetailSerializer(recipes, many=True).data,
+    }
+    candidates = {
+        'json': JSONRenderer(),
+        'orjson': fast_renderers.ORJSONRenderer(),
+    }
+    if fast_renderers.msgpack is not None:
+        candidates['msgpack'] = fast_renderers.MessagePackRenderer()
+
+    results = {}
+    for shape, data in payloads.items():
+        count = max(len(data), 1)
+        for name, renderer in candidates.items():
+            samples = []
+            for _ in range(iterations):
+                start = time.perf_counter()
+                body = renderer.render(data, renderer.media_type)
+                samples.append((time.perf_counter() - start) * 1000)
+            encode_ms = percentile(samples, 50)
+            results[f'{shape} {name}'] = {
+                'recipes': len(data),
+                'encode_ms': round(encode_ms, 3),
+                'us_per_recipe': round(encode_ms * 1000 / count, 3),
+                'bytes_per_recipe': round(len(body) / count, 1),
+            }
+    return results
+
+
+@contextmanager
+def throwaway_database(interactive=True):
+    """Run the block against a throwaway test database"""
+    setup_test_environment()
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(
+        verbosity=0, autoclobber=not interactive
+    )
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+def environment(**params):
+    """Describe what the results were measured on"""
+    return dict(
+        params,
+        python=platform.python_version(),
+        django=django.get_version(),
+        database=connection.vendor,
+    )
+
+
+def compare(results, baseline, tolerance=0.25, slack_ms=1.0,
+            slack_kib=64.0):
+    """Return a message for every metric that regressed against baseline
+
+    Latency and memory may grow by `tolerance` plus a small absolute slack
+    so noise on fast endpoints does not fail the run. Query counts are
+    deterministic and may not grow at all.
+    """
+    regressions = []
+    for name, base in sorted(baseline.get('endpoints', {}).items()):
+        current = results.get(name)
+        if current is None:
+            continue
+        for metric in ('p50_ms', 'p95_ms', 'p99_ms'):
+            limit = base[metric] * (1 + tolerance) + slack_ms
+            if current[metric] > limit:
+                regressions.append(
+                    f'{name}: {metric} {current[metric]:.2f} > '
+                    f'{limit:.2f} (baseline {base[metric]:.2f})'
+                )
+        if current['queries'] > base['queries']:
+            regressions.append(
+                f'{name}: queries {current["queries"]} > '
+                f'{base["queries"]}'
+            )
+        limit = base['peak_kib'] * (1 + tolerance) + slack_kib
+        if current['peak_kib'] > limit:
+            regressions.append(
+                f'{name}: peak_kib {current["peak_kib"]:.1f} > '
+                f'{limit:.1f} (baseline {base["peak_kib"]:.1f})'
+            )
+    return regressions
+
+
+def load(path):
+    with open(path) as fp:
+        return json.load(fp)
+
+
+def dump(path, meta, results):
+    with open(path, 'w') as fp:
+        json.dump({'meta': meta, 'endpoints': results}, fp, indent=2,
+                  sort_keys=True)
+        fp.write('\n')
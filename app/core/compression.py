@@ -0,0 +1,153 @@
+import asyncio
+import gzip
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_sequence
+
+from . import asyncviews
+
+try:
+    import brotli
+except ImportError:  # Optional, responses fall back to gzip without it
+    brotli = None
+
+
+def enabled():
+    return 'core.compression.CompressionMiddleware' in settings.MIDDLEWARE
+
+
+def accepted_encodings(request):
+    """Return the content codings request accepts, by q-value"""
+    accepted = {}
+    for item in request.META.get('HTTP_ACCEPT_ENCODING', '').split(','):
+        coding, _, params = item.strip().partition(';')
+        quality = 1.0
+        for param in params.split(';'):
+            name, _, value = param.strip().partition('=')
+            if name == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if coding:
+            accepted[coding.lower()] = quality
+    return accepted
+
+
+def negotiate(request):
+    """Return the coding to compress the response to request with, if any"""
+    if not enabled():
+        return None
+    accepted = accepted_encodings(request)
+    available = ['br', 'gzip'] if brotli is not None else ['gzip']
+    candidates = [
+        coding for coding in available
+        if accepted.get(coding, accepted.get('*', 0)) > 0
+    ]
+    if not candidates:
+        return None
+    # Prefer brotli unless the client ranks gzip strictly higher
+    return max(candidates, key=lambda coding: accepted.get(
+        coding, accepted.get('*', 0)
+    ))
+
+
+def compressible(request, response):
+    """Return True if response is worth compressing for request
+
+    Only allow-listed content types are, and never media files, which are
+    stored in their own (usually already compressed) formats.
+    """
+    if response.has_header('Content-Encoding') or \
+            response.status_code in (204, 304) or \
+            request.path.startswith(settings.MEDIA_URL):
+        return False
+    media_type = response.get('Content-Type', '').partition(';')[0]
+    if media_type.strip().lower() not in settings.COMPRESS_CONTENT_TYPES:
+        return False
+    return response.streaming or \
+        len(response.content) >= settings.COMPRESS_MIN_SIZE
+
+
+def compress(content, coding):
+    """Return content compressed with coding"""
+    if coding == 'br':
+        return brotli.compress(
+            content, quality=settings.COMPRESS_BROTLI_QUALITY
+        )
+    return gzip.compress(
+        content, compresslevel=settings.COMPRESS_GZIP_LEVEL, mtime=0
+    )
+
+
+def _brotli_sequence(sequence):
+    compressor = brotli.Compressor(
+        quality=settings.COMPRESS_BROTLI_QUALITY
+    )
+    for item in sequence:
+        data = compressor.process(item) + compressor.flush()
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+def prepare(request, response):
+    """Return the coding to compress response with, or None"""
+    if not compressible(request, response):
+        return None
+    patch_vary_headers(response, ('Accept-Encoding',))
+    return negotiate(request)
+
+
+def encode(response, coding, body=None):
+    """Compress response with coding, or use the precompressed body"""
+    if response.streaming:
+        response.streaming_content = (
+            _brotli_sequence(response.streaming_content) if coding == 'br'
+            else compress_sequence(response.streaming_content)
+        )
+        del response['Content-Length']
+    else:
+        response.content = compress(response.content, coding) \
+            if body is None else body
+        response['Content-Length'] = str(len(response.content))
+    etag = response.get('ETag')
+    if etag and etag.startswith('"'):
+        # The compressed bytes differ, so the validator is only weak now
+        response['ETag'] = 'W/' + etag
+    response['Content-Encoding'] = coding
+    return response
+
+
+class CompressionMiddleware:
+    """Compress responses with brotli when available, else gzip
+
+    Responses below COMPRESS_MIN_SIZE, of types outside
+    COMPRESS_CONTENT_TYPES, or under MEDIA_URL are sent as they are.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        response = self.get_response(request)
+        coding = prepare(request, response)
+        return encode(response, coding) if coding else response
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        coding = prepare(request, response)
+        if not coding:
+            return response
+        if response.streaming:
+            return encode(response, coding)
+        # Compressing a large body would stall every connection on the loop
+        return await asyncviews.run_in_pool(encode, response, coding)
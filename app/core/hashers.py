@@ -0,0 +1,82 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import hashers
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+
+from .exceptions import ServiceUnavailable
+
+_lock = threading.Lock()
+_executor = None
+_slots = None
+
+
+class TunablePBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """PBKDF2 with its work factor taken from PASSWORD_HASH_ITERATIONS
+
+    Hashes made with another iteration count still verify, and are
+    rehashed with the configured count on the next successful login.
+    """
+
+    @property
+    def iterations(self):
+        return settings.PASSWORD_HASH_ITERATIONS
+
+
+def _pool():
+    """Return the shared (executor, slots) pair, creating it on first use"""
+    global _executor, _slots
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.PASSWORD_HASH_WORKERS,
+                thread_name_prefix='password-hash',
+            )
+            _slots = threading.BoundedSemaphore(
+                settings.PASSWORD_HASH_WORKERS +
+                settings.PASSWORD_HASH_QUEUE_SIZE
+            )
+        return _executor, _slots
+
+
+def _run(func, *args):
+    """Run func on the hashing pool and wait for its result
+
+    Raises ServiceUnavailable when the pool and its queue are full.
+    """
+    if settings.PASSWORD_HASH_WORKERS <= 0:
+        return func(*args)
+    executor, slots = _pool()
+    if not slots.acquire(blocking=False):
+        raise ServiceUnavailable(
+            'Too many sign-ins at once, try again shortly.',
+            wait=settings.PASSWORD_HASH_RETRY_AFTER,
+        )
+    try:
+        future = executor.submit(func, *args)
+    except BaseException:
+        slots.release()
+        raise
+    future.add_done_callback(lambda _: slots.release())
+    return future.result()
+
+
+def make_password(password):
+    """Hash password with the preferred hasher on the hashing pool"""
+    return _run(hashers.make_password, password)
+
+
+def check_password(password, encoded):
+    """Verify password against encoded on the hashing pool"""
+    return _run(hashers.check_password, password, encoded)
+
+
+def must_upgrade(encoded):
+    """Return True when encoded should be rehashed with the current hasher"""
+    try:
+        hasher = hashers.identify_hasher(encoded)
+    except ValueError:
+        return False
+    return (hasher.algorithm != hashers.get_hasher().algorithm or
+            hasher.must_update(encoded))
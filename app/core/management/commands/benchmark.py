@@ -0,0 +1,121 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from core import benchmark
+
+DEFAULT_BASELINE = os.path.join(
+    settings.BASE_DIR, 'benchmarks', 'baseline.json'
+)
+
+
+class Command(BaseCommand):
+    """Django command to benchmark every API endpoint
+
+    Runs against a throwaway test database, seeded with the requested
+    volumes, and exits non-zero when a result regresses against the
+    baseline, or when there is no baseline to compare with.
+    """
+    help = 'Benchmark the API endpoints and compare against a baseline'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=5)
+        parser.add_argument('--recipes', type=int, default=200,
+                            help='Mean recipes per user')
+        parser.add_argument('--tags', type=int, default=20,
+                            help='Mean tags per user')
+        parser.add_argument('--ingredients', type=int, default=40,
+                            help='Mean ingredients per user')
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument('--warmup', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--only', action='append',
+                            help='Only run endpoints whose name contains '
+                                 'this, may be repeated')
+        parser.add_argument('--with-cache', action='store_true',
+                            help='Keep the list response cache enabled')
+        parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+        parser.add_argument('--save-baseline', action='store_true',
+                            help='Write the results as the new baseline')
+        parser.add_argument('--output',
+                            help='Also write the results to this file')
+        parser.add_argument('--tolerance', type=float, default=0.25,
+                            help='Allowed relative latency/memory growth')
+        parser.add_argument('--noinput', '--no-input', action='store_false',
+                            dest='interactive')
+
+    def handle(self, *args, **options):
+        if not (options['save_baseline'] or
+                os.path.exists(options['baseline'])):
+            raise CommandError(
+                f'No baseline at {options["baseline"]}, run with '
+                f'--save-baseline to create one'
+            )
+        params = {
+            key: options[key] for key in (
+                'users', 'recipes', 'tags', 'ingredients', 'iterations',
+                'seed', 'with_cache',
+            )
+        }
+        meta = benchmark.environment(**params)
+
+        overrides = {} if options['with_cache'] else {
+            'RECIPE_RESPONSE_CACHE_TIMEOUT': 0,
+        }
+        with benchmark.throwaway_database(options['interactive']):
+            with override_settings(**overrides):
+                user = benchmark.seed(
+                    users=options['users'],
+                    recipes=options['recipes'],
+                    tags=options['tags'],
+                    ingredients=options['ingredients'],
+                    random_seed=options['seed'],
+                )
+                self.stdout.write(
+                    f'{"endpoint":<36}{"p50 ms":>9}{"p95 ms":>9}'
+                    f'{"p99 ms":>9}{"queries":>9}{"peak KiB":>10}'
+                )
+                results = benchmark.run(
+                    user,
+                    iterations=options['iterations'],
+                    warmup=options['warmup'],
+                    only=options['only'],
+                    progress=self.report,
+                )
+
+        if options['output']:
+            benchmark.dump(options['output'], meta, results)
+        if options['save_baseline']:
+            os.makedirs(os.path.dirname(options['baseline']), exist_ok=True)
+            benchmark.dump(options['baseline'], meta, results)
+            self.stdout.write(self.style.SUCCESS(
+                f'Baseline written to {options["baseline"]}'
+            ))
+            return
+        self.check_baseline(options, meta, results)
+
+    def report(self, name, result):
+        self.stdout.write(
+            f'{name:<36}{result["p50_ms"]:>9.2f}{result["p95_ms"]:>9.2f}'
+            f'{result["p99_ms"]:>9.2f}{result["queries"]:>9}'
+            f'{result["peak_kib"]:>10.1f}'
+        )
+
+    def check_baseline(self, options, meta, results):
+        baseline = benchmark.load(options['baseline'])
+        if baseline.get('meta') != meta:
+            self.stdout.write(self.style.WARNING(
+                f'Baseline was measured with {baseline.get("meta")}, '
+                f'this run used {meta}'
+            ))
+        regressions = benchmark.compare(
+            results, baseline, tolerance=options['tolerance']
+        )
+        if regressions:
+            raise CommandError(
+                'Performance regressed against the baseline:\n  ' +
+                '\n  '.join(regressions)
+            )
+        self.stdout.write(self.style.SUCCESS('No regressions'))
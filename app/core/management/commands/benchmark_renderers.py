@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+
+from core import benchmark
+
+
+class Command(BaseCommand):
+    """Django command to compare the API renderers
+
+    Encodes one user's recipes, as list items and as details, with DRF's
+    JSONRenderer, the orjson renderer and, if msgpack is installed, the
+    MessagePack renderer.
+    """
+    help = 'Compare encode time and size of the API renderers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=1000,
+                            help='Mean recipes of the benchmarked user')
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--noinput', '--no-input', action='store_false',
+                            dest='interactive')
+
+    def handle(self, *args, **options):
+        with benchmark.throwaway_database(options['interactive']):
+            user = benchmark.seed(
+                users=1, recipes=options['recipes'],
+                random_seed=options['seed'],
+            )
+            results = benchmark.render_times(
+                user, iterations=options['iterations']
+            )
+
+        self.stdout.write(
+            f'{"payload":<16}{"recipes":>9}{"encode ms":>11}'
+            f'{"us/recipe":>11}{"bytes/recipe":>14}'
+        )
+        for name, result in results.items():
+            self.stdout.write(
+                f'{name:<16}{result["recipes"]:>9}'
+                f'{result["encode_ms"]:>11.3f}'
+                f'{result["us_per_recipe"]:>11.3f}'
+                f'{result["bytes_per_recipe"]:>14.1f}'
+            )
@@ -0,0 +1,58 @@
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+from core import benchmark
+
+
+class Command(BaseCommand):
+    """Django command to compare WSGI and ASGI serving throughput
+
+    Serves the read-heavy routes from the same number of threads both
+    ways, against a throwaway test database.
+    """
+    help = 'Compare throughput of the WSGI and ASGI serving modes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=5)
+        parser.add_argument('--recipes', type=int, default=200,
+                            help='Mean recipes per user')
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--workers', type=int, default=8,
+                            help='Threads per mode, WSGI threads or ASGI '
+                                 'ORM pool size')
+        parser.add_argument('--concurrency', type=int, default=100,
+                            help='Requests the ASGI mode keeps in flight')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--with-cache', action='store_true',
+                            help='Keep the list response cache enabled')
+        parser.add_argument('--noinput', '--no-input', action='store_false',
+                            dest='interactive')
+
+    def handle(self, *args, **options):
+        overrides = {} if options['with_cache'] else {
+            'RECIPE_RESPONSE_CACHE_TIMEOUT': 0,
+        }
+        with benchmark.throwaway_database(options['interactive']):
+            with override_settings(**overrides):
+                user = benchmark.seed(
+                    users=options['users'],
+                    recipes=options['recipes'],
+                    random_seed=options['seed'],
+                )
+                results = benchmark.serve(
+                    user,
+                    requests=options['requests'],
+                    workers=options['workers'],
+                    concurrency=options['concurrency'],
+                )
+
+        self.stdout.write(
+            f'{"mode":<8}{"threads":>9}{"in flight":>11}{"req/s":>10}'
+            f'{"p50 ms":>9}{"p99 ms":>9}{"peak KiB":>10}'
+        )
+        for mode, result in results.items():
+            self.stdout.write(
+                f'{mode:<8}{result["threads"]:>9}{result["in_flight"]:>11}'
+                f'{result["req_per_s"]:>10.1f}{result["p50_ms"]:>9.2f}'
+                f'{result["p99_ms"]:>9.2f}{result["peak_kib"]:>10.1f}'
+            )
@@ -0,0 +1,42 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from recipe import export
+from recipe.models import Recipe
+
+
+class Command(BaseCommand):
+    """Django command to stream a user's recipes to a file or stdout
+
+    Same output as /api/recipe/recipe/export/, read with a server-side
+    cursor so memory stays flat however large the collection is.
+    """
+    help = "Export a user's recipes with tag and ingredient names"
+
+    def add_arguments(self, parser):
+        parser.add_argument('email', help='Email of the user to export')
+        parser.add_argument('--type', choices=sorted(export.FORMATS),
+                            default='ndjson')
+        parser.add_argument('--output', '-o',
+                            help='File to write to, stdout by default')
+        parser.add_argument('--chunk-size', type=int,
+                            default=export.chunk_size())
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be positive')
+        try:
+            user = get_user_model().objects.get(email=options['email'])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f'No user with email {options["email"]}')
+
+        lines = export.export(
+            Recipe.objects.filter(user=user), options['type'],
+            size=options['chunk_size'],
+        )
+        if options['output']:
+            with open(options['output'], 'wb') as out:
+                out.writelines(lines)
+        else:
+            for line in lines:
+                self.stdout.write(line.decode(), ending='')
@@ -0,0 +1,30 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from recipe import images
+
+
+class Command(BaseCommand):
+    """Django command to process recipe images stuck in the pending state
+
+    Uploads stay pending when the image pool was full as their request
+    committed, or when the process died before finishing them. Run it from
+    cron; the images are processed in this process, one at a time.
+    """
+    help = 'Process recipe image uploads that have been pending too long'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--older-than', type=int,
+            default=settings.RECIPE_IMAGE_STALE_AFTER,
+            help='Seconds an upload must have been pending',
+        )
+
+    def handle(self, *args, **options):
+        if options['older_than'] < 0:
+            raise CommandError('--older-than must not be negative')
+        count = 0
+        for recipe_id in list(images.stale_uploads(options['older_than'])):
+            images.process(recipe_id)
+            count += 1
+        self.stdout.write(f'Processed {count} pending image(s)')
@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.seeding import PRESETS, Seeder
+
+
+class Command(BaseCommand):
+    """Django command to fill the database with synthetic recipe data"""
+    help = 'Generate users, tags, ingredients and recipes for load tests'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--preset', choices=sorted(PRESETS),
+                            default='small')
+        parser.add_argument('--users', type=int,
+                            help='Number of users, overrides the preset')
+        parser.add_argument('--recipes', type=int,
+                            help='Mean recipes per user')
+        parser.add_argument('--tags', type=int, help='Mean tags per user')
+        parser.add_argument('--ingredients', type=int,
+                            help='Mean ingredients per user')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--password', default='password',
+                            help='Password shared by every generated user')
+        parser.add_argument('--prefix', default='seed',
+                            help='Emails are <prefix><n>@example.com')
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        sizes = dict(PRESETS[options['preset']])
+        for key in sizes:
+            if options[key] is not None:
+                sizes[key] = options[key]
+        if any(value < 0 for value in sizes.values()):
+            raise CommandError('Sizes must not be negative')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be positive')
+
+        seeder = Seeder(
+            seed=options['seed'],
+            password=options['password'],
+            prefix=options['prefix'],
+            batch_size=options['batch_size'],
+            log=self.stdout.write,
+            **sizes
+        )
+        seeder.run()
+        self.stdout.write(self.style.SUCCESS(
+            'Created ' + ', '.join(
+                f'{count} {name}' for name, count in seeder.counts.items()
+            )
+        ))
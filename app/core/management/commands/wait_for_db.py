@@ -1,20 +1,65 @@
-import time
+from django.db import DEFAULT_DB_ALIAS
+from django.db.utils import DatabaseError
+from django.core.management.base import BaseCommand, CommandError
 
-from django.db import connections
-from django.db.utils import OperationalError
-from django.core.management.base import BaseCommand
+from core import readiness
 
 
 class Command(BaseCommand):
-    """Django command to pause execution till database is avaliable"""
-    
-    def handle(self,*args,**options):
+    """Django command to pause execution till database is avaliable
+
+    The database counts as available once a connection opens and answers
+    a trivial query. Retries back off exponentially with jitter, and the
+    command fails after --timeout seconds so a container does not wait
+    forever on a database that never comes up.
+    """
+    help = 'Wait until the databases accept connections and queries'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', action='append', dest='aliases',
+                            help='Database alias to wait for, may be '
+                                 'repeated (default: default)')
+        parser.add_argument('--timeout', type=float, default=60.0,
+                            help='Seconds to wait before giving up')
+        parser.add_argument('--interval', type=float, default=0.5,
+                            help='First retry delay, doubled per attempt')
+        parser.add_argument('--max-interval', type=float, default=5.0,
+                            help='Longest delay between attempts')
+        parser.add_argument('--warm-up', action='store_true',
+                            help='Then open and validate a connection to '
+                                 'every configured database')
+
+    def handle(self, *args, **options):
+        aliases = options['aliases'] or [DEFAULT_DB_ALIAS]
         self.stdout.write('Waiting for database...')
-        db_conn = None
-        while not db_conn:
+        try:
+            readiness.wait(
+                aliases,
+                timeout=options['timeout'],
+                interval=options['interval'],
+                max_interval=options['max_interval'],
+                on_retry=self.retrying,
+            )
+        except DatabaseError as exc:
+            raise CommandError(
+                f'Database still unavailable after {options["timeout"]}s: '
+                f'{exc}'
+            )
+        self.stdout.write(self.style.SUCCESS('Database avaliable!!!'))
+
+        if options['warm_up']:
             try:
-                db_conn = connections['default']
-            except OperationalError:
-                self.stdout.write('Database isnt avaliable waiting for a sec.....')
-                time.sleep(1)
-        self.stdout.write(self.style.SUCCESS('Database avaliable!!!'))
\ No newline at end of file
+                timings = readiness.warm_up()
+            except DatabaseError as exc:
+                raise CommandError(f'Database warm-up failed: {exc}')
+            for alias, seconds in timings.items():
+                self.stdout.write(
+                    f'{alias}: connected in {seconds * 1000:.1f} ms'
+                )
+
+    def retrying(self, alias, exc, delay):
+        reason = str(exc).strip().partition('\n')[0]
+        self.stdout.write(
+            f'Database isnt avaliable ({alias}: {reason}), '
+            f'retrying in {delay:.1f}s...'
+        )
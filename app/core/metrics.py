@@ -0,0 +1,82 @@
+import os
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Histogram, REGISTRY,
+    generate_latest, multiprocess,
+)
+
+REQUESTS = Counter(
+    'http_requests_total', 'Requests handled, by view and response status',
+    ['view', 'method', 'status'],
+)
+EXCEPTIONS = Counter(
+    'http_exceptions_total', 'Requests that raised an unhandled exception',
+    ['view', 'exception'],
+)
+LATENCY = Histogram(
+    'http_request_duration_seconds', 'Time to produce a response',
+    ['view', 'method'],
+)
+RESPONSE_SIZE = Histogram(
+    'http_response_size_bytes', 'Size of response bodies',
+    ['view'],
+    buckets=(256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304),
+)
+DB_QUERIES = Histogram(
+    'db_queries_per_request', 'SQL queries run per request',
+    ['view'],
+    buckets=(0, 1, 2, 3, 4, 6, 8, 12, 16, 32, 64),
+)
+DB_DURATION = Histogram(
+    'db_duration_seconds', 'Time spent in the database per request',
+    ['view'],
+)
+DB_CONNECTIONS = Counter(
+    'db_connections_opened_total', 'Database connections opened',
+    ['alias'],
+)
+CACHE_REQUESTS = Counter(
+    'cache_requests_total', 'Cache lookups by cache and result',
+    ['cache', 'result'],
+)
+
+
+def observe_request(view, request, response, timings, duration):
+    """Record a handled request"""
+    REQUESTS.labels(view, request.method, response.status_code).inc()
+    LATENCY.labels(view, request.method).observe(duration)
+    if not response.streaming:
+        RESPONSE_SIZE.labels(view).observe(len(response.content))
+    DB_QUERIES.labels(view).observe(timings.queries)
+    DB_DURATION.labels(view).observe(timings.db)
+
+
+def observe_exception(view, exception):
+    EXCEPTIONS.labels(view, type(exception).__name__).inc()
+
+
+def cache_hit(cache):
+    CACHE_REQUESTS.labels(cache, 'hit').inc()
+
+
+def cache_miss(cache):
+    CACHE_REQUESTS.labels(cache, 'miss').inc()
+
+
+def connection_created(sender, connection, **kwargs):
+    """connection_created signal handler"""
+    DB_CONNECTIONS.labels(connection.alias).inc()
+
+
+def registry():
+    """Return the registry to expose, aggregating workers when configured"""
+    if 'prometheus_multiproc_dir' not in os.environ:
+        return REGISTRY
+    collector = CollectorRegistry()
+    multiprocess.MultiProcessCollector(collector)
+    return collector
+
+
+def render():
+    """Return the current samples in the Prometheus text format"""
+    return generate_latest(registry()), CONTENT_TYPE_LATEST
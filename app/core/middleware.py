@@ -0,0 +1,133 @@
+import asyncio
+import json
+import logging
+import time
+
+from django.conf import settings
+
+from . import metrics
+from .timing import RequestTimings, instrument, measure
+
+logger = logging.getLogger('core.timing')
+
+
+def view_name(request):
+    """Return `ViewClass.action` for the DRF view that handled request"""
+    match = getattr(request, 'resolver_match', None)
+    func = getattr(match, 'func', None)
+    cls = getattr(func, 'cls', None) or getattr(func, 'view_class', None)
+    if cls is None:
+        return getattr(match, 'view_name', None) or 'unresolved'
+    actions = getattr(func, 'actions', None) or {}
+    action = actions.get(request.method.lower(), request.method.lower())
+    return f'{cls.__name__}.{action}'
+
+
+def query_budget(request):
+    """Return the query budget the view declares for this action"""
+    func = getattr(getattr(request, 'resolver_match', None), 'func', None)
+    budgets = getattr(getattr(func, 'cls', None), 'query_budgets', None)
+    actions = getattr(func, 'actions', None) or {}
+    if not budgets:
+        return None
+    return budgets.get(actions.get(request.method.lower()))
+
+
+class ServerTimingMiddleware:
+    """Report query count and time per request phase, and record metrics
+
+    Queries are counted with `connection.execute_wrapper`, so this works
+    with DEBUG off and without keeping the SQL around. The figures go out
+    as a Server-Timing header and one JSON log line on `core.timing`,
+    logged as a warning when the view's query budget is exceeded.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            # Lets Django call this middleware without a thread hop
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        timings = RequestTimings()
+        start = time.perf_counter()
+        with instrument(timings):
+            response = self.get_response(request)
+        return self.finish(request, response, timings, start)
+
+    async def __acall__(self, request):
+        # Async views count their queries on the ORM thread they run on,
+        # see core.asyncviews; the timings reach it through the context.
+        timings = RequestTimings()
+        start = time.perf_counter()
+        with measure(timings):
+            response = await self.get_response(request)
+        return self.finish(request, response, timings, start)
+
+    def finish(self, request, response, timings, start):
+        """Emit the header, log line and metrics of a handled request"""
+        total = time.perf_counter() - start
+        view_start = getattr(request, '_timing_view_start', None)
+        view_end = getattr(request, '_timing_view_end', None)
+        if view_end is None:
+            view_end = start + total
+        view = view_end - view_start if view_start is not None else 0.0
+        phases = {
+            'db': timings.db,
+            'serializer': timings.serializer,
+            'view': view,
+            'render': start + total - view_end,
+            'total': total,
+        }
+
+        if getattr(settings, 'SERVER_TIMING_HEADER', True):
+            response['Server-Timing'] = ', '.join(
+                f'{name};dur={seconds * 1000:.2f}' +
+                (f';desc="{timings.queries} queries"' if name == 'db' else '')
+                for name, seconds in phases.items()
+            )
+
+        view_label = view_name(request)
+        if getattr(settings, 'METRICS_ENABLED', True):
+            metrics.observe_request(
+                view_label, request, response, timings, total
+            )
+
+        budget = query_budget(request)
+        budgeted = timings.queries - timings.unbudgeted
+        over_budget = budget is not None and budgeted > budget
+        level = logging.WARNING if over_budget else logging.INFO
+        if logger.isEnabledFor(level):
+            record = {
+                'view': view_label,
+                'method': request.method,
+                'path': request.path,
+                'status': response.status_code,
+                'queries': timings.queries,
+            }
+            record.update(
+                (f'{name}_ms', round(seconds * 1000, 2))
+                for name, seconds in phases.items()
+            )
+            if over_budget:
+                record['query_budget'] = budget
+                record['budgeted_queries'] = budgeted
+            logger.log(level, json.dumps(record), extra={'timing': record})
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._timing_view_start = time.perf_counter()
+
+    def process_exception(self, request, exception):
+        if getattr(settings, 'METRICS_ENABLED', True):
+            metrics.observe_exception(view_name(request), exception)
+
+    def process_template_response(self, request, response):
+        # Called once the view has returned, before the response renders.
+        request._timing_view_end = time.perf_counter()
+        return response
@@ -2,6 +2,8 @@ from django.db import models
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager,\
                                     PermissionsMixin
 from django.conf import settings                                    
+
+from . import hashers
 # Create your models here.
 class UserManager(BaseUserManager):
 
@@ -34,3 +36,20 @@ class User(AbstractBaseUser, PermissionsMixin):
     objects = UserManager()
     USERNAME_FIELD = 'email'
 
+    def set_password(self, raw_password):
+        """Hash raw_password on the bounded password hashing pool"""
+        self.password = hashers.make_password(raw_password)
+        self._password = raw_password
+
+    def check_password(self, raw_password):
+        """Verify raw_password on the hashing pool, upgrading its hash
+
+        A correct password stored with an outdated hasher or work factor is
+        rehashed with the current one, without counting as a change.
+        """
+        valid = hashers.check_password(raw_password, self.password)
+        if valid and hashers.must_upgrade(self.password):
+            self.set_password(raw_password)
+            self._password = None
+            self.save(update_fields=['password'])
+        return valid
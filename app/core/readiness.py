@@ -0,0 +1,71 @@
+import logging
+import random
+import time
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.utils import DatabaseError
+
+logger = logging.getLogger(__name__)
+
+
+def probe(alias=DEFAULT_DB_ALIAS):
+    """Open a connection to alias and run a trivial query on it
+
+    Raises DatabaseError (usually OperationalError) when the database is
+    not reachable or not accepting queries yet.
+    """
+    with connections[alias].cursor() as cursor:
+        cursor.execute('SELECT 1')
+        cursor.fetchone()
+
+
+def backoff(attempt, interval=0.5, max_interval=5.0):
+    """Return the delay before retry `attempt`, with full jitter"""
+    return random.uniform(0, min(max_interval, interval * 2 ** attempt))
+
+
+def wait(aliases=(DEFAULT_DB_ALIAS,), timeout=60.0, interval=0.5,
+         max_interval=5.0, on_retry=None):
+    """Block until every alias answers a probe, or timeout elapses
+
+    Retries back off exponentially with jitter so a fleet of containers
+    starting together does not hammer the database in lockstep. Raises
+    the last DatabaseError once timeout has passed.
+    """
+    deadline = time.monotonic() + timeout
+    for alias in aliases:
+        attempt = 0
+        while True:
+            try:
+                probe(alias)
+                break
+            except DatabaseError as exc:
+                connections[alias].close()
+                delay = backoff(attempt, interval, max_interval)
+                if time.monotonic() + delay > deadline:
+                    raise
+                if on_retry:
+                    on_retry(alias, exc, delay)
+                time.sleep(delay)
+                attempt += 1
+
+
+def warm_up(aliases=None):
+    """Open and validate this thread's connection to each alias
+
+    With CONN_MAX_AGE set the connections stay open for the requests this
+    thread serves next. Returns the seconds each connection took.
+    """
+    timings = {}
+    for alias in aliases or connections:
+        connection = connections[alias]
+        connection.close_if_unusable_or_obsolete()
+        start = time.perf_counter()
+        probe(alias)
+        timings[alias] = time.perf_counter() - start
+        if not connection.settings_dict['CONN_MAX_AGE']:
+            logger.warning(
+                'CONN_MAX_AGE is 0 for %r, so the warmed connection is '
+                'closed as soon as a request starts', alias
+            )
+    return timings
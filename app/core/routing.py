@@ -0,0 +1,212 @@
+import asyncio
+import contextvars
+import hashlib
+import logging
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.utils import DatabaseError
+
+from . import asyncviews, readiness
+
+logger = logging.getLogger(__name__)
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+_reads = contextvars.ContextVar('replica_reads', default=None)
+
+
+class ReplicaHealth:
+    """Per-process record of which replicas passed their last check
+
+    A replica is probed at most once per DB_REPLICA_CHECK_INTERVAL. It is
+    unhealthy when the probe fails or, on PostgreSQL, when it lags behind
+    the primary by more than DB_REPLICA_MAX_LAG seconds.
+    """
+
+    def __init__(self):
+        self._checked = {}
+        self._lock = threading.Lock()
+
+    @property
+    def interval(self):
+        return getattr(settings, 'DB_REPLICA_CHECK_INTERVAL', 10)
+
+    def is_healthy(self, alias):
+        now = time.monotonic()
+        with self._lock:
+            checked = self._checked.get(alias)
+            if checked is not None and checked[0] > now:
+                return checked[1]
+            # Other threads keep the previous verdict while this one checks
+            self._checked[alias] = (
+                now + self.interval, checked[1] if checked else True
+            )
+        healthy = self.check(alias)
+        with self._lock:
+            self._checked[alias] = (now + self.interval, healthy)
+        return healthy
+
+    def check(self, alias):
+        try:
+            readiness.probe(alias)
+            lag = replication_lag(alias)
+        except DatabaseError as exc:
+            logger.warning('Replica %r failed its health check: %s',
+                           alias, exc)
+            connections[alias].close()
+            return False
+        max_lag = getattr(settings, 'DB_REPLICA_MAX_LAG', 5)
+        if lag > max_lag:
+            logger.warning('Replica %r is %.1fs behind the primary',
+                           alias, lag)
+            return False
+        return True
+
+    def clear(self):
+        with self._lock:
+            self._checked.clear()
+
+
+health = ReplicaHealth()
+
+
+def replication_lag(alias):
+    """Return how many seconds alias is behind its primary"""
+    connection = connections[alias]
+    if connection.vendor != 'postgresql':
+        return 0.0
+    with connection.cursor() as cursor:
+        # A replica that has replayed everything it received is current,
+        # however long ago the last write on the primary was.
+        cursor.execute(
+            'SELECT CASE WHEN NOT pg_is_in_recovery() OR '
+            'pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 '
+            'ELSE EXTRACT(EPOCH FROM '
+            'now() - pg_last_xact_replay_timestamp()) END'
+        )
+        return float(cursor.fetchone()[0] or 0)
+
+
+def healthy_replicas():
+    return [
+        alias for alias in getattr(settings, 'DB_REPLICAS', ())
+        if health.is_healthy(alias)
+    ]
+
+
+def _sticky_key(request):
+    """Return a cache key for whoever made request, or None if anonymous"""
+    credential = request.META.get('HTTP_AUTHORIZATION') or \
+        request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+    if not credential:
+        return None
+    digest = hashlib.sha256(credential.encode()).hexdigest()
+    return f'db:primary:{digest}'
+
+
+def _sticky_cache():
+    return caches[getattr(settings, 'DB_STICKY_CACHE_ALIAS', 'default')]
+
+
+def read_alias(request):
+    """Return the database alias request should read from"""
+    if request.method not in SAFE_METHODS:
+        return DEFAULT_DB_ALIAS
+    key = _sticky_key(request)
+    if key is not None and _sticky_cache().get(key):
+        return DEFAULT_DB_ALIAS
+    replicas = healthy_replicas()
+    return random.choice(replicas) if replicas else DEFAULT_DB_ALIAS
+
+
+def stick_to_primary(request):
+    """Send the reads of request's client to the primary for a while"""
+    key = _sticky_key(request)
+    seconds = getattr(settings, 'DB_STICKY_SECONDS', 5)
+    if key is not None and seconds > 0:
+        _sticky_cache().set(key, True, seconds)
+
+
+def _primary_models():
+    return {
+        label.lower()
+        for label in getattr(settings, 'DB_PRIMARY_MODELS', ())
+    }
+
+
+class ReplicaRouter:
+    """Route reads to the replica chosen for the current request
+
+    Outside a request, and for the rest of a request once it has written
+    anything, reads go to the primary. So do reads of DB_PRIMARY_MODELS.
+    """
+
+    def db_for_read(self, model, **hints):
+        state = _reads.get()
+        if not state:
+            return None
+        if model._meta.label_lower in _primary_models():
+            return DEFAULT_DB_ALIAS
+        return state['alias']
+
+    def db_for_write(self, model, **hints):
+        state = _reads.get()
+        if state:
+            state['alias'] = DEFAULT_DB_ALIAS
+            state['wrote'] = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        return True
+
+
+class ReplicaRoutingMiddleware:
+    """Pick the database each request reads from
+
+    Safe requests read from a healthy replica, unless the same client
+    wrote within the last DB_STICKY_SECONDS, so users always see their own
+    writes. The choice lives in a context variable, which follows the
+    request onto the async views' ORM threads.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        state = {'alias': read_alias(request), 'wrote': False}
+        token = _reads.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _reads.reset(token)
+        return self.finish(request, response, state)
+
+    async def __acall__(self, request):
+        # Health checks may hit the database, so they run off the loop
+        alias = await asyncviews.run_in_pool(read_alias, request)
+        state = {'alias': alias, 'wrote': False}
+        token = _reads.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _reads.reset(token)
+        return self.finish(request, response, state)
+
+    def finish(self, request, response, state):
+        written = state['wrote'] or request.method not in SAFE_METHODS
+        if written and response.status_code < 400:
+            stick_to_primary(request)
+        return response
@@ -0,0 +1,239 @@
+import csv
+import io
+import math
+import random
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import connection, transaction
+
+from recipe.models import Ingredients, Recipe, Tag
+from recipe.search import update_search_vectors
+
+# Per user means; individual users vary around them with a long tail.
+PRESETS = {
+    'tiny': {'users': 10, 'recipes': 20, 'tags': 8, 'ingredients': 25},
+    'small': {'users': 200, 'recipes': 50, 'tags': 15, 'ingredients': 60},
+    'medium': {'users': 2000, 'recipes': 200, 'tags': 25, 'ingredients': 120},
+    'large': {'users': 5000, 'recipes': 400, 'tags': 30, 'ingredients': 150},
+}
+
+# Roughly in order of popularity; names are drawn with Zipf weights.
+TAG_NAMES = (
+    'dinner', 'quick', 'vegetarian', 'lunch', 'breakfast', 'healthy',
+    'dessert', 'vegan', 'comfort food', 'gluten free', 'baking', 'soup',
+    'salad', 'spicy', 'kids', 'budget', 'meal prep', 'party', 'summer',
+    'winter', 'brunch', 'snack', 'holiday', 'low carb', 'one pot',
+)
+INGREDIENT_NAMES = (
+    'salt', 'pepper', 'olive oil', 'garlic', 'onion', 'butter', 'sugar',
+    'flour', 'egg', 'milk', 'water', 'lemon', 'tomato', 'carrot', 'rice',
+    'chicken', 'parsley', 'basil', 'cheese', 'potato', 'ginger', 'soy sauce',
+    'honey', 'cream', 'beef', 'pasta', 'chili', 'cumin', 'paprika', 'lime',
+    'spinach', 'mushroom', 'bell pepper', 'coriander', 'yogurt', 'vinegar',
+    'salmon', 'tofu', 'beans', 'cinnamon', 'vanilla', 'oats', 'avocado',
+    'bacon', 'zucchini', 'celery', 'thyme', 'rosemary', 'chickpeas', 'corn',
+)
+TITLE_WORDS = (
+    'roasted', 'creamy', 'spicy', 'easy', 'grilled', 'baked', 'classic',
+    'crispy', 'smoky', 'herby', 'lemony', 'sticky', 'slow cooked', 'fresh',
+)
+TITLE_DISHES = (
+    'stew', 'curry', 'salad', 'soup', 'pie', 'tart', 'stir fry', 'bowl',
+    'pasta', 'risotto', 'tacos', 'bake', 'skewers', 'pancakes', 'cake',
+)
+
+
+def _names(vocabulary, count):
+    """Return count distinct names, most popular first"""
+    size = len(vocabulary)
+    return [
+        vocabulary[index] if index < size
+        else f'{vocabulary[index % size]} {index // size}'
+        for index in range(count)
+    ]
+
+
+def _zipf_weights(count):
+    weights, total = [], 0.0
+    for rank in range(1, count + 1):
+        total += 1 / rank
+        weights.append(total)
+    return weights
+
+
+class Seeder:
+    """Generate users, tags, ingredients and recipes in bulk
+
+    Rows are written with bulk_create in batches and the M2M links, by far
+    the largest tables, with COPY on PostgreSQL. Every user shares one
+    password hashed once up front. Output only depends on the arguments,
+    so the same seed always produces the same data.
+    """
+
+    def __init__(self, users, recipes, tags, ingredients, seed=0,
+                 password='password', prefix='seed', batch_size=5000,
+                 log=None):
+        self.users = users
+        self.recipes = recipes
+        self.tags = tags
+        self.ingredients = ingredients
+        self.rng = random.Random(seed)
+        self.password = password
+        self.prefix = prefix
+        self.batch_size = batch_size
+        self.log = log or (lambda message: None)
+        self.counts = {'users': 0, 'tags': 0, 'ingredients': 0,
+                       'recipes': 0, 'links': 0}
+
+    def _size(self, mean, minimum=1):
+        """Draw a per user count from a log-normal around mean"""
+        if mean <= minimum:
+            return max(mean, minimum)
+        sigma = 0.8
+        value = self.rng.lognormvariate(
+            math.log(mean) - sigma ** 2 / 2, sigma
+        )
+        return max(minimum, min(int(value), mean * 20))
+
+    def _pick(self, ids, weights, low, high):
+        """Pick between low and high distinct ids, favouring the first"""
+        count = min(self.rng.randint(low, high), len(ids))
+        return list(dict.fromkeys(
+            self.rng.choices(ids, cum_weights=weights[:len(ids)], k=count)
+        ))
+
+    def _insert(self, model, objs):
+        """Bulk insert objs and make sure each one has its primary key"""
+        for start in range(0, len(objs), self.batch_size):
+            batch = objs[start:start + self.batch_size]
+            model.objects.bulk_create(batch)
+            if batch[0].pk is None:
+                # Only PostgreSQL returns the new keys; elsewhere they are
+                # the last ids handed out, as nothing else writes meanwhile.
+                pks = model.objects.order_by('-pk').values_list(
+                    'pk', flat=True
+                )[:len(batch)]
+                for obj, pk in zip(batch, reversed(list(pks))):
+                    obj.pk = pk
+        return objs
+
+    def _link(self, field, rows):
+        """Insert (recipe_id, other_id) rows into a recipe M2M table"""
+        if not rows:
+            return
+        field = Recipe._meta.get_field(field)
+        through = field.remote_field.through
+        columns = ['recipe_id', f'{field.m2m_reverse_field_name()}_id']
+        if connection.vendor == 'postgresql':
+            buffer = io.StringIO()
+            csv.writer(buffer).writerows(rows)
+            buffer.seek(0)
+            quote = connection.ops.quote_name
+            with connection.cursor() as cursor:
+                cursor.copy_expert(
+                    f'COPY {quote(through._meta.db_table)} '
+                    f'({", ".join(quote(column) for column in columns)}) '
+                    f'FROM STDIN WITH (FORMAT csv)',
+                    buffer,
+                )
+        else:
+            through.objects.bulk_create([
+                through(**dict(zip(columns, row))) for row in rows
+            ], batch_size=self.batch_size)
+        self.counts['links'] += len(rows)
+
+    def _seed_users(self, numbers, hashed):
+        users = self._insert(get_user_model(), [
+            get_user_model()(
+                email=f'{self.prefix}{number}@example.com',
+                name=f'{self.prefix.title()} User {number}',
+                password=hashed,
+            )
+            for number in numbers
+        ])
+        self.counts['users'] += len(users)
+        return users
+
+    def _seed_attrs(self, model, users, mean, vocabulary):
+        """Create each user's tags or ingredients, returning ids per user"""
+        objs, owners = [], []
+        for user in users:
+            for name in _names(vocabulary, self._size(mean)):
+                objs.append(model(user_id=user.pk, name=name))
+                owners.append(user.pk)
+        self._insert(model, objs)
+        ids = {user.pk: [] for user in users}
+        for owner, obj in zip(owners, objs):
+            ids[owner].append(obj.pk)
+        return ids
+
+    def _seed_recipes(self, users, tag_ids, ingredient_ids):
+        recipes, tag_picks, ingredient_picks = [], [], []
+        weights = _zipf_weights(
+            max([len(ids) for ids in tag_ids.values()] +
+                [len(ids) for ids in ingredient_ids.values()] + [1])
+        )
+        for user in users:
+            for _ in range(self._size(self.recipes)):
+                recipes.append(Recipe(
+                    user_id=user.pk,
+                    title=f'{self.rng.choice(TITLE_WORDS)} '
+                          f'{self.rng.choice(INGREDIENT_NAMES)} '
+                          f'{self.rng.choice(TITLE_DISHES)}',
+                    time_minutes=self.rng.choice(
+                        (10, 15, 20, 30, 45, 60, 90)
+                    ),
+                    price=Decimal(self.rng.randint(100, 6000)) / 100,
+                ))
+                tag_picks.append(self._pick(tag_ids[user.pk], weights, 1, 3))
+                ingredient_picks.append(
+                    self._pick(ingredient_ids[user.pk], weights, 2, 10)
+                )
+        self._insert(Recipe, recipes)
+        self._link('tag', [
+            (recipe.pk, pk)
+            for recipe, picks in zip(recipes, tag_picks) for pk in picks
+        ])
+        self._link('ingredients', [
+            (recipe.pk, pk)
+            for recipe, picks in zip(recipes, ingredient_picks)
+            for pk in picks
+        ])
+        update_search_vectors(recipe.pk for recipe in recipes)
+        self.counts['recipes'] += len(recipes)
+
+    def run(self):
+        """Generate everything and return the first user created"""
+        hashed = make_password(self.password)
+        first = None
+        # Users are handled in chunks small enough that one chunk's
+        # recipes fit comfortably in memory.
+        chunk = max(1, self.batch_size // max(self.recipes, 1))
+        for start in range(0, self.users, chunk):
+            numbers = range(start, min(start + chunk, self.users))
+            with transaction.atomic():
+                users = self._seed_users(numbers, hashed)
+                tag_ids = self._seed_attrs(Tag, users, self.tags, TAG_NAMES)
+                ingredient_ids = self._seed_attrs(
+                    Ingredients, users, self.ingredients, INGREDIENT_NAMES
+                )
+                self.counts['tags'] += sum(map(len, tag_ids.values()))
+                self.counts['ingredients'] += sum(
+                    map(len, ingredient_ids.values())
+                )
+                self._seed_recipes(users, tag_ids, ingredient_ids)
+            first = first or users[0]
+            self.log(
+                f'{self.counts["users"]}/{self.users} users, '
+                f'{self.counts["recipes"]} recipes'
+            )
+
+        if connection.vendor == 'postgresql':
+            quote = connection.ops.quote_name
+            with connection.cursor() as cursor:
+                for model in (Recipe, Tag, Ingredients,
+                              Recipe.tag.through, Recipe.ingredients.through):
+                    cursor.execute(f'ANALYZE {quote(model._meta.db_table)}')
+        return first
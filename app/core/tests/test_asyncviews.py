@@ -0,0 +1,242 @@
+import asyncio
+import json
+import threading
+from unittest.mock import patch
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.test import (
+    AsyncClient, SimpleTestCase, TransactionTestCase, override_settings,
+)
+from django.http import StreamingHttpResponse
+from django.urls import resolve, reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core import asyncviews
+from core.asyncviews import AsyncViewsASGIHandler
+from recipe.models import Recipe, Tag
+
+from .test_middleware import server_timing
+
+RECIPE_URL = reverse('recipe:recipe-list')
+TAG_URL = reverse('recipe:tag-list')
+ME_URL = reverse('user:me')
+
+
+# The views run on pool threads with their own database connections, which
+# only see committed data.
+@override_settings(ROOT_URLCONF='app.urls_async',
+                   RECIPE_RESPONSE_CACHE_TIMEOUT=0)
+class AsyncViewsTests(TransactionTestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'async@api.com', '12345', name='Async'
+        )
+        self.recipe = Recipe.objects.create(
+            user=self.user, title='Soup', time_minutes=5, price=2.00
+        )
+        self.recipe.tag.add(Tag.objects.create(user=self.user, name='Vegan'))
+        token = Token.objects.create(user=self.user)
+        self.auth = {'authorization': f'Token {token.key}'}
+        self.client = AsyncClient()
+
+    async def fetch(self, url):
+        return await self.client.get(url, **self.auth)
+
+    def expected(self, url):
+        """Return the sync view's response body for url"""
+        client = APIClient()
+        client.force_authenticate(self.user)
+        return client.get(url).json()
+
+    def test_read_routes_are_async(self):
+        """Test the read-heavy routes resolve to async views"""
+        for url in (RECIPE_URL, TAG_URL, ME_URL,
+                    reverse('recipe:recipe-detail', args=[self.recipe.id]),
+                    reverse('recipe:ingredients-list')):
+            with self.subTest(url=url):
+                func = resolve(url).func
+                self.assertTrue(asyncio.iscoroutinefunction(func))
+        self.assertFalse(asyncio.iscoroutinefunction(
+            resolve(reverse('user:token')).func
+        ))
+
+    def test_async_views_match_sync(self):
+        """Test async views return what the sync views return"""
+        for url in (RECIPE_URL, TAG_URL, ME_URL,
+                    reverse('recipe:recipe-detail', args=[self.recipe.id])):
+            with self.subTest(url=url):
+                res = async_to_sync(self.fetch)(url)
+
+                self.assertEqual(res.status_code, 200)
+                self.assertEqual(json.loads(res.content), self.expected(url))
+
+    async def test_views_run_on_orm_pool(self):
+        """Test views run on the ORM pool, not the event loop thread"""
+        threads = []
+        dispatch = asyncviews._run
+
+        def record(*args):
+            threads.append(threading.current_thread().name)
+            return dispatch(*args)
+
+        with patch.object(asyncviews, '_run', record):
+            await self.client.get(RECIPE_URL, **self.auth)
+
+        self.assertEqual(len(threads), 1)
+        self.assertTrue(threads[0].startswith('orm'))
+
+    async def test_server_timing_counts_pool_queries(self):
+        """Test queries run on the pool thread are reported"""
+        with self.assertLogs('core.timing', 'INFO') as logs:
+            res = await self.client.get(RECIPE_URL, **self.auth)
+
+        metrics = server_timing(res)
+        self.assertNotEqual(metrics['db']['desc'], '"0 queries"')
+        self.assertGreater(float(metrics['serializer']['dur']), 0)
+        self.assertEqual(
+            json.loads(logs.records[-1].getMessage())['view'],
+            'RecipeViewSet.list'
+        )
+
+    async def test_writes_still_allowed(self):
+        """Test async routes keep their other methods"""
+        res = await self.client.patch(
+            ME_URL, {'name': 'Renamed'}, content_type='application/json',
+            **self.auth
+        )
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(json.loads(res.content)['name'], 'Renamed')
+
+    @override_settings(ASYNC_ORM_WORKERS=2)
+    def test_pool_sized_by_setting(self):
+        """Test the pool follows ASYNC_ORM_WORKERS"""
+        self.assertEqual(asyncviews._pool()._max_workers, 2)
+
+
+class IterateInPoolTests(SimpleTestCase):
+
+    async def test_items_produced_on_one_pool_thread(self):
+        """Test a sync iterable is advanced and closed on one ORM thread"""
+        threads = set()
+
+        def numbers():
+            try:
+                for number in range(10):
+                    threads.add(threading.current_thread().name)
+                    yield number
+            finally:
+                threads.add(threading.current_thread().name)
+
+        items = [item async for item in asyncviews.iterate_in_pool(
+            numbers(), buffer=2
+        )]
+
+        self.assertEqual(items, list(range(10)))
+        self.assertEqual(len(threads), 1)
+        self.assertTrue(threads.pop().startswith('orm'))
+
+    async def test_stopping_early_closes_iterable(self):
+        """Test abandoning the iteration stops and closes the producer"""
+        closed = threading.Event()
+
+        def endless():
+            try:
+                while True:
+                    yield b'x'
+            finally:
+                closed.set()
+
+        parts = asyncviews.iterate_in_pool(endless(), buffer=2)
+        self.assertEqual(await parts.__anext__(), b'x')
+        await parts.aclose()
+
+        self.assertTrue(closed.is_set())
+
+    async def test_errors_reach_the_consumer(self):
+        """Test an exception raised by the iterable is raised again"""
+        def failing():
+            yield 1
+            raise ValueError('boom')
+
+        with self.assertRaises(ValueError):
+            async for _ in asyncviews.iterate_in_pool(failing()):
+                pass
+
+
+class StreamingResponseTests(SimpleTestCase):
+
+    def body(self, closed):
+        """Return a streaming response that sets closed once closed"""
+        def parts():
+            try:
+                while True:
+                    yield b'x' * 10
+            finally:
+                closed.set()
+
+        return StreamingHttpResponse(parts())
+
+    @override_settings(ASYNC_STREAM_SEND_TIMEOUT=0.05)
+    async def test_slow_client_abandoned(self):
+        """Test a client that stops reading has its body closed"""
+        closed = threading.Event()
+        sent = []
+
+        async def send(message):
+            sent.append(message)
+            if message['type'] == 'http.response.body':
+                await asyncio.sleep(10)
+
+        with self.assertLogs('core.asyncviews', 'WARNING'):
+            await AsyncViewsASGIHandler().send_response(
+                self.body(closed), send
+            )
+
+        self.assertTrue(closed.is_set())
+        self.assertEqual(len(sent), 2)
+        self.assertTrue(sent[-1]['more_body'])
+
+    async def test_bodies_produced_on_stream_pool(self):
+        """Test streamed bodies run on their own pool, not the ORM one"""
+        threads = []
+
+        def parts():
+            threads.append(threading.current_thread().name)
+            yield b'x'
+
+        sent = []
+
+        async def send(message):
+            sent.append(message)
+
+        await AsyncViewsASGIHandler().send_response(
+            StreamingHttpResponse(parts()), send
+        )
+
+        self.assertTrue(threads[0].startswith('stream'))
+        self.assertFalse(sent[-1].get('more_body'))
+
+    async def test_full_stream_pool_is_unavailable(self):
+        """Test a 503 is sent while every stream thread is busy"""
+        closed = threading.Event()
+        sent = []
+
+        async def send(message):
+            sent.append(message)
+
+        slots = threading.BoundedSemaphore(1)
+        slots.acquire()
+        with patch('core.asyncviews._stream_pool',
+                   return_value=(None, slots)):
+            await AsyncViewsASGIHandler().send_response(
+                self.body(closed), send
+            )
+
+        self.assertEqual(sent[0]['status'], 503)
+        self.assertIn((b'Retry-After', b'1'), sent[0]['headers'])
+        self.assertIn(b'detail', sent[1]['body'])
+        self.assertFalse(closed.is_set())
@@ -0,0 +1,142 @@
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.authentication import token_cache
+
+ME_URL = reverse('user:me')
+
+SHARED_CACHE = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'auth': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'auth-tests',
+    },
+}
+
+
+class CachedTokenAuthenticationTests(TestCase):
+    """Test the cached token authentication backend"""
+
+    def setUp(self):
+        token_cache.clear()
+        self.user = get_user_model().objects.create_user(
+            email='token@cc.com',
+            password='123456',
+            name='Token user'
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def tearDown(self):
+        token_cache.clear()
+
+    def test_second_request_skips_token_lookup(self):
+        """Test a cached token does not query the database again"""
+        self.client.get(ME_URL)
+
+        with self.assertNumQueries(0):
+            res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['email'], self.user.email)
+
+    def test_deleted_token_is_rejected(self):
+        """Test deleting a token invalidates the cached entry"""
+        self.client.get(ME_URL)
+        self.token.delete()
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivated_user_is_rejected(self):
+        """Test deactivating a user invalidates the cached entry"""
+        self.client.get(ME_URL)
+        self.user.is_active = False
+        self.user.save()
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_changed_user_is_reloaded(self):
+        """Test changes to the user are visible on the next request"""
+        self.client.get(ME_URL)
+        self.user.name = 'Renamed'
+        self.user.save()
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.data['name'], 'Renamed')
+
+    @override_settings(TOKEN_CACHE_TTL=10)
+    def test_entries_expire(self):
+        """Test entries are looked up again once the ttl has passed"""
+        with patch('core.authentication.time.monotonic', return_value=100):
+            self.client.get(ME_URL)
+        with patch('core.authentication.time.monotonic', return_value=111):
+            with self.assertNumQueries(1):
+                self.client.get(ME_URL)
+
+    @override_settings(TOKEN_CACHE_SIZE=1)
+    def test_least_recently_used_entry_is_evicted(self):
+        """Test the cache never grows beyond its configured size"""
+        other = get_user_model().objects.create_user(
+            email='other@cc.com',
+            password='123456'
+        )
+        other_token = Token.objects.create(user=other)
+        self.client.get(ME_URL)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {other_token.key}')
+        self.client.get(ME_URL)
+
+        self.assertIsNone(token_cache.get(self.token.key))
+        self.assertIsNotNone(token_cache.get(other_token.key))
+
+    @override_settings(CACHES=SHARED_CACHE, TOKEN_CACHE_ALIAS='auth')
+    def test_shared_tier_is_used_by_other_workers(self):
+        """Test a cold local tier is filled from the shared cache"""
+        self.client.get(ME_URL)
+        token_cache.clear()
+
+        with self.assertNumQueries(0):
+            res = self.client.get(ME_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        self.token.delete()
+        token_cache.clear()
+        res = self.client.get(ME_URL)
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @override_settings(CACHES=SHARED_CACHE, TOKEN_CACHE_ALIAS='auth')
+    def test_password_hash_not_cached(self):
+        """Test no cache tier holds the user's password hash"""
+        self.client.get(ME_URL)
+
+        shared = token_cache.shared.get(
+            token_cache._shared_key(self.token.key)
+        )
+        self.assertNotIn(self.user.password, repr(shared))
+        self.assertNotIn(self.user.password, repr(token_cache._entries))
+
+    def test_hits_get_their_own_instances(self):
+        """Test every cache hit builds separate model instances"""
+        self.client.get(ME_URL)
+
+        user, token = token_cache.get(self.token.key)
+        other, _ = token_cache.get(self.token.key)
+
+        self.assertIsNot(user, other)
+        self.assertIsNot(user._state, other._state)
+        self.assertIs(token.user, user)
+        self.assertEqual(user.email, self.user.email)
+        self.assertTrue(user.check_password('123456'))
@@ -0,0 +1,88 @@
+import os
+import tempfile
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+
+from core import benchmark
+
+
+def result(p50=1.0, queries=2, peak_kib=100.0):
+    return {
+        'p50_ms': p50, 'p95_ms': p50 * 2, 'p99_ms': p50 * 3,
+        'mean_ms': p50, 'queries': queries, 'peak_kib': peak_kib,
+    }
+
+
+class BenchmarkTests(TestCase):
+
+    def test_percentile(self):
+        """Test percentiles interpolate between samples"""
+        samples = [float(value) for value in range(1, 101)]
+        self.assertEqual(benchmark.percentile(samples, 50), 50.5)
+        self.assertAlmostEqual(benchmark.percentile(samples, 99), 99.01)
+        self.assertEqual(benchmark.percentile([3.0], 95), 3.0)
+
+    def test_compare_within_tolerance(self):
+        """Test noise inside the tolerance is not a regression"""
+        baseline = {'endpoints': {'recipe:tag-list': result()}}
+        current = {'recipe:tag-list': result(p50=1.2, peak_kib=110)}
+        self.assertEqual(benchmark.compare(current, baseline), [])
+
+    def test_compare_reports_regressions(self):
+        """Test slower responses and extra queries are reported"""
+        baseline = {'endpoints': {
+            'recipe:tag-list': result(),
+            'user:me': result(),
+        }}
+        current = {
+            'recipe:tag-list': result(p50=10.0),
+            'user:me': result(queries=3),
+        }
+        regressions = benchmark.compare(current, baseline)
+
+        self.assertEqual(len(regressions), 4)
+        self.assertTrue(regressions[0].startswith('recipe:tag-list: p50_ms'))
+        self.assertEqual(regressions[-1], 'user:me: queries 3 > 2')
+
+    @override_settings(RECIPE_RESPONSE_CACHE_TIMEOUT=0)
+    def test_run_covers_every_route(self):
+        """Test the benchmark exercises the recipe and user routes"""
+        user = benchmark.seed(users=2, recipes=3, tags=3, ingredients=3)
+        results = benchmark.run(
+            user, iterations=2, warmup=0, only=['recipe:', 'user:me']
+        )
+
+        self.assertIn('recipe:recipe-bulk PATCH', results)
+        self.assertIn('recipe:recipe-upload-image POST', results)
+        self.assertIn('recipe:recipe-export?type=csv', results)
+        self.assertIn('user:me PATCH', results)
+        self.assertEqual(results['recipe:tag-list']['queries'], 2)
+        for name, measured in results.items():
+            self.assertLessEqual(measured['p50_ms'], measured['p99_ms'])
+
+    def test_missing_baseline_is_an_error(self):
+        """Test a run without a baseline fails instead of passing silently"""
+        with tempfile.TemporaryDirectory() as directory:
+            with self.assertRaisesMessage(CommandError, 'No baseline'):
+                call_command(
+                    'benchmark', '--noinput',
+                    baseline=os.path.join(directory, 'baseline.json'),
+                )
+
+
+@override_settings(RECIPE_RESPONSE_CACHE_TIMEOUT=0)
+class ServingBenchmarkTests(TransactionTestCase):
+
+    def test_serve_compares_modes(self):
+        """Test both serving modes are measured with the same threads"""
+        user = benchmark.seed(users=1, recipes=3, tags=3, ingredients=3)
+
+        results = benchmark.serve(user, requests=10, workers=2,
+                                  concurrency=5)
+
+        self.assertEqual(set(results), {'wsgi', 'asgi'})
+        for result in results.values():
+            self.assertEqual(result['threads'], 2)
+            self.assertGreater(result['req_per_s'], 0)
+        self.assertEqual(results['asgi']['in_flight'], 5)
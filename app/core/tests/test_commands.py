@@ -1,21 +1,64 @@
+from io import StringIO
 from unittest.mock import patch
-from django.core.management import call_command
+from django.core.management import CommandError, call_command
 from django.db.utils import OperationalError
 from django.test import TestCase
 
+from core import readiness
+
+
+@patch('core.readiness.connections')
 class CommandTest(TestCase):
 
-    def test_wait_for_db_ready(self):
+    @patch('core.readiness.probe')
+    def test_wait_for_db_ready(self, probe, connections):
         """Test waiting for db when db is availble"""
-        with patch('django.db.utils.ConnectionHandler.__getitem__') as gi:
-            gi.return_value = True
-            call_command('wait_for_db')
-            self.assertEqual(gi.call_count, 1)
+        call_command('wait_for_db', stdout=StringIO())
+        probe.assert_called_once_with('default')
 
     @patch('time.sleep',return_value=True)
-    def test_wait_for_db(self, ts):
+    @patch('core.readiness.probe')
+    def test_wait_for_db(self, probe, ts, connections):
         """Test waiting for db"""
-        with patch('django.db.utils.ConnectionHandler.__getitem__') as gi:
-            gi.side_effect = [OperationalError] * 5 + [True]
-            call_command('wait_for_db')
-            self.assertEqual(gi.call_count, 6)
+        probe.side_effect = [OperationalError] * 5 + [None]
+        call_command('wait_for_db', stdout=StringIO())
+        self.assertEqual(probe.call_count, 6)
+        self.assertEqual(ts.call_count, 5)
+
+    @patch('time.sleep',return_value=True)
+    @patch('core.readiness.probe')
+    def test_wait_for_db_backs_off(self, probe, ts, connections):
+        """Test retries wait exponentially longer, up to the maximum"""
+        probe.side_effect = [OperationalError] * 6 + [None]
+        with patch('random.uniform', side_effect=lambda low, high: high):
+            call_command('wait_for_db', '--interval', '1',
+                         '--max-interval', '8', stdout=StringIO())
+        delays = [call.args[0] for call in ts.call_args_list]
+        self.assertEqual(delays, [1, 2, 4, 8, 8, 8])
+
+    @patch('time.sleep',return_value=True)
+    @patch('core.readiness.probe', side_effect=OperationalError('down'))
+    def test_wait_for_db_timeout(self, probe, ts, connections):
+        """Test the command gives up once the timeout has passed"""
+        with patch('time.monotonic', side_effect=[0, 1, 2, 3, 31]), \
+                self.assertRaises(CommandError):
+            call_command('wait_for_db', '--timeout', '30', stdout=StringIO())
+        self.assertEqual(probe.call_count, 4)
+
+    def test_probe_runs_query(self, connections):
+        """Test the probe runs a query instead of looking the alias up"""
+        readiness.probe('default')
+        cursor = connections['default'].cursor.return_value.__enter__()
+        cursor.execute.assert_called_once_with('SELECT 1')
+
+    @patch('core.readiness.probe')
+    def test_wait_for_db_warm_up(self, probe, connections):
+        """Test --warm-up opens a connection to every database"""
+        connections.__iter__.return_value = iter(['default', 'replica'])
+        out = StringIO()
+        call_command('wait_for_db', '--warm-up', stdout=out)
+        self.assertEqual(
+            [call.args[0] for call in probe.call_args_list],
+            ['default', 'default', 'replica']
+        )
+        self.assertIn('replica: connected in', out.getvalue())
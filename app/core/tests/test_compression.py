@@ -0,0 +1,107 @@
+import gzip
+import json
+import unittest
+
+from django.contrib.auth import get_user_model
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from core import compression
+from recipe.models import Recipe
+
+RECIPE_URL = reverse('recipe:recipe-list')
+
+
+def middleware(response, **headers):
+    """Run response through CompressionMiddleware for a GET to /api/"""
+    request = RequestFactory().get('/api/', **headers)
+    return compression.CompressionMiddleware(lambda request: response)(
+        request
+    )
+
+
+@override_settings(RECIPE_RESPONSE_CACHE_TIMEOUT=0, COMPRESS_MIN_SIZE=200)
+class CompressionMiddlewareTests(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'gzip@api.com', '12345'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        for index in range(20):
+            Recipe.objects.create(
+                user=self.user, title=f'Soup {index}', time_minutes=5,
+                price=2.00
+            )
+
+    def test_gzip(self):
+        """Test large JSON responses are gzipped for clients that accept it"""
+        plain = self.client.get(RECIPE_URL)
+        res = self.client.get(RECIPE_URL, HTTP_ACCEPT_ENCODING='gzip')
+
+        self.assertEqual(res['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', res['Vary'])
+        self.assertEqual(
+            json.loads(gzip.decompress(res.content)), plain.json()
+        )
+        self.assertLess(len(res.content), len(plain.content))
+        self.assertTrue(res['ETag'].startswith('W/'))
+
+    @unittest.skipIf(compression.brotli is None, 'brotli is not installed')
+    def test_brotli_preferred(self):
+        """Test brotli is used when available and accepted"""
+        res = self.client.get(RECIPE_URL,
+                              HTTP_ACCEPT_ENCODING='gzip, deflate, br')
+
+        self.assertEqual(res['Content-Encoding'], 'br')
+        self.assertEqual(len(json.loads(
+            compression.brotli.decompress(res.content)
+        )), 20)
+
+    def test_not_accepted(self):
+        """Test responses stay plain without an accepted coding"""
+        res = self.client.get(RECIPE_URL,
+                              HTTP_ACCEPT_ENCODING='gzip;q=0, identity')
+
+        self.assertNotIn('Content-Encoding', res)
+
+    @override_settings(COMPRESS_MIN_SIZE=100000)
+    def test_small_responses_not_compressed(self):
+        """Test responses under the threshold are sent as they are"""
+        res = self.client.get(RECIPE_URL, HTTP_ACCEPT_ENCODING='gzip')
+
+        self.assertNotIn('Content-Encoding', res)
+
+    def test_content_type_allow_list(self):
+        """Test only allow-listed content types are compressed"""
+        res = middleware(
+            HttpResponse(b'x' * 1000, content_type='image/jpeg'),
+            HTTP_ACCEPT_ENCODING='gzip',
+        )
+
+        self.assertNotIn('Content-Encoding', res)
+
+    def test_media_not_compressed(self):
+        """Test files under MEDIA_URL are never compressed"""
+        request = RequestFactory().get('/media/uploads/recipe/a.svg')
+        response = HttpResponse(b'<svg/>' * 1000,
+                                content_type='image/svg+xml')
+
+        self.assertFalse(compression.compressible(request, response))
+
+    def test_streaming(self):
+        """Test streaming responses are compressed as they stream"""
+        res = middleware(
+            StreamingHttpResponse(
+                (b'{"id": %d}\n' % index for index in range(100)),
+                content_type='application/x-ndjson',
+            ),
+            HTTP_ACCEPT_ENCODING='gzip',
+        )
+
+        self.assertEqual(res['Content-Encoding'], 'gzip')
+        body = gzip.decompress(b''.join(res.streaming_content))
+        self.assertEqual(len(body.splitlines()), 100)
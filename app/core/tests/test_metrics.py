@@ -0,0 +1,160 @@
+import os
+import tempfile
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from prometheus_client import REGISTRY
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core import metrics
+from core.authentication import token_cache
+
+METRICS_URL = reverse('metrics')
+RECIPE_URL = reverse('recipe:recipe-list')
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+class MetricsTests(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'metrics@api.com', '12345'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_metrics_endpoint(self):
+        """Test /metrics serves the Prometheus text format"""
+        self.client.get(RECIPE_URL)
+
+        res = self.client.get(METRICS_URL)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertTrue(res['Content-Type'].startswith('text/plain'))
+        self.assertIn(
+            b'http_requests_total{method="GET",status="200",'
+            b'view="RecipeViewSet.list"}',
+            res.content
+        )
+
+    def test_request_metrics_labelled_by_view(self):
+        """Test requests, latency, size and queries are recorded per view"""
+        labels = {'view': 'RecipeViewSet.list'}
+        before = {
+            'requests': sample('http_requests_total', method='GET',
+                               status='200', **labels),
+            'latency': sample('http_request_duration_seconds_count',
+                              method='GET', **labels),
+            'size': sample('http_response_size_bytes_count', **labels),
+            'queries': sample('db_queries_per_request_sum', **labels),
+        }
+
+        self.client.get(RECIPE_URL)
+        self.client.get(RECIPE_URL)
+
+        self.assertEqual(sample(
+            'http_requests_total', method='GET', status='200', **labels
+        ), before['requests'] + 2)
+        self.assertEqual(sample(
+            'http_request_duration_seconds_count', method='GET', **labels
+        ), before['latency'] + 2)
+        self.assertEqual(sample(
+            'http_response_size_bytes_count', **labels
+        ), before['size'] + 2)
+        self.assertGreater(
+            sample('db_queries_per_request_sum', **labels),
+            before['queries']
+        )
+
+    def test_error_status_recorded(self):
+        """Test error responses are counted by status"""
+        before = sample('http_requests_total', method='GET', status='404',
+                        view='RecipeViewSet.retrieve')
+
+        self.client.get(reverse('recipe:recipe-detail', args=[999]))
+
+        self.assertEqual(sample(
+            'http_requests_total', method='GET', status='404',
+            view='RecipeViewSet.retrieve'
+        ), before + 1)
+
+    def test_cache_metrics(self):
+        """Test response and token cache lookups are counted"""
+        token = Token.objects.create(user=self.user)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        token_cache.clear()
+        before = {
+            result: (sample('cache_requests_total', cache='token',
+                            result=result),
+                     sample('cache_requests_total', cache='response',
+                            result=result))
+            for result in ('hit', 'miss')
+        }
+
+        client.get(RECIPE_URL)
+        client.get(RECIPE_URL)
+
+        for result in ('hit', 'miss'):
+            self.assertEqual(
+                sample('cache_requests_total', cache='token', result=result),
+                before[result][0] + 1
+            )
+            self.assertEqual(
+                sample('cache_requests_total', cache='response',
+                       result=result),
+                before[result][1] + 1
+            )
+
+    def test_multiprocess_registry(self):
+        """Test a shared directory switches to the aggregating registry"""
+        with tempfile.TemporaryDirectory() as path, \
+                patch.dict(os.environ, {'prometheus_multiproc_dir': path}):
+            self.assertIsNot(metrics.registry(), REGISTRY)
+            content, _ = metrics.render()
+        self.assertEqual(content, b'')
+
+
+@override_settings(METRICS_ALLOWED_IPS=['127.0.0.1', '10.0.0.0/8'],
+                   METRICS_TOKEN='scrape-secret')
+class MetricsAccessTests(TestCase):
+
+    def test_allowed_addresses(self):
+        """Test allow-listed addresses and networks may scrape"""
+        for address in ('127.0.0.1', '10.1.2.3'):
+            res = self.client.get(METRICS_URL, REMOTE_ADDR=address)
+            self.assertEqual(res.status_code, 200, address)
+
+    def test_other_callers_forbidden(self):
+        """Test anyone else gets a 403, logged in or not"""
+        res = self.client.get(METRICS_URL, REMOTE_ADDR='203.0.113.7')
+        self.assertEqual(res.status_code, 403)
+
+        user = get_user_model().objects.create_user('m@api.com', '12345')
+        token = Token.objects.create(user=user)
+        res = self.client.get(METRICS_URL, REMOTE_ADDR='203.0.113.7',
+                              HTTP_AUTHORIZATION=f'Token {token.key}')
+        self.assertEqual(res.status_code, 403)
+
+        res = self.client.get(METRICS_URL, REMOTE_ADDR='203.0.113.7',
+                              HTTP_AUTHORIZATION='Bearer wrong')
+        self.assertEqual(res.status_code, 403)
+
+    def test_bearer_token(self):
+        """Test the scrape token works from any address"""
+        res = self.client.get(METRICS_URL, REMOTE_ADDR='203.0.113.7',
+                              HTTP_AUTHORIZATION='Bearer scrape-secret')
+        self.assertEqual(res.status_code, 200)
+
+    @override_settings(METRICS_TOKEN='')
+    def test_no_token_configured(self):
+        """Test an empty token never matches"""
+        res = self.client.get(METRICS_URL, REMOTE_ADDR='203.0.113.7',
+                              HTTP_AUTHORIZATION='Bearer ')
+        self.assertEqual(res.status_code, 403)
@@ -0,0 +1,182 @@
+import io
+import json
+import shutil
+import tempfile
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.authentication import token_cache
+from recipe.models import Ingredients, Recipe, Tag
+from recipe.views import RecipeViewSet
+
+RECIPE_URL = reverse('recipe:recipe-list')
+ME_URL = reverse('user:me')
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def server_timing(response):
+    """Parse a Server-Timing header into {name: {param: value}}"""
+    metrics = {}
+    for metric in response['Server-Timing'].split(','):
+        name, *params = metric.strip().split(';')
+        metrics[name] = dict(param.split('=', 1) for param in params)
+    return metrics
+
+
+@override_settings(RECIPE_RESPONSE_CACHE_TIMEOUT=0)
+class ServerTimingMiddlewareTests(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'timing@api.com', '12345'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        Recipe.objects.create(
+            user=self.user, title='Soup', time_minutes=5, price=2.00
+        )
+
+    def test_server_timing_header(self):
+        """Test responses report their phases and query count"""
+        res = self.client.get(RECIPE_URL)
+
+        metrics = server_timing(res)
+        self.assertEqual(
+            list(metrics), ['db', 'serializer', 'view', 'render', 'total']
+        )
+        self.assertEqual(metrics['db']['desc'], '"4 queries"')
+        self.assertGreater(float(metrics['serializer']['dur']), 0)
+        self.assertGreaterEqual(
+            float(metrics['total']['dur']), float(metrics['view']['dur'])
+        )
+
+    @override_settings(SERVER_TIMING_HEADER=False)
+    def test_header_can_be_disabled(self):
+        """Test the header is optional"""
+        res = self.client.get(RECIPE_URL)
+
+        self.assertNotIn('Server-Timing', res)
+
+    def test_log_line_names_view_and_action(self):
+        """Test each request logs one JSON line keyed by view.action"""
+        with self.assertLogs('core.timing', 'INFO') as logs:
+            self.client.get(RECIPE_URL)
+            self.client.get(ME_URL)
+
+        records = [json.loads(record.getMessage()) for record in logs.records]
+        self.assertEqual(
+            [record['view'] for record in records],
+            ['RecipeViewSet.list', 'ManageUserView.get']
+        )
+        self.assertEqual(records[0]['queries'], 4)
+        self.assertEqual(records[0]['status'], 200)
+        self.assertIn('db_ms', records[0])
+
+    def test_over_budget_logs_warning(self):
+        """Test exceeding the view's query budget is a warning"""
+        with patch.dict(RecipeViewSet.query_budgets, {'list': 1}), \
+                self.assertLogs('core.timing', 'WARNING') as logs:
+            self.client.get(RECIPE_URL)
+
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(logs.records[0].levelname, 'WARNING')
+        self.assertEqual(record['query_budget'], 1)
+
+
+def jpeg():
+    buffer = io.BytesIO()
+    Image.new('RGB', (10, 10)).save(buffer, format='JPEG')
+    buffer.seek(0)
+    buffer.name = 'image.jpg'
+    return buffer
+
+
+# Outside a test transaction, so the counts match production's: the
+# savepoints TestCase wraps atomic blocks in are not there.
+@override_settings(RECIPE_RESPONSE_CACHE_TIMEOUT=0, MEDIA_ROOT=MEDIA_ROOT)
+class TokenAuthenticatedBudgetTests(TransactionTestCase):
+    """Test real token authenticated requests stay within their budgets"""
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'budget@api.com', '12345'
+        )
+        token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        self.tag = Tag.objects.create(user=self.user, name='Vegan')
+        self.ingredient = Ingredients.objects.create(
+            user=self.user, name='Salt'
+        )
+        self.recipe = Recipe.objects.create(
+            user=self.user, title='Soup', time_minutes=5, price=2.00
+        )
+        self.recipe.tag.add(self.tag)
+        self.recipe.ingredients.add(self.ingredient)
+
+    def assertNotOverBudget(self, method, url, **kwargs):
+        """Make a request with a cold token cache and check its log line"""
+        token_cache.clear()
+        with self.assertLogs('core.timing', 'INFO') as logs:
+            res = getattr(self.client, method)(url, **kwargs)
+        self.assertLess(res.status_code, 300)
+        self.assertEqual(
+            [record.levelname for record in logs.records], ['INFO'],
+            logs.output
+        )
+        return res
+
+    def test_reads(self):
+        """Test the token lookup is not counted against read budgets"""
+        self.assertNotOverBudget('get', RECIPE_URL)
+        self.assertNotOverBudget(
+            'get', reverse('recipe:recipe-detail', args=[self.recipe.id])
+        )
+        self.assertNotOverBudget('get', reverse('recipe:tag-list'),
+                                 data={'with_counts': 1})
+        self.assertNotOverBudget('get', reverse('recipe:tag-autocomplete'),
+                                 data={'prefix': 'v'})
+        self.assertNotOverBudget('get', reverse('recipe:recipe-export'))
+
+    def test_bulk_write(self):
+        """Test bulk writes stay within budget with a real token"""
+        res = self.assertNotOverBudget(
+            'post', reverse('recipe:recipe-bulk'), data=[{
+                'title': f'recipe {index}', 'time_minutes': 5,
+                'price': '2.00', 'tag': [self.tag.id],
+                'ingredients': [self.ingredient.id],
+            } for index in range(20)], format='json'
+        )
+        ids = [item['id'] for item in res.data['results']]
+        self.assertNotOverBudget(
+            'patch', reverse('recipe:recipe-bulk'),
+            data=[{'id': pk, 'title': 'Stew'} for pk in ids], format='json'
+        )
+        self.assertNotOverBudget(
+            'delete', reverse('recipe:recipe-bulk'), data={'ids': ids},
+            format='json'
+        )
+
+    def test_upload_image(self):
+        """Test uploads stay within budget in every storage and mode"""
+        url = reverse('recipe:recipe-upload-image', args=[self.recipe.id])
+        for storage in ('uuid', 'content'):
+            for workers in (0, 1):
+                with self.subTest(storage=storage, workers=workers), \
+                        override_settings(RECIPE_IMAGE_STORAGE=storage,
+                                          RECIPE_IMAGE_WORKERS=workers):
+                    self.assertNotOverBudget(
+                        'post', url, data={'image': jpeg()},
+                        format='multipart'
+                    )
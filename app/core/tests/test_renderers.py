@@ -0,0 +1,102 @@
+import datetime
+import json
+import unittest
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from core import benchmark, renderers
+from recipe.models import Recipe
+
+RECIPE_URL = reverse('recipe:recipe-list')
+
+
+class ORJSONRendererTests(SimpleTestCase):
+
+    def test_matches_drf_json(self):
+        """Test the output is byte for byte what DRF's renderer produces"""
+        data = {
+            'id': 1, 'title': 'Soup   é', 'price': '5.50',
+            'tag': [1, 2], 'link': None, 'ok': True,
+            'at': datetime.datetime(2020, 11, 16, 12, 0, 0, 123456,
+                                    tzinfo=datetime.timezone.utc),
+        }
+        self.assertEqual(
+            renderers.ORJSONRenderer().render(data),
+            JSONRenderer().render(data),
+        )
+
+    def test_decimal_kept_exact(self):
+        """Test Decimals are rendered as exact strings"""
+        body = renderers.ORJSONRenderer().render(
+            {'price': Decimal('0.10')}
+        )
+        self.assertEqual(json.loads(body), {'price': '0.10'})
+
+    def test_indent(self):
+        """Test clients can ask for indented output"""
+        body = renderers.ORJSONRenderer().render(
+            {'id': 1}, 'application/json; indent=2'
+        )
+        self.assertEqual(body, b'{\n  "id": 1\n}')
+
+
+@override_settings(RECIPE_RESPONSE_CACHE_TIMEOUT=0)
+class NegotiationTests(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'render@api.com', '12345'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        Recipe.objects.create(
+            user=self.user, title='Soup', time_minutes=5, price='5.50'
+        )
+
+    def test_json_by_default(self):
+        """Test JSON is served when the client accepts anything"""
+        res = self.client.get(RECIPE_URL)
+
+        self.assertEqual(res['Content-Type'], 'application/json')
+        self.assertEqual(json.loads(res.content)[0]['price'], '5.50')
+
+    def test_invalid_json_rejected(self):
+        """Test malformed JSON bodies are a 400"""
+        res = self.client.post(RECIPE_URL, '{"title": ',
+                               content_type='application/json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @unittest.skipIf(renderers.msgpack is None, 'msgpack is not installed')
+    def test_msgpack_negotiated(self):
+        """Test MessagePack is served and parsed when asked for"""
+        msgpack = renderers.msgpack
+        res = self.client.get(RECIPE_URL, HTTP_ACCEPT='application/msgpack')
+
+        self.assertEqual(res['Content-Type'], 'application/msgpack')
+        self.assertEqual(msgpack.unpackb(res.content)[0]['title'], 'Soup')
+
+        res = self.client.post(
+            RECIPE_URL,
+            msgpack.packb({'title': 'Stew', 'time_minutes': 10,
+                           'price': '3.00', 'tag': [], 'ingredients': []}),
+            content_type='application/msgpack',
+            HTTP_ACCEPT='application/msgpack',
+        )
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(msgpack.unpackb(res.content)['price'], '3.00')
+
+    def test_render_times(self):
+        """Test the renderer benchmark reports every renderer"""
+        results = benchmark.render_times(self.user, iterations=2)
+
+        self.assertEqual(results['list json']['recipes'], 1)
+        self.assertEqual(results['list orjson']['bytes_per_recipe'],
+                         results['list json']['bytes_per_recipe'])
+        self.assertGreater(results['detail orjson']['us_per_recipe'], 0)
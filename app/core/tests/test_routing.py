@@ -0,0 +1,181 @@
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.db import connections
+from django.db.utils import OperationalError
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core import routing
+from recipe.models import Recipe
+
+RECIPE_URL = reverse('recipe:recipe-list')
+ME_URL = reverse('user:me')
+TOKEN_URL = reverse('user:token')
+
+
+def add_replica(alias):
+    """Create another test database, standing in for a replica"""
+    connections.databases[alias] = dict(
+        connections['default'].settings_dict, TEST={}
+    )
+    old_name = connections[alias].settings_dict['NAME']
+    connections[alias].creation.create_test_db(verbosity=0)
+    return old_name
+
+
+def remove_replica(alias, old_name):
+    connections[alias].creation.destroy_test_db(old_name, verbosity=0)
+    del connections[alias]
+    del connections.databases[alias]
+
+
+@override_settings(DB_REPLICAS=['replica'], DB_STICKY_SECONDS=60,
+                   RECIPE_RESPONSE_CACHE_TIMEOUT=0)
+class ReplicaRoutingTests(TestCase):
+    """Routing against a replica that never receives the primary's writes
+
+    Rows created on the primary after setUp are only visible to requests
+    that read from the primary.
+    """
+    @classmethod
+    def setUpClass(cls):
+        # Added here rather than in settings, so the test runner does not
+        # try to set up 'replica' before it exists.
+        cls.replica_name = add_replica('replica')
+        cls.databases = {'default', 'replica'}
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        remove_replica('replica', cls.replica_name)
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'replica@api.com', '12345', name='Replica'
+        )
+        self.token = Token.objects.create(user=self.user)
+        # Replicate the account, but nothing written after this
+        self.user.save(using='replica')
+        self.token.save(using='replica')
+        Recipe.objects.create(
+            user=self.user, title='Soup', time_minutes=5, price=2.00
+        )
+        self.client = self.token_client(self.token)
+        routing.health.clear()
+
+    def token_client(self, token):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        return client
+
+    def tearDown(self):
+        routing._sticky_cache().clear()
+
+    def test_reads_go_to_replica(self):
+        """Test safe requests read from the replica"""
+        res = self.client.get(RECIPE_URL)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.data, [])
+
+    def test_writes_go_to_primary(self):
+        """Test unsafe requests write to and read from the primary"""
+        res = self.client.patch(ME_URL, {'name': 'Primary'})
+
+        self.assertEqual(res.status_code, 200)
+        self.user.refresh_from_db(using='default')
+        self.assertEqual(self.user.name, 'Primary')
+        self.assertEqual(
+            get_user_model().objects.using('replica').get().name, 'Replica'
+        )
+
+    def test_reads_stick_to_primary_after_write(self):
+        """Test a client reads its own writes from the primary"""
+        self.client.post(RECIPE_URL, {
+            'title': 'Stew', 'time_minutes': 10, 'price': '3.00',
+        })
+
+        res = self.client.get(RECIPE_URL)
+        self.assertEqual(
+            sorted(recipe['title'] for recipe in res.data),
+            ['Soup', 'Stew']
+        )
+
+    def test_new_token_works_at_once(self):
+        """Test a token from a login is accepted by the next read"""
+        self.token.delete()
+        res = APIClient().post(TOKEN_URL, {
+            'email': 'replica@api.com', 'password': '12345',
+        })
+        token = Token.objects.get(key=res.data['token'])
+
+        res = self.token_client(token).get(RECIPE_URL)
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.data, [])
+
+    def test_sticky_is_per_client(self):
+        """Test one client's writes leave other clients on the replica"""
+        other = get_user_model().objects.create_user(
+            'other@api.com', '12345'
+        )
+        token = Token.objects.create(user=other)
+        other.save(using='replica')
+        token.save(using='replica')
+        self.client.post(RECIPE_URL, {
+            'title': 'Stew', 'time_minutes': 10, 'price': '3.00',
+        })
+        Recipe.objects.create(
+            user=other, title='Salad', time_minutes=5, price=2.00
+        )
+
+        res = self.token_client(token).get(RECIPE_URL)
+        self.assertEqual(res.data, [])
+
+    @override_settings(DB_STICKY_SECONDS=0)
+    def test_sticky_window_configurable(self):
+        """Test reads return to the replica once the window is over"""
+        self.client.post(RECIPE_URL, {
+            'title': 'Stew', 'time_minutes': 10, 'price': '3.00',
+        })
+
+        res = self.client.get(RECIPE_URL)
+        self.assertEqual(res.data, [])
+
+    def test_failed_write_does_not_stick(self):
+        """Test rejected writes leave reads on the replica"""
+        self.client.post(RECIPE_URL, {'title': ''})
+
+        res = self.client.get(RECIPE_URL)
+        self.assertEqual(res.data, [])
+
+    def test_unhealthy_replica_drops_out(self):
+        """Test reads fall back to the primary when the replica is down"""
+        # A failed check closes the connection, which is the test's here
+        with patch('core.readiness.probe', side_effect=OperationalError), \
+                patch.object(connections['replica'], 'close'), \
+                self.assertLogs('core.routing', 'WARNING'):
+            res = self.client.get(RECIPE_URL)
+
+        self.assertEqual(len(res.data), 1)
+
+    def test_health_checks_are_cached(self):
+        """Test a replica is probed once per check interval"""
+        with patch('core.readiness.probe') as probe:
+            self.client.get(RECIPE_URL)
+            self.client.get(RECIPE_URL)
+
+        probe.assert_called_once_with('replica')
+
+    def test_lagging_replica_drops_out(self):
+        """Test replicas too far behind the primary are skipped"""
+        with patch('core.routing.replication_lag', return_value=60.0), \
+                self.assertLogs('core.routing', 'WARNING'):
+            self.assertEqual(routing.healthy_replicas(), [])
+
+    def test_reads_outside_requests_use_primary(self):
+        """Test code outside a request reads from the primary"""
+        self.assertEqual(Recipe.objects.count(), 1)
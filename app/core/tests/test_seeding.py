@@ -0,0 +1,72 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db.models import F
+from django.test import TestCase
+
+from core.seeding import Seeder
+from recipe.models import Ingredients, Recipe, Tag
+
+
+class SeederTests(TestCase):
+
+    def seed(self, **kwargs):
+        params = dict(users=3, recipes=5, tags=4, ingredients=6)
+        params.update(kwargs)
+        return Seeder(**params).run()
+
+    def test_seed_creates_linked_data(self):
+        """Test every recipe links tags and ingredients of its owner"""
+        self.seed()
+
+        self.assertEqual(get_user_model().objects.count(), 3)
+        self.assertTrue(Recipe.objects.exists())
+        for recipe in Recipe.objects.all():
+            self.assertTrue(recipe.tag.exists())
+            self.assertGreaterEqual(recipe.ingredients.count(), 1)
+        self.assertFalse(Recipe.tag.through.objects.exclude(
+            tag__user=F('recipe__user')
+        ).exists())
+        self.assertFalse(Recipe.ingredients.through.objects.exclude(
+            ingredients__user=F('recipe__user')
+        ).exists())
+
+    def test_seed_shares_one_password(self):
+        """Test generated users log in with the shared password"""
+        user = self.seed(users=2, password='letmein')
+
+        self.assertEqual(user.email, 'seed0@example.com')
+        self.assertTrue(user.check_password('letmein'))
+        self.assertEqual(
+            get_user_model().objects.values('password').distinct().count(), 1
+        )
+
+    def test_seed_is_deterministic(self):
+        """Test the same seed generates the same data"""
+        self.seed(prefix='first', seed=7)
+        self.seed(prefix='second', seed=7)
+
+        first, second = (
+            list(Recipe.objects.filter(
+                user__email__startswith=prefix
+            ).order_by('id').values_list(
+                'title', 'price', 'time_minutes'
+            ))
+            for prefix in ('first', 'second')
+        )
+        self.assertEqual(first, second)
+
+    def test_seed_data_command(self):
+        """Test the command applies a preset and overrides"""
+        out = StringIO()
+        call_command(
+            'seed_data', preset='tiny', users=2, batch_size=3, stdout=out
+        )
+
+        self.assertEqual(get_user_model().objects.count(), 2)
+        self.assertEqual(
+            Tag.objects.values('user').distinct().count(), 2
+        )
+        self.assertTrue(Ingredients.objects.filter(name='salt').exists())
+        self.assertIn('2 users', out.getvalue())
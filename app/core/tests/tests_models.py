@@ -1,6 +1,9 @@
-from django.test import TestCase
+import threading
+from unittest.mock import patch
+
+from django.test import TestCase, override_settings
 from django.contrib.auth import get_user_model 
-from .. import models
+from .. import hashers
 
 def sample_user(email= 'test@email.com',password = '43322'):
     """create sample user"""
@@ -40,5 +43,27 @@ class ModelTest(TestCase):
             'password'
         )
         self.assertTrue(user.is_superuser)
-        self.assertTrue(user.is_staff)       
+        self.assertTrue(user.is_staff)
+
+    def test_password_hashed_on_pool(self):
+        """Test hashing and verifying passwords run on the hashing pool"""
+        threads = []
+        make_password = hashers.hashers.make_password
+
+        def record(password):
+            threads.append(threading.current_thread().name)
+            return make_password(password)
+
+        with patch('django.contrib.auth.hashers.make_password', record):
+            user = sample_user()
+
+        self.assertEqual(len(threads), 1)
+        self.assertTrue(threads[0].startswith('password-hash'))
+        self.assertTrue(user.check_password('43322'))
+        self.assertFalse(user.check_password('wrong'))
 
+    @override_settings(PASSWORD_HASH_WORKERS=0)
+    def test_password_hashed_inline(self):
+        """Test hashing can run on the calling thread"""
+        user = sample_user()
+        self.assertTrue(user.check_password('43322'))
@@ -0,0 +1,97 @@
+import contextvars
+import time
+from contextlib import ExitStack, contextmanager
+
+from django.db import connections
+
+_current = contextvars.ContextVar('request_timings', default=None)
+
+
+class RequestTimings:
+    """Time spent per phase of the request being handled"""
+
+    def __init__(self):
+        self.queries = 0
+        # Queries the view's query budget does not cover, see unbudgeted()
+        self.unbudgeted = 0
+        self.db = 0.0
+        self.serializer = 0.0
+        self._depth = 0
+
+    def execute_wrapper(self, execute, sql, params, many, context):
+        """connection.execute_wrapper hook counting queries and DB time"""
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db += time.perf_counter() - start
+            self.queries += 1
+
+
+def current():
+    """Return the timings of the current request, if one is measured"""
+    return _current.get()
+
+
+@contextmanager
+def measure(timings):
+    """Make timings the current request's for the duration of the block"""
+    token = _current.set(timings)
+    try:
+        yield timings
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def unbudgeted():
+    """Leave the queries run in the block out of the view's query budget
+
+    For work that is not the view's own, like authenticating the request.
+    The queries still count towards the totals that are reported.
+    """
+    timings = _current.get()
+    before = timings.queries if timings is not None else 0
+    try:
+        yield
+    finally:
+        if timings is not None:
+            timings.unbudgeted += timings.queries - before
+
+
+@contextmanager
+def instrument(timings):
+    """Measure timings and count the queries this thread runs meanwhile"""
+    with ExitStack() as stack:
+        stack.enter_context(measure(timings))
+        for connection in connections.all():
+            stack.enter_context(
+                connection.execute_wrapper(timings.execute_wrapper)
+            )
+        yield timings
+
+
+class TimedSerializerMixin:
+    """Add serializer validation and representation time to the request
+
+    Only the outermost call is timed, so nested and list serializers are
+    not counted twice.
+    """
+
+    def _timed(self, method, *args, **kwargs):
+        timings = _current.get()
+        if timings is None or timings._depth:
+            return method(*args, **kwargs)
+        timings._depth += 1
+        start = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            timings.serializer += time.perf_counter() - start
+            timings._depth -= 1
+
+    def is_valid(self, *args, **kwargs):
+        return self._timed(super().is_valid, *args, **kwargs)
+
+    def to_representation(self, *args, **kwargs):
+        return self._timed(super().to_representation, *args, **kwargs)
@@ -0,0 +1,36 @@
+import hmac
+import ipaddress
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from django.views.decorators.http import require_GET
+
+from . import metrics
+
+
+def _may_scrape(request):
+    """Return True for allow-listed addresses and the scrape token"""
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    scheme, _, credentials = request.META.get(
+        'HTTP_AUTHORIZATION', ''
+    ).partition(' ')
+    if token and scheme.lower() == 'bearer' and \
+            hmac.compare_digest(credentials.strip(), token):
+        return True
+    try:
+        address = ipaddress.ip_address(request.META.get('REMOTE_ADDR', ''))
+    except ValueError:
+        return False
+    return any(
+        address in ipaddress.ip_network(network, strict=False)
+        for network in getattr(settings, 'METRICS_ALLOWED_IPS', ())
+    )
+
+
+@require_GET
+def metrics_view(request):
+    """Expose the Prometheus metrics of every worker on this host"""
+    if not _may_scrape(request):
+        return HttpResponseForbidden()
+    content, content_type = metrics.render()
+    return HttpResponse(content, content_type=content_type)
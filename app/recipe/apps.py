@@ -1,5 +1,36 @@
 from django.apps import AppConfig
+from django.conf import settings
+from django.db.models.signals import (
+    m2m_changed, post_delete, post_save, pre_delete,
+)
 
 
 class RecipeConfig(AppConfig):
     name = 'recipe'
+
+    def ready(self):
+        from . import signals
+        from .models import Ingredients, Recipe, Tag
+
+        for model in (Recipe, Tag, Ingredients):
+            post_save.connect(signals.bump_owner_version, sender=model)
+            post_delete.connect(signals.bump_owner_version, sender=model)
+        for through in (Recipe.tag.through, Recipe.ingredients.through):
+            m2m_changed.connect(signals.bump_m2m_owner_version, sender=through)
+            m2m_changed.connect(signals.touch_m2m_recipes, sender=through)
+        for model in (Tag, Ingredients):
+            post_save.connect(signals.touch_attr_recipes, sender=model)
+            pre_delete.connect(signals.touch_attr_recipes, sender=model)
+        post_delete.connect(signals.release_recipe_images, sender=Recipe)
+
+        post_save.connect(signals.refresh_recipe_search, sender=Recipe)
+        for through in (Recipe.tag.through, Recipe.ingredients.through):
+            m2m_changed.connect(signals.refresh_m2m_search, sender=through)
+        for model in (Tag, Ingredients):
+            pre_delete.connect(signals.collect_attr_search, sender=model)
+            post_save.connect(signals.refresh_attr_search, sender=model)
+            post_delete.connect(signals.refresh_attr_search, sender=model)
+
+        post_save.connect(
+            signals.bump_new_user_version, sender=settings.AUTH_USER_MODEL
+        )
@@ -0,0 +1,236 @@
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from rest_framework import serializers, status
+
+from .caching import bump_version
+from .models import Ingredients, Recipe, Tag
+from .search import update_search_vectors
+from .serializers import RecipeBulkItemSerializer
+
+RELATIONS = (('tag', Tag), ('ingredients', Ingredients))
+
+
+def _is_id(value):
+    """Return whether value is an integer id; JSON true/false are not"""
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def max_batch_size():
+    return getattr(settings, 'RECIPE_BULK_MAX_BATCH', 500)
+
+
+def check_batch(items):
+    """Raise a validation error unless items is a list of a sane size"""
+    if not isinstance(items, list):
+        raise serializers.ValidationError(
+            {'detail': 'Expected a list of items.'}
+        )
+    if not items:
+        raise serializers.ValidationError(
+            {'detail': 'Expected at least one item.'}
+        )
+    if len(items) > max_batch_size():
+        raise serializers.ValidationError({
+            'detail': f'Batch size {len(items)} exceeds the maximum of '
+                      f'{max_batch_size()} items.'
+        })
+
+
+def _resolve_related(user, items):
+    """Load every tag/ingredient id referenced by the batch, one query each"""
+    resolved = {}
+    for name, model in RELATIONS:
+        ids = set()
+        for item in items:
+            ids.update(item.get(name) or ())
+        resolved[name] = set(
+            model.objects.filter(user=user, pk__in=ids)
+            .values_list('pk', flat=True)
+        ) if ids else set()
+    return resolved
+
+
+def _validate_items(items, context, instances=None):
+    """Validate every item, returning (validated, errors) lists by index"""
+    validated, errors = [], []
+    for index, item in enumerate(items):
+        instance = instances[index] if instances else None
+        serializer = RecipeBulkItemSerializer(
+            instance, data=item, partial=instance is not None,
+            context=context
+        )
+        if serializer.is_valid():
+            validated.append(serializer.validated_data)
+            errors.append(None)
+        else:
+            validated.append(None)
+            errors.append(dict(serializer.errors))
+
+    resolved = _resolve_related(context['request'].user, [
+        data for data in validated if data is not None
+    ])
+    for index, data in enumerate(validated):
+        if data is None:
+            continue
+        for name, _ in RELATIONS:
+            missing = [
+                pk for pk in dict.fromkeys(data.get(name) or ())
+                if pk not in resolved[name]
+            ]
+            if missing:
+                errors[index] = errors[index] or {}
+                errors[index][name] = [
+                    f'Invalid pk(s) {missing} - object(s) do not exist.'
+                ]
+    return validated, errors
+
+
+def _failed(errors):
+    return [
+        {'index': index, 'status': status.HTTP_400_BAD_REQUEST,
+         'errors': error}
+        if error else
+        {'index': index, 'status': status.HTTP_424_FAILED_DEPENDENCY}
+        for index, error in enumerate(errors)
+    ]
+
+
+def _write_relations(recipes, validated, replace):
+    """Bulk insert the through rows of the recipes' tags and ingredients"""
+    for name, _ in RELATIONS:
+        field = Recipe._meta.get_field(name)
+        through = field.remote_field.through
+        source = f'{field.m2m_field_name()}_id'
+        target = f'{field.m2m_reverse_field_name()}_id'
+
+        touched = [
+            (recipe, data[name]) for recipe, data in zip(recipes, validated)
+            if name in data
+        ]
+        if not touched:
+            continue
+        if replace:
+            through.objects.filter(**{
+                f'{source}__in': [recipe.pk for recipe, _ in touched]
+            }).delete()
+        through.objects.bulk_create([
+            through(**{source: recipe.pk, target: pk})
+            for recipe, pks in touched
+            for pk in dict.fromkeys(pks)
+        ])
+
+
+def _read_back_ids(user, recipes):
+    """Set the ids of just bulk inserted recipes, in one query
+
+    For backends that cannot return them from the insert. Their writes are
+    serialized until the transaction commits (SQLite holds the database
+    write lock) and ids only grow, so the user's newest rows are ours.
+    """
+    ids = Recipe.objects.filter(user=user).order_by('-pk').values_list(
+        'pk', flat=True
+    )[:len(recipes)]
+    for recipe, pk in zip(recipes, reversed(ids)):
+        recipe.pk = pk
+
+
+def bulk_create(items, context):
+    """Create a batch of recipes, all or nothing
+
+    Returns the per item results and the response status code.
+    """
+    user = context['request'].user
+    validated, errors = _validate_items(items, context)
+    if any(errors):
+        return _failed(errors), status.HTTP_400_BAD_REQUEST
+
+    recipes = [
+        Recipe(user=user, **{
+            key: value for key, value in data.items()
+            if key not in dict(RELATIONS)
+        })
+        for data in validated
+    ]
+    with transaction.atomic():
+        Recipe.objects.bulk_create(recipes)
+        if not connection.features.can_return_rows_from_bulk_insert:
+            _read_back_ids(user, recipes)
+        _write_relations(recipes, validated, replace=False)
+        update_search_vectors(recipe.pk for recipe in recipes)
+    bump_version(user.pk)
+
+    return [
+        {'index': index, 'status': status.HTTP_201_CREATED, 'id': recipe.pk}
+        for index, recipe in enumerate(recipes)
+    ], status.HTTP_201_CREATED
+
+
+def bulk_update(items, context):
+    """Partially update a batch of recipes, all or nothing"""
+    user = context['request'].user
+    ids = [item.get('id') if isinstance(item, dict) else None
+           for item in items]
+    found = Recipe.objects.filter(
+        user=user, pk__in=[pk for pk in ids if _is_id(pk)]
+    ).in_bulk()
+
+    instances, lookup_errors = [], []
+    seen = set()
+    for pk in ids:
+        recipe = found.get(pk) if _is_id(pk) else None
+        if recipe is None:
+            lookup_errors.append({'id': ['Not found.']})
+        elif pk in seen:
+            lookup_errors.append({'id': ['Duplicate id in batch.']})
+        else:
+            lookup_errors.append(None)
+            seen.add(pk)
+        instances.append(recipe or Recipe(user=user))
+
+    validated, errors = _validate_items(items, context, instances)
+    errors = [
+        lookup or error for lookup, error in zip(lookup_errors, errors)
+    ]
+    if any(errors):
+        return _failed(errors), status.HTTP_400_BAD_REQUEST
+
+    now = timezone.now()
+    fields = {'updated_at'}
+    for recipe, data in zip(instances, validated):
+        for key, value in data.items():
+            if key not in dict(RELATIONS):
+                setattr(recipe, key, value)
+                fields.add(key)
+        recipe.updated_at = now
+    with transaction.atomic():
+        Recipe.objects.bulk_update(instances, sorted(fields))
+        _write_relations(instances, validated, replace=True)
+        update_search_vectors(recipe.pk for recipe in instances)
+    bump_version(user.pk)
+
+    return [
+        {'index': index, 'status': status.HTTP_200_OK, 'id': recipe.pk}
+        for index, recipe in enumerate(instances)
+    ], status.HTTP_200_OK
+
+
+def bulk_delete(ids, context):
+    """Delete a batch of recipes by id"""
+    user = context['request'].user
+    if not all(map(_is_id, ids)):
+        raise serializers.ValidationError(
+            {'ids': ['Expected a list of integer ids.']}
+        )
+    with transaction.atomic():
+        queryset = Recipe.objects.filter(user=user, pk__in=ids)
+        existing = set(queryset.values_list('pk', flat=True))
+        queryset.delete()
+    bump_version(user.pk)
+
+    return [
+        {'index': index, 'id': pk,
+         'status': status.HTTP_204_NO_CONTENT if pk in existing
+         else status.HTTP_404_NOT_FOUND}
+        for index, pk in enumerate(ids)
+    ], status.HTTP_200_OK
@@ -0,0 +1,253 @@
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Count, Max, prefetch_related_objects
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, parse_http_date_safe
+from rest_framework.generics import get_object_or_404
+from rest_framework.response import Response
+
+from core import compression, metrics
+
+
+class CacheStats:
+    """Thread safe hit/miss counters for the response cache"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+    def hit(self):
+        with self._lock:
+            self.hits += 1
+        metrics.cache_hit('response')
+
+    def miss(self):
+        with self._lock:
+            self.misses += 1
+        metrics.cache_miss('response')
+
+    def as_dict(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses}
+
+
+stats = CacheStats()
+
+
+def get_cache():
+    """Return the Django cache backing the response cache"""
+    return caches[getattr(settings, 'RECIPE_CACHE_ALIAS', 'default')]
+
+
+def _version_key(user_id):
+    return f'recipe:version:{user_id}'
+
+
+def get_version(user_id):
+    """Return the current cache version of a user's recipe data"""
+    cache = get_cache()
+    key = _version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        # Seed from the clock so a version lost to eviction can never
+        # collide with one that older cached responses were stored under.
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(user_id):
+    """Invalidate every cached response of a user"""
+    cache = get_cache()
+    key = _version_key(user_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), None)
+
+
+def _request_fingerprint(request, *extra):
+    """Hash the path, renderer and sorted query params of a request"""
+    query = sorted(
+        (name, value)
+        for name, values in request.query_params.lists()
+        for value in values
+    )
+    raw = '|'.join([
+        request.path,
+        request.accepted_renderer.format,
+        repr(query),
+    ] + [str(part) for part in extra])
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+def response_cache_key(request):
+    """Return the cache key for a list request of the current user"""
+    digest = _request_fingerprint(request)
+    version = get_version(request.user.pk)
+    return f'recipe:response:{request.user.pk}:{version}:{digest}'
+
+
+class CachedListMixin:
+    """Serve list responses from a per-user versioned cache
+
+    Writes to a user's recipes, tags and ingredients bump the user's version
+    (see recipe/signals.py), which changes every key at once so nothing ever
+    has to be scanned or deleted.
+    """
+
+    def list(self, request, *args, **kwargs):
+        timeout = getattr(settings, 'RECIPE_RESPONSE_CACHE_TIMEOUT', 300)
+        if not timeout or request.accepted_renderer.media_type == 'text/html':
+            return super().list(request, *args, **kwargs)
+
+        cache = get_cache()
+        key = response_cache_key(request)
+        entry = cache.get(key)
+        if entry is not None:
+            stats.hit()
+            response = HttpResponse(entry['content'])
+            for header, value in entry['headers']:
+                response[header] = value
+            response['X-Cache'] = 'HIT'
+            last_modified = parse_http_date_safe(
+                response.get('Last-Modified', '')
+            )
+            conditional = get_conditional_response(
+                request, response.get('ETag'), last_modified, response
+            )
+            if conditional is response:
+                self._encode_hit(request, response, key, entry, timeout)
+            return conditional
+
+        stats.miss()
+        response = super().list(request, *args, **kwargs)
+        if response.status_code == 200:
+            response['X-Cache'] = 'MISS'
+
+            def store(rendered):
+                headers = [
+                    (header, value) for header, value in rendered.items()
+                    if header != 'X-Cache'
+                ]
+                entry = {
+                    'content': rendered.content,
+                    'headers': headers,
+                    'encoded': {},
+                }
+                # Compressed here, once, for this client and the hits after
+                # it; the compression middleware leaves encoded responses be.
+                coding = compression.prepare(request, rendered)
+                if coding:
+                    entry['encoded'][coding] = compression.compress(
+                        rendered.content, coding
+                    )
+                cache.set(key, entry, timeout)
+                if coding:
+                    return compression.encode(
+                        rendered, coding, entry['encoded'][coding]
+                    )
+
+            response.add_post_render_callback(store)
+        return response
+
+    def _encode_hit(self, request, response, key, entry, timeout):
+        """Serve a cached response precompressed for the client if we can
+
+        A coding the entry lacks is compressed once and added to it.
+        """
+        coding = compression.prepare(request, response)
+        if not coding:
+            return
+        encoded = entry.setdefault('encoded', {})
+        if coding not in encoded:
+            encoded[coding] = compression.compress(entry['content'], coding)
+            get_cache().set(key, entry, timeout)
+        compression.encode(response, coding, encoded[coding])
+
+
+def _validators(request, updated_at, *extra):
+    """Return a strong ETag and Last-Modified timestamp for a response"""
+    stamp = updated_at.isoformat() if updated_at else ''
+    digest = _request_fingerprint(request, request.user.pk, stamp, *extra)
+    last_modified = int(updated_at.timestamp()) if updated_at else None
+    return f'"{digest}"', last_modified
+
+
+def _set_validators(response, etag, last_modified=None):
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    patch_vary_headers(response, ('Authorization',))
+    return response
+
+
+class ConditionalListMixin:
+    """Emit an ETag on lists and answer revalidation with 304
+
+    The ETag comes from a single `MAX(updated_at), COUNT(*)` aggregate
+    over the filtered queryset, so a 304 costs one cheap query and never
+    loads or serializes a row. Lists carry no Last-Modified: deleting an
+    older row, or a recipe moving between tags, changes the list without
+    moving MAX(updated_at) forward.
+    """
+
+    def get_etag_extra(self):
+        """Return extra state the list ETag depends on besides its rows"""
+        return ()
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        state = queryset.prefetch_related(None).aggregate(
+            last_modified=Max('updated_at'),
+            count=Count('pk'),
+        )
+        etag, _ = _validators(
+            request, state['last_modified'], state['count'],
+            *self.get_etag_extra()
+        )
+        not_modified = get_conditional_response(request, etag)
+        if not_modified is not None:
+            return _set_validators(not_modified, etag)
+
+        response = super().list(request, *args, **kwargs)
+        return _set_validators(response, etag)
+
+
+class ConditionalRetrieveMixin:
+    """Emit ETag/Last-Modified on details and answer revalidation with 304
+
+    The row is loaded once, without its relations, and the validators come
+    from its `updated_at`; relations are only prefetched when the client's
+    copy is stale.
+    """
+
+    def retrieve(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        instance = get_object_or_404(
+            queryset.prefetch_related(None),
+            **{self.lookup_field: kwargs[lookup_url_kwarg]}
+        )
+        self.check_object_permissions(request, instance)
+        etag, last_modified = _validators(request, instance.updated_at)
+        not_modified = get_conditional_response(request, etag, last_modified)
+        if not_modified is not None:
+            return _set_validators(not_modified, etag, last_modified)
+
+        prefetch_related_objects(
+            [instance], *queryset._prefetch_related_lookups
+        )
+        serializer = self.get_serializer(instance)
+        response = Response(serializer.data)
+        return _set_validators(response, etag, last_modified)
@@ -0,0 +1,99 @@
+import csv
+from itertools import islice
+
+import orjson
+from django.conf import settings
+
+from .models import Recipe
+
+COLUMNS = ('id', 'title', 'time_minutes', 'price', 'link')
+RELATIONS = ('tag', 'ingredients')
+CONTENT_TYPES = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv; charset=utf-8',
+}
+
+
+def chunk_size():
+    return getattr(settings, 'RECIPE_EXPORT_CHUNK_SIZE', 500)
+
+
+def _names(queryset, relation, ids):
+    """Return {recipe id: [related names]} for ids, in one query"""
+    field = Recipe._meta.get_field(relation)
+    through = field.remote_field.through
+    source = field.m2m_field_name()
+    target = field.m2m_reverse_field_name()
+    names = {}
+    rows = through.objects.using(queryset.db).filter(**{
+        f'{source}_id__in': ids
+    }).values_list(f'{source}_id', f'{target}__name').order_by(
+        f'{target}__name', f'{target}_id'
+    )
+    for recipe_id, name in rows:
+        names.setdefault(recipe_id, []).append(name)
+    return names
+
+
+def rows(queryset, size=None):
+    """Yield every recipe in queryset as a dict with its related names
+
+    Recipes are read with a server-side cursor, size rows at a time, and
+    each chunk's tag and ingredient names are fetched with one query per
+    relation. Only one chunk is ever held in memory.
+    """
+    size = size or chunk_size()
+    recipes = queryset.order_by('id').values(*COLUMNS).iterator(
+        chunk_size=size
+    )
+    while True:
+        chunk = list(islice(recipes, size))
+        if not chunk:
+            return
+        ids = [recipe['id'] for recipe in chunk]
+        related = {
+            relation: _names(queryset, relation, ids)
+            for relation in RELATIONS
+        }
+        for recipe in chunk:
+            for relation in RELATIONS:
+                recipe[relation] = related[relation].get(recipe['id'], [])
+            yield recipe
+
+
+def ndjson(recipes):
+    """Yield recipes as newline delimited JSON, one object per line"""
+    for recipe in recipes:
+        # Prices are Decimals, kept exact as strings like the API does
+        yield orjson.dumps(
+            recipe, default=str, option=orjson.OPT_APPEND_NEWLINE
+        )
+
+
+class _Echo:
+    """File-like object handing back what csv.writer writes to it"""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(recipes):
+    """Yield recipes as CSV with a header row
+
+    Tag and ingredient names are joined with '; ' into one column each.
+    """
+    writer = csv.writer(_Echo())
+    yield writer.writerow(COLUMNS + RELATIONS).encode()
+    for recipe in recipes:
+        yield writer.writerow(
+            [recipe[column] for column in COLUMNS] +
+            ['; '.join(recipe[relation]) for relation in RELATIONS]
+        ).encode()
+
+
+FORMATS = {'ndjson': ndjson, 'csv': csv_lines}
+
+
+def export(queryset, kind, size=None):
+    """Return an iterator of the encoded lines of queryset's recipes"""
+    return FORMATS[kind](rows(queryset, size))
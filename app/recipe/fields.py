@@ -0,0 +1,64 @@
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.utils.translation import gettext_lazy as _
+from rest_framework import serializers
+from rest_framework.relations import MANY_RELATION_KWARGS
+
+
+class BatchedManyRelatedField(serializers.ManyRelatedField):
+    """Resolve a list of primary keys with a single `id__in` query"""
+    default_error_messages = {
+        'does_not_exist': _(
+            'Invalid pk(s) {pk_values} - object(s) do not exist.'
+        ),
+        'incorrect_type': _(
+            'Incorrect type. Expected pk value, received {data_type}.'
+        ),
+    }
+
+    def to_internal_value(self, data):
+        if isinstance(data, str) or not hasattr(data, '__iter__'):
+            self.fail('not_a_list', input_type=type(data).__name__)
+        if not self.allow_empty and len(data) == 0:
+            self.fail('empty')
+
+        queryset = self.child_relation.get_queryset()
+        pk_field = queryset.model._meta.pk
+        pks = []
+        for item in data:
+            if self.child_relation.pk_field is not None:
+                item = self.child_relation.pk_field.to_internal_value(item)
+            try:
+                if isinstance(item, bool):
+                    raise TypeError
+                pks.append(pk_field.to_python(item))
+            except (TypeError, DjangoValidationError):
+                self.fail('incorrect_type', data_type=type(item).__name__)
+
+        found = queryset.in_bulk(set(pks))
+        missing = [pk for pk in dict.fromkeys(pks) if pk not in found]
+        if missing:
+            self.fail('does_not_exist', pk_values=missing)
+        return [found[pk] for pk in pks]
+
+
+class UserPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """Primary key field limited to objects owned by the requesting user
+
+    With `many=True` every submitted id is validated in one query and all
+    the invalid ids are reported together.
+    """
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        request = self.context.get('request')
+        if request is None:
+            return queryset
+        return queryset.filter(user=request.user)
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        list_kwargs = {'child_relation': cls(*args, **kwargs)}
+        for key in kwargs:
+            if key in MANY_RELATION_KWARGS:
+                list_kwargs[key] = kwargs[key]
+        return BatchedManyRelatedField(**list_kwargs)
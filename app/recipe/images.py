@@ -0,0 +1,191 @@
+import io
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from PIL import Image
+
+from core import timing
+from core.exceptions import ServiceUnavailable
+
+from . import storage
+from .models import Recipe
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_executor = None
+_slots = None
+_size = None
+
+
+def _pool():
+    """Return the shared (executor, slots) pair, sized from settings
+
+    The pool is rebuilt when the configured sizes change. Tasks already
+    running on the old pool finish there and release the old slots.
+    """
+    global _executor, _slots, _size
+    size = (settings.RECIPE_IMAGE_WORKERS, settings.RECIPE_IMAGE_QUEUE_SIZE)
+    with _lock:
+        if _executor is None or _size != size:
+            if _executor is not None:
+                _executor.shutdown(wait=False)
+            workers, queue_size = size
+            _executor = ThreadPoolExecutor(
+                max_workers=workers, thread_name_prefix='recipe-image',
+            )
+            _slots = threading.BoundedSemaphore(workers + queue_size)
+            _size = size
+        return _executor, _slots
+
+
+def is_inline():
+    """Return True when images are processed on the request thread"""
+    return settings.RECIPE_IMAGE_WORKERS <= 0
+
+
+def _has_capacity():
+    """Return whether the pool has a free slot right now"""
+    _, slots = _pool()
+    if not slots.acquire(blocking=False):
+        return False
+    slots.release()
+    return True
+
+
+def submit(recipe_id):
+    """Queue a recipe for processing, returning False when the pool is full
+
+    A recipe that could not be queued stays pending until requeue_stale()
+    picks it up.
+    """
+    executor, slots = _pool()
+    if not slots.acquire(blocking=False):
+        logger.warning('Image pool is full, recipe %s stays pending',
+                       recipe_id)
+        return False
+
+    def run():
+        try:
+            process(recipe_id)
+        finally:
+            slots.release()
+            close_old_connections()
+
+    executor.submit(run)
+    return True
+
+
+def store_upload(recipe, upload):
+    """Persist the raw upload and queue the recipe for processing
+
+    Raises ServiceUnavailable when the pool and its queue are full, before
+    any bytes have been written. The pool slot itself is only taken once
+    the transaction commits, so a rolled back upload never holds one.
+    """
+    if not is_inline() and not _has_capacity():
+        raise ServiceUnavailable(
+            'Image processing is at capacity, try again shortly.',
+            wait=settings.RECIPE_IMAGE_RETRY_AFTER,
+        )
+
+    name = storage.save_upload(recipe, upload)
+    recipe.image_pending = name
+    recipe.image_status = Recipe.IMAGE_PENDING
+    recipe.save(update_fields=[
+        'image_pending', 'image_status', 'updated_at'
+    ])
+
+    if is_inline():
+        # Off the request with a pool, so not part of the view's budget
+        with timing.unbudgeted():
+            process(recipe.pk)
+        return
+
+    transaction.on_commit(lambda: submit(recipe.pk))
+
+
+def stale_uploads(age):
+    """Return ids of recipes whose upload waited longer than age seconds
+
+    Uploads are left behind when the pool was full at commit, or when the
+    process died before or while handling them.
+    """
+    return Recipe.objects.filter(
+        image_status__in=(Recipe.IMAGE_PENDING, Recipe.IMAGE_PROCESSING),
+        updated_at__lt=timezone.now() - timedelta(seconds=age),
+    ).exclude(image_pending='').values_list('pk', flat=True)
+
+
+def _render(image, size):
+    """Return JPEG bytes of image scaled to fit within size"""
+    rendition = image.copy()
+    rendition.thumbnail(size)
+    if rendition.mode not in ('RGB', 'L'):
+        rendition = rendition.convert('RGB')
+    buffer = io.BytesIO()
+    rendition.save(buffer, format='JPEG', quality=85)
+    return buffer.getvalue()
+
+
+def process(recipe_id):
+    """Verify the pending upload of a recipe and build its renditions"""
+    recipe = Recipe.objects.only(
+        'id', 'user', 'image', 'image_pending', 'image_status'
+    ).filter(pk=recipe_id).first()
+    if recipe is None or not recipe.image_pending:
+        return
+    name = recipe.image_pending
+    recipe.image_status = Recipe.IMAGE_PROCESSING
+    recipe.save(update_fields=['image_status'])
+
+    try:
+        with default_storage.open(name) as raw:
+            Image.open(raw).verify()
+        with default_storage.open(name) as raw:
+            image = Image.open(raw)
+            image.load()
+
+        renditions = {}
+        for label, size in settings.RECIPE_IMAGE_RENDITIONS.items():
+            target = storage.rendition_name(name, label)
+            if storage.content_addressed() and default_storage.exists(target):
+                renditions[label] = target
+                continue
+            renditions[label] = default_storage.save(
+                target, ContentFile(_render(image, tuple(size)))
+            )
+    except Exception as exc:
+        logger.warning('Processing image %s of recipe %s failed: %s',
+                       name, recipe_id, exc)
+        storage.discard(name)
+        recipe.image_pending = ''
+        recipe.image_status = Recipe.IMAGE_FAILED
+        recipe.save(update_fields=[
+            'image_pending', 'image_status', 'updated_at'
+        ])
+        return
+
+    previous = recipe.image.name
+    recipe.image.name = name
+    recipe.image_pending = ''
+    recipe.image_renditions = renditions
+    recipe.image_status = Recipe.IMAGE_READY
+    recipe.save(update_fields=[
+        'image', 'image_pending', 'image_renditions', 'image_status',
+        'updated_at',
+    ])
+    storage.release(previous)
+
+
+def delete_renditions(recipe):
+    """Remove the rendition files of a recipe image"""
+    for name in (recipe.image_renditions or {}).values():
+        default_storage.delete(name)
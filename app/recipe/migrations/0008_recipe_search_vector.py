@@ -0,0 +1,64 @@
+# Generated by Django 3.1.14 on 2026-10-18 20:57
+
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+
+INDEXES = (
+    'CREATE INDEX recipe_recipe_search_vector_gin '
+    'ON recipe_recipe USING gin (search_vector)',
+    'CREATE INDEX recipe_recipe_title_trgm '
+    'ON recipe_recipe USING gin (title gin_trgm_ops)',
+)
+
+BACKFILL = """
+UPDATE recipe_recipe SET search_vector =
+    setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+    setweight(to_tsvector('english', coalesce((
+        SELECT string_agg(i.name, ' ')
+        FROM recipe_recipe_ingredients ri JOIN recipe_ingredients i
+            ON i.id = ri.ingredients_id
+        WHERE ri.recipe_id = recipe_recipe.id
+    ), '')), 'B') ||
+    setweight(to_tsvector('english', coalesce((
+        SELECT string_agg(t.name, ' ')
+        FROM recipe_recipe_tag rt JOIN recipe_tag t ON t.id = rt.tag_id
+        WHERE rt.recipe_id = recipe_recipe.id
+    ), '')), 'C')
+"""
+
+
+def create_search_indexes(apps, schema_editor):
+    """GIN indexes only exist on PostgreSQL; other backends use LIKE"""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for sql in INDEXES:
+        schema_editor.execute(sql)
+    schema_editor.execute(BACKFILL)
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS recipe_recipe_title_trgm')
+    schema_editor.execute(
+        'DROP INDEX IF EXISTS recipe_recipe_search_vector_gin'
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipe', '0007_imageblob'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 3.1.14 on 2026-10-18 21:40
+
+from django.db import migrations
+
+
+TABLES = ('recipe_tag', 'recipe_ingredients')
+
+
+def create_prefix_indexes(apps, schema_editor):
+    """Index (user_id, lower(name)) for case insensitive prefix lookups
+
+    Django 3.1 has no functional indexes, so the expression index is
+    created by hand. text_pattern_ops lets PostgreSQL answer LIKE 'abc%'
+    from the index whatever the database collation is.
+    """
+    opclass = (
+        ' text_pattern_ops'
+        if schema_editor.connection.vendor == 'postgresql' else ''
+    )
+    for table in TABLES:
+        schema_editor.execute(
+            f'CREATE INDEX {table}_user_lower_name '
+            f'ON {table} (user_id, lower(name){opclass})'
+        )
+
+
+def drop_prefix_indexes(apps, schema_editor):
+    for table in TABLES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {table}_user_lower_name')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipe', '0008_recipe_search_vector'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_prefix_indexes, drop_prefix_indexes),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 3.1.14 on 2026-10-18 21:02
+
+from django.db import migrations, models
+
+
+# The auto-created through tables only get a unique (recipe_id, x_id) index
+# plus single column FK indexes. Going from a tag or ingredient to its
+# recipes (assigned_only, usage counts, search vector refreshes) wants
+# the reverse pair so it can be answered from the index alone.
+REVERSE_THROUGH_INDEXES = (
+    ('recipe_recipe_tag', 'tag_id'),
+    ('recipe_recipe_ingredients', 'ingredients_id'),
+)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipe', '0009_name_prefix_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='ingredients',
+            index=models.Index(fields=['user', 'name', 'id'], name='recipe_ingr_user_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['user', 'id'], name='recipe_user_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['user', 'updated_at'], name='recipe_user_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tag',
+            index=models.Index(fields=['user', 'name', 'id'], name='recipe_tag_user_name_idx'),
+        ),
+    ] + [
+        migrations.RunSQL(
+            f'CREATE INDEX {table}_reverse ON {table} ({column}, recipe_id)',
+            f'DROP INDEX {table}_reverse',
+        )
+        for table, column in REVERSE_THROUGH_INDEXES
+    ]
@@ -1,5 +1,6 @@
 from django.db import models
 from django.conf import settings    
+from django.contrib.postgres.search import SearchVectorField
 import uuid
 import os
 
@@ -10,6 +11,16 @@ def recipe_image_file_path(instance,filename):
 
     return os.path.join('uploads/recipe',filename)
 
+class ImageBlob(models.Model):
+    """Image file stored under its content hash and shared by recipes"""
+    digest = models.CharField(max_length=64, unique=True)
+    name = models.CharField(max_length=255, unique=True)
+    size = models.PositiveIntegerField()
+    refcount = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return self.name
+
 class Tag(models.Model):
     "Custom tag to be used for recipe"
     name = models.CharField(max_length = 255)
@@ -17,6 +28,16 @@ class Tag(models.Model):
         settings.AUTH_USER_MODEL,
         on_delete = models.CASCADE
     )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        # Lists filter on the owner and page by (name, id)
+        indexes = [
+            models.Index(
+                fields=['user', 'name', 'id'],
+                name='recipe_tag_user_name_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.name
@@ -28,11 +49,35 @@ class Ingredients(models.Model):
         settings.AUTH_USER_MODEL,
         on_delete= models.CASCADE
     )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        # Lists filter on the owner and page by (name, id)
+        indexes = [
+            models.Index(
+                fields=['user', 'name', 'id'],
+                name='recipe_ingr_user_name_idx'
+            ),
+        ]
+
     def __str__(self):
         return self.name
 
 class Recipe(models.Model):
     """Recipe object""" 
+    IMAGE_NONE = ''
+    IMAGE_PENDING = 'pending'
+    IMAGE_PROCESSING = 'processing'
+    IMAGE_READY = 'ready'
+    IMAGE_FAILED = 'failed'
+    IMAGE_STATUS_CHOICES = (
+        (IMAGE_NONE, 'No image'),
+        (IMAGE_PENDING, 'Pending'),
+        (IMAGE_PROCESSING, 'Processing'),
+        (IMAGE_READY, 'Ready'),
+        (IMAGE_FAILED, 'Failed'),
+    )
+
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE
@@ -44,7 +89,25 @@ class Recipe(models.Model):
     ingredients = models.ManyToManyField('Ingredients')
     tag = models.ManyToManyField('Tag')
     image = models.ImageField(null = True, upload_to=recipe_image_file_path)
+    image_status = models.CharField(
+        max_length=16, choices=IMAGE_STATUS_CHOICES, default=IMAGE_NONE,
+        blank=True
+    )
+    # Storage name of an upload that is waiting for the image pipeline
+    image_pending = models.CharField(max_length=255, blank=True)
+    image_renditions = models.JSONField(default=dict, blank=True)
+    # Maintained by recipe.search.update_search_vectors on PostgreSQL
+    search_vector = SearchVectorField(null=True, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        # Lists page by id within an owner; list ETags aggregate updated_at
+        indexes = [
+            models.Index(fields=['user', 'id'], name='recipe_user_id_idx'),
+            models.Index(
+                fields=['user', 'updated_at'], name='recipe_user_updated_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.title
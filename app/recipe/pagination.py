@@ -0,0 +1,161 @@
+import base64
+import json
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """Cursor pagination over a stable (sort key, id) ordering
+
+    Every page is fetched with a `WHERE (sort key, id) < (last seen)` filter
+    instead of an OFFSET, so the cost of a page does not depend on how deep
+    the client has paged. The response body stays a plain list and the
+    cursors travel in an RFC 8288 `Link` header.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    ordering = ('-id',)
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.ordering = tuple(getattr(view, 'keyset_ordering', self.ordering))
+        self.page_size = self.get_page_size(request)
+        position, reverse = self.decode_cursor(request)
+
+        ordering = self.ordering
+        if reverse:
+            ordering = tuple(self._invert(field) for field in ordering)
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            position = self._coerce(queryset, position)
+            queryset = queryset.filter(self._keyset_filter(position, reverse))
+
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if reverse:
+            results.reverse()
+
+        if reverse:
+            self.has_next = position is not None
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = position is not None
+
+        self.next_position = None
+        self.previous_position = None
+        if results:
+            self.next_position = self._position(results[-1])
+            self.previous_position = self._position(results[0])
+        return results
+
+    def get_paginated_response(self, data):
+        links = []
+        next_link = self.get_next_link()
+        previous_link = self.get_previous_link()
+        if next_link:
+            links.append(f'<{next_link}>; rel="next"')
+        if previous_link:
+            links.append(f'<{previous_link}>; rel="prev"')
+
+        headers = {'Link': ', '.join(links)} if links else None
+        return Response(data, headers=headers)
+
+    def get_page_size(self, request):
+        """Return the requested page size, capped at the configured maximum"""
+        page_size = getattr(settings, 'RECIPE_PAGE_SIZE', 100)
+        max_page_size = getattr(settings, 'RECIPE_MAX_PAGE_SIZE', 1000)
+        try:
+            requested = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            requested = page_size
+        if requested <= 0:
+            requested = page_size
+        return min(requested, max_page_size)
+
+    def get_next_link(self):
+        if not self.has_next or self.next_position is None:
+            return None
+        return self._link(self.next_position, reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or self.previous_position is None:
+            return None
+        return self._link(self.previous_position, reverse=True)
+
+    def decode_cursor(self, request):
+        """Return the (position, reverse) pair encoded in the request cursor"""
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            padded = encoded + '=' * (-len(encoded) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded))
+            position = payload['p']
+            reverse = bool(payload.get('r', 0))
+        except (TypeError, ValueError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or \
+                len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return position, reverse
+
+    def encode_cursor(self, position, reverse):
+        """Return an opaque, url safe cursor for a position"""
+        payload = {'p': position, 'r': int(reverse)}
+        raw = json.dumps(payload, cls=DjangoJSONEncoder, separators=(',', ':'))
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+    def _link(self, position, reverse):
+        url = self.request.build_absolute_uri()
+        cursor = self.encode_cursor(position, reverse)
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def _position(self, instance):
+        return [getattr(instance, f.lstrip('-')) for f in self.ordering]
+
+    def _output_field(self, queryset, name):
+        """Return the model field or annotation a keyset column orders by"""
+        try:
+            return queryset.model._meta.get_field(name)
+        except FieldDoesNotExist:
+            return queryset.query.annotations[name].output_field
+
+    def _coerce(self, queryset, position):
+        """Convert cursor values to their fields' types, or raise NotFound"""
+        values = []
+        for field, value in zip(self.ordering, position):
+            output_field = self._output_field(queryset, field.lstrip('-'))
+            if value is None or isinstance(value, (dict, list)):
+                raise NotFound(self.invalid_cursor_message)
+            try:
+                values.append(output_field.to_python(value))
+            except (TypeError, ValueError, ValidationError):
+                raise NotFound(self.invalid_cursor_message)
+        return values
+
+    def _invert(self, field):
+        return field[1:] if field.startswith('-') else f'-{field}'
+
+    def _keyset_filter(self, position, reverse):
+        """Build `(a, b) < (x, y)` as `a < x OR (a = x AND b < y)`"""
+        condition = Q()
+        for index in reversed(range(len(self.ordering))):
+            field = self.ordering[index]
+            name = field.lstrip('-')
+            descending = field.startswith('-') != reverse
+            lookup = 'lt' if descending else 'gt'
+            step = Q(**{f'{name}__{lookup}': position[index]})
+            if index < len(self.ordering) - 1:
+                step |= Q(**{name: position[index]}) & condition
+            condition = step
+        return condition
@@ -0,0 +1,95 @@
+from django.conf import settings
+from django.contrib.postgres.search import (
+    SearchQuery, SearchRank, TrigramSimilarity,
+)
+from django.db import connections
+from django.db.models import Case, F, FloatField, Q, Value, When
+from django.db.models.functions import Cast
+
+from .models import Ingredients, Recipe, Tag
+
+# Title weighs most, then ingredient names, then tag names.
+UPDATE_SEARCH_VECTOR_SQL = """
+UPDATE {recipe} SET search_vector =
+    setweight(to_tsvector(%(config)s::regconfig, coalesce(title, '')), 'A') ||
+    setweight(to_tsvector(%(config)s::regconfig, coalesce((
+        SELECT string_agg(i.name, ' ')
+        FROM {recipe_ingredients} ri JOIN {ingredients} i
+            ON i.id = ri.ingredients_id
+        WHERE ri.recipe_id = {recipe}.id
+    ), '')), 'B') ||
+    setweight(to_tsvector(%(config)s::regconfig, coalesce((
+        SELECT string_agg(t.name, ' ')
+        FROM {recipe_tag} rt JOIN {tag} t ON t.id = rt.tag_id
+        WHERE rt.recipe_id = {recipe}.id
+    ), '')), 'C')
+WHERE id = ANY(%(ids)s)
+"""
+
+
+def uses_postgres(using='default'):
+    return connections[using].vendor == 'postgresql'
+
+
+def update_search_vectors(recipe_ids, using='default'):
+    """Rebuild the search_vector of the given recipes in one statement
+
+    Other databases search with LIKE and have nothing to maintain.
+    """
+    recipe_ids = list(recipe_ids)
+    if not recipe_ids or not uses_postgres(using):
+        return
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    sql = UPDATE_SEARCH_VECTOR_SQL.format(
+        recipe=quote(Recipe._meta.db_table),
+        recipe_ingredients=quote(Recipe.ingredients.through._meta.db_table),
+        ingredients=quote(Ingredients._meta.db_table),
+        recipe_tag=quote(Recipe.tag.through._meta.db_table),
+        tag=quote(Tag._meta.db_table),
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, {
+            'config': settings.RECIPE_SEARCH_CONFIG,
+            'ids': recipe_ids,
+        })
+
+
+def search_recipes(queryset, q):
+    """Filter recipes matching q and annotate them with a search_rank
+
+    PostgreSQL matches the maintained tsvector column and falls back to
+    trigram similarity on the title to tolerate typos. Other databases do
+    a case insensitive substring match on title, ingredient and tag names.
+    """
+    if uses_postgres(queryset.db):
+        # websearch_to_tsquery (quoted phrases, OR, -word) needs 11+
+        search_type = (
+            'websearch' if connections[queryset.db].pg_version >= 110000
+            else 'plain'
+        )
+        query = SearchQuery(
+            q, config=settings.RECIPE_SEARCH_CONFIG, search_type=search_type
+        )
+        # Both ranks are real; page by a double precision value that
+        # survives the round trip through the cursor unchanged.
+        return queryset.annotate(search_rank=Cast(
+            SearchRank(F('search_vector'), query) +
+            TrigramSimilarity('title', q),
+            FloatField(),
+        )).filter(Q(search_vector=query) | Q(title__trigram_similar=q))
+
+    matches = Recipe.objects.filter(
+        Q(title__icontains=q) |
+        Q(ingredients__name__icontains=q) |
+        Q(tag__name__icontains=q)
+    ).values('pk')
+    return queryset.filter(pk__in=matches).annotate(
+        search_rank=Case(
+            When(title__iexact=q, then=Value(1.0)),
+            When(title__istartswith=q, then=Value(0.75)),
+            When(title__icontains=q, then=Value(0.5)),
+            default=Value(0.25),
+            output_field=FloatField(),
+        )
+    )
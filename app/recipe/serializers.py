@@ -1,10 +1,12 @@
 from django.db import models
 from rest_framework import serializers
+from core.timing import TimedSerializerMixin
 from .models  import Tag,Ingredients,Recipe
+from .fields import UserPrimaryKeyRelatedField
 
 
 
-class TagSerializer(serializers.ModelSerializer):
+class TagSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Serializer for tag objects"""
     
     class Meta:
@@ -13,7 +15,7 @@ class TagSerializer(serializers.ModelSerializer):
         read_only_fields = ('id',)
 
 
-class IngredientsSerializer(serializers.ModelSerializer):
+class IngredientsSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Serializer for tag objects """
 
     class Meta:
@@ -21,28 +23,95 @@ class IngredientsSerializer(serializers.ModelSerializer):
         fields = ('id','name')
         read_only_fields = ('id',)
 
-class RecipeSerializer(serializers.ModelSerializer):
+
+class TagCountSerializer(TagSerializer):
+    """Serializer for tag objects with the number of recipes using them"""
+    recipe_count = serializers.IntegerField(read_only=True)
+
+    class Meta(TagSerializer.Meta):
+        fields = TagSerializer.Meta.fields + ('recipe_count',)
+
+
+class IngredientsCountSerializer(IngredientsSerializer):
+    """Serializer for ingredients with the number of recipes using them"""
+    recipe_count = serializers.IntegerField(read_only=True)
+
+    class Meta(IngredientsSerializer.Meta):
+        fields = IngredientsSerializer.Meta.fields + ('recipe_count',)
+
+
+class SparseFieldsetMixin:
+    """Prune fields and choose nested relations from the serializer context
+
+    `fields` in the context is the collection of field names to keep and
+    `expand` the relations in `expandable` to nest as objects instead of
+    ids. Either left out keeps the serializer's own default.
+    """
+    expandable = {}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        fields = self.context.get('fields')
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+        expand = self.context.get('expand')
+        if expand is not None:
+            for name, nested in self.expandable.items():
+                if name not in self.fields:
+                    continue
+                self.fields[name] = (
+                    nested(many=True, read_only=True) if name in expand
+                    else serializers.PrimaryKeyRelatedField(
+                        many=True, read_only=True
+                    )
+                )
+
+
+class RecipeSerializer(SparseFieldsetMixin, TimedSerializerMixin,
+                       serializers.ModelSerializer):
     """Serializer for recipe objects """
-    ingredients= serializers.PrimaryKeyRelatedField(many=True,
+    ingredients= UserPrimaryKeyRelatedField(many=True,
                                 queryset=Ingredients.objects.all())
 
-    tag = serializers.PrimaryKeyRelatedField(many = True,
+    tag = UserPrimaryKeyRelatedField(many = True,
                                 queryset= Tag.objects.all())
+    expandable = {
+        'tag': TagSerializer,
+        'ingredients': IngredientsSerializer,
+    }
+
     class Meta:
         model = Recipe
         fields = ('id','title','time_minutes','price',
                   'link','tag','ingredients',)
-        read_only_field = ('id',)         
-    
+        read_only_field = ('id',)
+
+
+class RecipeBulkItemSerializer(RecipeSerializer):
+    """Serializer for one item of a bulk recipe write
+
+    Tag and ingredient ids are only type checked here; the bulk endpoint
+    resolves the ids of the whole batch together.
+    """
+    ingredients = serializers.ListField(
+        child=serializers.IntegerField(), required=False
+    )
+    tag = serializers.ListField(
+        child=serializers.IntegerField(), required=False
+    )
+
+
 class RecipeDetailSerializer(RecipeSerializer):
     """Serializer for a recipe""" 
     ingredients = IngredientsSerializer(many=True, read_only=True)
     tag = TagSerializer(many= True, read_only=True) 
 
-class RecipeImageSerializer(serializers.ModelSerializer):
+
+class RecipeImageSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Serializer for uploading image in object"""
 
     class Meta:
         model = Recipe
-        fields = ('id','image')
-        read_only_field = (id,)
+        fields = ('id', 'image', 'image_status', 'image_renditions')
+        read_only_fields = ('id', 'image', 'image_status', 'image_renditions')
@@ -0,0 +1,127 @@
+from django.utils import timezone
+
+from .caching import bump_version
+
+
+def bump_owner_version(sender, instance, **kwargs):
+    """Invalidate cached responses of the owner of a saved/deleted object"""
+    bump_version(instance.user_id)
+
+
+def bump_m2m_owner_version(sender, instance, action, **kwargs):
+    """Invalidate cached responses when recipe tags/ingredients change"""
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        bump_version(instance.user_id)
+
+
+def bump_new_user_version(sender, instance, created, **kwargs):
+    """Start a new user on a fresh version, even if their id is reused"""
+    if created:
+        bump_version(instance.pk)
+
+
+def touch_m2m_recipes(sender, instance, action, reverse, model, pk_set,
+                      **kwargs):
+    """Move updated_at of recipes whose tags/ingredients changed"""
+    from .models import Recipe
+
+    if reverse:
+        if action == 'pre_clear':
+            field = 'tag' if sender is Recipe.tag.through else 'ingredients'
+            recipes = Recipe.objects.filter(**{field: instance})
+        elif action in ('post_add', 'post_remove'):
+            recipes = Recipe.objects.filter(pk__in=pk_set)
+        else:
+            return
+    elif action in ('post_add', 'post_remove', 'post_clear'):
+        recipes = Recipe.objects.filter(pk=instance.pk)
+    else:
+        return
+    recipes.update(updated_at=timezone.now())
+
+
+def touch_attr_recipes(sender, instance, **kwargs):
+    """Move updated_at of recipes that nest a renamed or deleted tag"""
+    from .models import Recipe, Tag
+
+    if kwargs.get('created'):
+        return
+    field = 'tag' if sender is Tag else 'ingredients'
+    Recipe.objects.filter(**{field: instance}).update(
+        updated_at=timezone.now()
+    )
+
+
+def release_recipe_images(sender, instance, **kwargs):
+    """Drop the image references held by a deleted recipe"""
+    from .storage import release
+
+    release(instance.image.name)
+    release(instance.image_pending)
+
+
+def refresh_recipe_search(sender, instance, using, update_fields=None,
+                          **kwargs):
+    """Rebuild the search vector of a recipe whose title may have changed"""
+    from .search import update_search_vectors
+
+    if update_fields is not None and 'title' not in update_fields:
+        return
+    update_search_vectors([instance.pk], using=using)
+
+
+def refresh_m2m_search(sender, instance, action, reverse, pk_set, using,
+                       **kwargs):
+    """Rebuild search vectors when recipe tags/ingredients change"""
+    from .models import Recipe
+    from .search import update_search_vectors, uses_postgres
+
+    if not uses_postgres(using):
+        return
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            update_search_vectors([instance.pk], using=using)
+        return
+
+    field = 'tag' if sender is Recipe.tag.through else 'ingredients'
+    if action == 'pre_clear':
+        instance._search_recipe_ids = list(
+            Recipe.objects.using(using).filter(**{field: instance})
+            .values_list('pk', flat=True)
+        )
+    elif action == 'post_clear':
+        update_search_vectors(
+            getattr(instance, '_search_recipe_ids', ()), using=using
+        )
+    elif action in ('post_add', 'post_remove'):
+        update_search_vectors(pk_set, using=using)
+
+
+def collect_attr_search(sender, instance, using, **kwargs):
+    """Remember which recipes use a tag/ingredient that is being deleted"""
+    from .models import Recipe, Tag
+    from .search import uses_postgres
+
+    if not uses_postgres(using):
+        return
+    field = 'tag' if sender is Tag else 'ingredients'
+    instance._search_recipe_ids = list(
+        Recipe.objects.using(using).filter(**{field: instance})
+        .values_list('pk', flat=True)
+    )
+
+
+def refresh_attr_search(sender, instance, using, **kwargs):
+    """Rebuild search vectors of recipes using a renamed/deleted tag"""
+    from .models import Recipe, Tag
+    from .search import update_search_vectors, uses_postgres
+
+    if kwargs.get('created') or not uses_postgres(using):
+        return
+    recipe_ids = getattr(instance, '_search_recipe_ids', None)
+    if recipe_ids is None:
+        field = 'tag' if sender is Tag else 'ingredients'
+        recipe_ids = Recipe.objects.using(using).filter(
+            **{field: instance}
+        ).values_list('pk', flat=True)
+    update_search_vectors(recipe_ids, using=using)
@@ -0,0 +1,143 @@
+import hashlib
+import os
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from django.db import transaction
+from django.db.models import F
+
+from .models import ImageBlob, recipe_image_file_path
+
+BLOB_DIR = 'uploads/recipe/sha256'
+RENDITIONS_DIR = 'uploads/recipe/renditions'
+
+
+def content_addressed():
+    """Return True when recipe images are stored under their content hash"""
+    return settings.RECIPE_IMAGE_STORAGE == 'content'
+
+
+class HashingFileUploadHandler(TemporaryFileUploadHandler):
+    """Spool uploads to a temporary file and hash them on the way in
+
+    The digest is available as `sha256` on the uploaded file, and the
+    temporary file is later moved into place, so the bytes are never read
+    back just to be hashed or copied.
+    """
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.hasher = hashlib.sha256()
+
+    def receive_data_chunk(self, raw_data, start):
+        self.hasher.update(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        uploaded = super().file_complete(file_size)
+        uploaded.sha256 = self.hasher.hexdigest()
+        return uploaded
+
+
+def _spool(upload):
+    """Copy an upload that bypassed the hashing handler to a temp file"""
+    hasher = hashlib.sha256()
+    spooled = TemporaryUploadedFile(
+        upload.name, getattr(upload, 'content_type', None), 0, None
+    )
+    for chunk in upload.chunks():
+        hasher.update(chunk)
+        spooled.write(chunk)
+    spooled.size = spooled.tell()
+    spooled.seek(0)
+    spooled.sha256 = hasher.hexdigest()
+    return spooled
+
+
+def rendition_name(name, label):
+    """Return the storage name of a rendition of an image"""
+    stem = os.path.splitext(os.path.basename(name))[0]
+    return f'{RENDITIONS_DIR}/{stem}_{label}.jpg'
+
+
+def save_upload(recipe, upload):
+    """Persist an uploaded image and return its storage name
+
+    In content mode identical bytes are stored once and every caller holds
+    a reference on the blob until it calls `release`.
+    """
+    if not content_addressed():
+        return default_storage.save(
+            recipe_image_file_path(recipe, upload.name), upload
+        )
+
+    if not hasattr(upload, 'sha256'):
+        upload = _spool(upload)
+    digest = upload.sha256
+    ext = os.path.splitext(upload.name)[1].lower()
+    try:
+        with transaction.atomic():
+            blob, created = ImageBlob.objects.select_for_update(
+            ).get_or_create(
+                digest=digest,
+                defaults={
+                    'name': f'{BLOB_DIR}/{digest[:2]}/{digest}{ext}',
+                    'size': upload.size,
+                    'refcount': 1,
+                },
+            )
+            if not default_storage.exists(blob.name):
+                saved = default_storage.save(blob.name, upload)
+                if saved != blob.name:
+                    blob.name = saved
+                    blob.save(update_fields=['name'])
+            if not created:
+                ImageBlob.objects.filter(pk=blob.pk).update(
+                    refcount=F('refcount') + 1
+                )
+    finally:
+        upload.close()
+    return blob.name
+
+
+def release(name):
+    """Drop a reference to a stored image, deleting it when unused
+
+    A uuid named image has a single user and is deleted right away.
+    """
+    if not name:
+        return
+    if not content_addressed():
+        _delete_files(name)
+        return
+
+    with transaction.atomic():
+        blob = ImageBlob.objects.select_for_update().filter(
+            name=name, refcount__gt=0
+        ).first()
+        if blob is None:
+            return
+        ImageBlob.objects.filter(pk=blob.pk).update(
+            refcount=F('refcount') - 1
+        )
+        if blob.refcount == 1:
+            # The row stays behind with a zero count; deleting the files
+            # while its lock is held keeps a concurrent upload of the same
+            # bytes from racing the delete.
+            _delete_files(name)
+
+
+def discard(name):
+    """Throw away an upload that never became a recipe image"""
+    if content_addressed():
+        release(name)
+    elif name:
+        default_storage.delete(name)
+
+
+def _delete_files(name):
+    default_storage.delete(name)
+    for label in settings.RECIPE_IMAGE_RENDITIONS:
+        default_storage.delete(rendition_name(name, label))
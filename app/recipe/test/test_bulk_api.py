@@ -0,0 +1,220 @@
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from ..models import Ingredients, Recipe, Tag
+from ..views import RecipeViewSet
+
+BULK_URL = reverse('recipe:recipe-bulk')
+RECIPE_URL = reverse('recipe:recipe-list')
+
+
+def sample_recipe(user, **params):
+    """Create and return a sample recipe"""
+    defaults = {
+        'title': 'sample recipe',
+        'time_minutes': 10,
+        'price': 5.00,
+    }
+    defaults.update(params)
+    return Recipe.objects.create(user=user, **defaults)
+
+
+class BulkRecipeApiTests(TestCase):
+    """Test the bulk recipe endpoint"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'bulk@api.com',
+            '12345'
+        )
+        self.client.force_authenticate(self.user)
+        self.tag = Tag.objects.create(user=self.user, name='vegan')
+        self.ingredient = Ingredients.objects.create(
+            user=self.user, name='salt'
+        )
+
+    def payload(self, count):
+        return [
+            {
+                'title': f'recipe {i}',
+                'time_minutes': 10 + i,
+                'price': '4.50',
+                'tag': [self.tag.id],
+                'ingredients': [self.ingredient.id],
+            }
+            for i in range(count)
+        ]
+
+    def test_bulk_create(self):
+        """Test creating a batch writes recipes and their relations"""
+        res = self.client.post(BULK_URL, self.payload(3), format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        ids = [item['id'] for item in res.data['results']]
+        recipes = Recipe.objects.filter(pk__in=ids, user=self.user)
+        self.assertEqual(recipes.count(), 3)
+        for recipe in recipes:
+            self.assertEqual(list(recipe.tag.all()), [self.tag])
+            self.assertEqual(list(recipe.ingredients.all()), [self.ingredient])
+
+    def test_bulk_create_is_visible_in_list(self):
+        """Test a bulk write invalidates cached lists"""
+        self.client.get(RECIPE_URL)
+        self.client.post(BULK_URL, self.payload(2), format='json')
+
+        res = self.client.get(RECIPE_URL)
+
+        self.assertEqual(len(res.data), 2)
+
+    def assertWithinBudget(self, method, data, extra=0):
+        """Call the bulk endpoint and fail if it runs over its budget"""
+        with CaptureQueriesContext(connection) as queries:
+            res = getattr(self.client, method)(BULK_URL, data, format='json')
+        self.assertLessEqual(
+            len(queries), RecipeViewSet.query_budgets['bulk_write'] + extra,
+            '\n'.join(query['sql'] for query in queries.captured_queries)
+        )
+        return res
+
+    def test_bulk_create_query_count_is_constant(self):
+        """Test a batch costs a fixed number of queries"""
+        res = self.assertWithinBudget('post', self.payload(50))
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+    def test_bulk_create_without_returned_ids(self):
+        """Test backends without RETURNING read the new ids back at once"""
+        # One query more than the budget reads the ids back
+        with patch.object(connection.features,
+                          'can_return_rows_from_bulk_insert', False):
+            res = self.assertWithinBudget('post', self.payload(20), extra=1)
+
+        ids = [item['id'] for item in res.data['results']]
+        self.assertEqual(
+            list(Recipe.objects.filter(pk__in=ids).order_by('pk')
+                 .values_list('title', flat=True)),
+            [f'recipe {i}' for i in range(20)],
+        )
+        self.assertEqual(ids, sorted(ids))
+        for recipe in Recipe.objects.filter(pk__in=ids):
+            self.assertEqual(list(recipe.tag.all()), [self.tag])
+
+    def test_bulk_update_and_delete_query_counts_are_constant(self):
+        """Test patching and deleting a batch cost a fixed number of queries"""
+        ids = [
+            item['id'] for item in self.client.post(
+                BULK_URL, self.payload(50), format='json'
+            ).data['results']
+        ]
+
+        res = self.assertWithinBudget('patch', [
+            {'id': pk, 'title': 'renamed', 'tag': [self.tag.id]}
+            for pk in ids
+        ])
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        res = self.assertWithinBudget('delete', {'ids': ids})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_bulk_create_invalid_item_rejects_batch(self):
+        """Test one invalid item fails the batch with per item errors"""
+        other = get_user_model().objects.create_user('o@api.com', '12345')
+        foreign = Tag.objects.create(user=other, name='not mine')
+        items = self.payload(3)
+        items[1]['title'] = ''
+        items[2]['tag'] = [foreign.id]
+
+        res = self.client.post(BULK_URL, items, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        results = res.data['results']
+        self.assertEqual(results[0]['status'], 424)
+        self.assertIn('title', results[1]['errors'])
+        self.assertIn('tag', results[2]['errors'])
+        self.assertFalse(Recipe.objects.filter(user=self.user).exists())
+
+    @override_settings(RECIPE_BULK_MAX_BATCH=2)
+    def test_bulk_batch_size_is_limited(self):
+        """Test batches over the configured maximum are rejected"""
+        res = self.client.post(BULK_URL, self.payload(3), format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_bulk_update(self):
+        """Test patching a batch updates fields and replaces relations"""
+        recipe1 = sample_recipe(self.user)
+        recipe2 = sample_recipe(self.user)
+        recipe1.tag.add(self.tag)
+        new_tag = Tag.objects.create(user=self.user, name='quick')
+        items = [
+            {'id': recipe1.id, 'title': 'renamed', 'tag': [new_tag.id]},
+            {'id': recipe2.id, 'time_minutes': 99},
+        ]
+
+        res = self.client.patch(BULK_URL, items, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        recipe1.refresh_from_db()
+        recipe2.refresh_from_db()
+        self.assertEqual(recipe1.title, 'renamed')
+        self.assertEqual(list(recipe1.tag.all()), [new_tag])
+        self.assertEqual(recipe2.time_minutes, 99)
+        self.assertEqual(recipe2.title, 'sample recipe')
+
+    def test_bulk_update_rejects_boolean_ids(self):
+        """Test JSON true is not taken for the recipe with id 1"""
+        recipe = sample_recipe(self.user)
+
+        res = self.client.patch(
+            BULK_URL, [{'id': True, 'title': 'renamed'}], format='json'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data['results'][0]['errors'],
+                         {'id': ['Not found.']})
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.title, 'sample recipe')
+
+    def test_bulk_update_other_users_recipe(self):
+        """Test recipes of other users cannot be updated"""
+        other = get_user_model().objects.create_user('o@api.com', '12345')
+        recipe = sample_recipe(other)
+
+        res = self.client.patch(
+            BULK_URL, [{'id': recipe.id, 'title': 'mine'}], format='json'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.title, 'sample recipe')
+
+    def test_bulk_delete(self):
+        """Test deleting a batch reports missing ids"""
+        recipe = sample_recipe(self.user)
+
+        res = self.client.delete(
+            BULK_URL, {'ids': [recipe.id, 9999]}, format='json'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        statuses = [item['status'] for item in res.data['results']]
+        self.assertEqual(statuses, [204, 404])
+        self.assertFalse(Recipe.objects.filter(pk=recipe.id).exists())
+
+    def test_bulk_delete_requires_an_object(self):
+        """Test a bare list of ids is a 400, not a server error"""
+        recipe = sample_recipe(self.user)
+
+        res = self.client.delete(BULK_URL, [recipe.id], format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertTrue(Recipe.objects.filter(pk=recipe.id).exists())
@@ -0,0 +1,154 @@
+import gzip
+import shutil
+import tempfile
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from core import compression
+
+from ..caching import get_cache, stats
+from ..models import Recipe, Tag
+
+RECIPE_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+
+
+def sample_recipe(user, **params):
+    """Create and return a sample recipe"""
+    defaults = {
+        'title': 'sample recipe',
+        'time_minutes': 10,
+        'price': 5.00,
+    }
+    defaults.update(params)
+    return Recipe.objects.create(user=user, **defaults)
+
+
+class ResponseCacheTests(TestCase):
+    """Test the versioned response cache with the local memory backend"""
+
+    def setUp(self):
+        get_cache().clear()
+        stats.reset()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'cache@api.com',
+            '12345'
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_repeat_list_is_served_from_cache(self):
+        """Test a repeated list request does not touch the database"""
+        sample_recipe(self.user)
+        first = self.client.get(RECIPE_URL)
+
+        with self.assertNumQueries(0):
+            second = self.client.get(RECIPE_URL)
+
+        self.assertEqual(first['X-Cache'], 'MISS')
+        self.assertEqual(second['X-Cache'], 'HIT')
+        self.assertEqual(second.json(), first.json())
+        self.assertEqual(stats.as_dict(), {'hits': 1, 'misses': 1})
+
+    @override_settings(COMPRESS_MIN_SIZE=0)
+    def test_hits_served_precompressed(self):
+        """Test cached responses are compressed once, not on every hit"""
+        sample_recipe(self.user)
+        with patch('core.compression.compress',
+                   wraps=compression.compress) as compress:
+            first = self.client.get(RECIPE_URL, HTTP_ACCEPT_ENCODING='gzip')
+            second = self.client.get(RECIPE_URL,
+                                     HTTP_ACCEPT_ENCODING='gzip')
+            plain = self.client.get(RECIPE_URL)
+
+        self.assertEqual(compress.call_count, 1)
+        self.assertEqual(second['X-Cache'], 'HIT')
+        self.assertEqual(second['Content-Encoding'], 'gzip')
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(gzip.decompress(second.content), plain.content)
+        self.assertNotIn('Content-Encoding', plain)
+
+    def test_query_params_are_normalized(self):
+        """Test parameter order does not change the cache key"""
+        self.client.get(RECIPE_URL + '?page_size=5&tag=1')
+        res = self.client.get(RECIPE_URL + '?tag=1&page_size=5')
+
+        self.assertEqual(res['X-Cache'], 'HIT')
+
+    def test_save_invalidates(self):
+        """Test creating a recipe is visible on the next list"""
+        self.client.get(RECIPE_URL)
+        sample_recipe(self.user, title='new')
+
+        res = self.client.get(RECIPE_URL)
+
+        self.assertEqual(res['X-Cache'], 'MISS')
+        self.assertEqual(len(res.json()), 1)
+
+    def test_delete_invalidates(self):
+        """Test deleting a tag is visible on the next list"""
+        tag = Tag.objects.create(user=self.user, name='vegan')
+        self.client.get(TAGS_URL)
+        tag.delete()
+
+        res = self.client.get(TAGS_URL)
+
+        self.assertEqual(res.json(), [])
+
+    def test_m2m_change_invalidates(self):
+        """Test adding a tag to a recipe is visible on the next list"""
+        recipe = sample_recipe(self.user)
+        tag = Tag.objects.create(user=self.user, name='vegan')
+        self.client.get(RECIPE_URL)
+        recipe.tag.add(tag)
+
+        res = self.client.get(RECIPE_URL)
+
+        self.assertEqual(res.json()[0]['tag'], [tag.id])
+
+    def test_cache_is_per_user(self):
+        """Test users never see each other's cached responses"""
+        sample_recipe(self.user)
+        self.client.get(RECIPE_URL)
+        other = get_user_model().objects.create_user(
+            'other@api.com',
+            '12345'
+        )
+        self.client.force_authenticate(other)
+
+        res = self.client.get(RECIPE_URL)
+
+        self.assertEqual(res['X-Cache'], 'MISS')
+        self.assertEqual(res.json(), [])
+
+    @override_settings(RECIPE_RESPONSE_CACHE_TIMEOUT=0)
+    def test_cache_can_be_disabled(self):
+        """Test a zero timeout bypasses the cache"""
+        self.client.get(RECIPE_URL)
+        res = self.client.get(RECIPE_URL)
+
+        self.assertNotIn('X-Cache', res)
+
+
+class FileBasedResponseCacheTests(ResponseCacheTests):
+    """Test the versioned response cache with the file based backend"""
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.settings_override = override_settings(CACHES={
+            'default': {
+                'BACKEND':
+                    'django.core.cache.backends.filebased.FileBasedCache',
+                'LOCATION': self.cache_dir,
+            }
+        })
+        self.settings_override.enable()
+        super().setUp()
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
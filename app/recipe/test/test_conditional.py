@@ -0,0 +1,169 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import http_date
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from ..caching import get_cache
+from ..models import Recipe, Tag
+
+RECIPE_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+
+
+def detail_url(recipe_id):
+    """Return recipe detail url"""
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+def sample_recipe(user, **params):
+    """Create and return a sample recipe"""
+    defaults = {
+        'title': 'sample recipe',
+        'time_minutes': 10,
+        'price': 5.00,
+    }
+    defaults.update(params)
+    return Recipe.objects.create(user=user, **defaults)
+
+
+@override_settings(RECIPE_RESPONSE_CACHE_TIMEOUT=0)
+class ConditionalGetTests(TestCase):
+    """Test ETag and Last-Modified handling of the recipe API"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'etag@api.com',
+            '12345'
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_list_not_modified(self):
+        """Test a matching If-None-Match is answered with a single query"""
+        sample_recipe(self.user)
+        res = self.client.get(RECIPE_URL)
+
+        with self.assertNumQueries(1):
+            res = self.client.get(
+                RECIPE_URL, HTTP_IF_NONE_MATCH=res['ETag']
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(res.content, b'')
+
+    def test_list_etag_changes_on_write(self):
+        """Test adding a tag to a recipe changes the list ETag"""
+        recipe = sample_recipe(self.user)
+        etag = self.client.get(RECIPE_URL)['ETag']
+        recipe.tag.add(Tag.objects.create(user=self.user, name='vegan'))
+
+        res = self.client.get(RECIPE_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(res['ETag'], etag)
+
+    def test_list_etag_changes_on_delete(self):
+        """Test deleting a recipe changes the list ETag"""
+        sample_recipe(self.user)
+        recipe = sample_recipe(self.user)
+        etag = self.client.get(RECIPE_URL)['ETag']
+        Recipe.objects.filter(pk=recipe.pk).delete()
+
+        res = self.client.get(RECIPE_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_list_ignores_if_modified_since(self):
+        """Test lists are not revalidated by date once a row is deleted"""
+        sample_recipe(self.user)
+        recipe = sample_recipe(self.user)
+        res = self.client.get(RECIPE_URL)
+        self.assertNotIn('Last-Modified', res)
+        Recipe.objects.filter(pk=recipe.pk).delete()
+        later = http_date((timezone.now() + timedelta(minutes=1)).timestamp())
+
+        res = self.client.get(RECIPE_URL, HTTP_IF_MODIFIED_SINCE=later)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data), 1)
+
+    def test_tag_list_not_modified(self):
+        """Test tag lists support revalidation"""
+        Tag.objects.create(user=self.user, name='vegan')
+        etag = self.client.get(TAGS_URL)['ETag']
+
+        res = self.client.get(TAGS_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_assigned_only_etag_changes_when_recipe_moves(self):
+        """Test moving a recipe to another tag changes the assigned list"""
+        tag_a = Tag.objects.create(user=self.user, name='a')
+        tag_b = Tag.objects.create(user=self.user, name='b')
+        tag_c = Tag.objects.create(user=self.user, name='c')
+        recipe = sample_recipe(self.user)
+        recipe.tag.add(tag_a, tag_c)
+        res = self.client.get(TAGS_URL, {'assigned_only': 1})
+        self.assertEqual([tag['name'] for tag in res.data], ['c', 'a'])
+
+        recipe.tag.remove(tag_a)
+        recipe.tag.add(tag_b)
+
+        res = self.client.get(TAGS_URL, {'assigned_only': 1},
+                              HTTP_IF_NONE_MATCH=res['ETag'])
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([tag['name'] for tag in res.data], ['c', 'b'])
+
+    def test_detail_not_modified(self):
+        """Test a detail revalidation only reads the row itself"""
+        recipe = sample_recipe(self.user)
+        etag = self.client.get(detail_url(recipe.id))['ETag']
+
+        with self.assertNumQueries(1):
+            res = self.client.get(
+                detail_url(recipe.id), HTTP_IF_NONE_MATCH=etag
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_detail_etag_changes_when_nested_tag_renamed(self):
+        """Test renaming a tag changes the ETag of recipes that nest it"""
+        recipe = sample_recipe(self.user)
+        tag = Tag.objects.create(user=self.user, name='vegan')
+        recipe.tag.add(tag)
+        etag = self.client.get(detail_url(recipe.id))['ETag']
+        tag.name = 'vegetarian'
+        tag.save()
+
+        res = self.client.get(detail_url(recipe.id), HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['tag'][0]['name'], 'vegetarian')
+
+
+class CachedConditionalGetTests(TestCase):
+    """Test revalidation against cached list responses"""
+
+    def setUp(self):
+        get_cache().clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'etag-cache@api.com',
+            '12345'
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_cached_list_not_modified(self):
+        """Test a cached list answers revalidation without any query"""
+        sample_recipe(self.user)
+        etag = self.client.get(RECIPE_URL)['ETag']
+
+        with self.assertNumQueries(0):
+            res = self.client.get(RECIPE_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
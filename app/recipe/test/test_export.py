@@ -0,0 +1,192 @@
+import csv
+import io
+import json
+import os
+import tempfile
+
+from asgiref.testing import ApplicationCommunicator
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.asyncviews import AsyncViewsASGIHandler
+
+from .. import export
+from ..models import Ingredients, Recipe, Tag
+
+EXPORT_URL = reverse('recipe:recipe-export')
+
+
+class RecipeExportTests(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'export@api.com', '12345'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.vegan = Tag.objects.create(user=self.user, name='Vegan')
+        self.dinner = Tag.objects.create(user=self.user, name='Dinner')
+        self.carrot = Ingredients.objects.create(
+            user=self.user, name='Carrot'
+        )
+        self.soup = Recipe.objects.create(
+            user=self.user, title='Soup', time_minutes=20, price='4.50'
+        )
+        self.soup.tag.add(self.vegan, self.dinner)
+        self.soup.ingredients.add(self.carrot)
+        self.toast = Recipe.objects.create(
+            user=self.user, title='Toast, buttered', time_minutes=3,
+            price='1.00'
+        )
+
+    def test_ndjson(self):
+        """Test recipes stream as NDJSON with their related names"""
+        res = self.client.get(EXPORT_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res.streaming)
+        self.assertEqual(res['Content-Type'], 'application/x-ndjson')
+        lines = b''.join(res.streaming_content).splitlines()
+        self.assertEqual(json.loads(lines[0]), {
+            'id': self.soup.id, 'title': 'Soup', 'time_minutes': 20,
+            'price': '4.50', 'link': '', 'tag': ['Dinner', 'Vegan'],
+            'ingredients': ['Carrot'],
+        })
+        self.assertEqual(json.loads(lines[1])['tag'], [])
+        self.assertEqual(len(lines), 2)
+
+    def test_csv(self):
+        """Test recipes stream as CSV with a header row"""
+        res = self.client.get(EXPORT_URL, {'type': 'csv'})
+
+        self.assertEqual(res['Content-Type'], 'text/csv; charset=utf-8')
+        rows = list(csv.reader(io.StringIO(
+            b''.join(res.streaming_content).decode()
+        )))
+        self.assertEqual(rows[0], [
+            'id', 'title', 'time_minutes', 'price', 'link', 'tag',
+            'ingredients',
+        ])
+        self.assertEqual(rows[1][5], 'Dinner; Vegan')
+        self.assertEqual(rows[2][1], 'Toast, buttered')
+
+    def test_unknown_type_rejected(self):
+        """Test an unknown export type is a 400"""
+        res = self.client.get(EXPORT_URL, {'type': 'xml'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_only_own_filtered_recipes(self):
+        """Test exports hold the user's recipes matching the filters"""
+        other = get_user_model().objects.create_user(
+            'other@api.com', '12345'
+        )
+        Recipe.objects.create(
+            user=other, title='Stew', time_minutes=5, price='2.00'
+        )
+
+        res = self.client.get(EXPORT_URL, {'tag': self.vegan.id})
+        lines = b''.join(res.streaming_content).splitlines()
+        self.assertEqual([json.loads(line)['title'] for line in lines],
+                         ['Soup'])
+
+    def test_names_fetched_per_chunk(self):
+        """Test related names cost one query per chunk, not per recipe"""
+        for index in range(5):
+            recipe = Recipe.objects.create(
+                user=self.user, title=f'Pie {index}', time_minutes=5,
+                price='3.00'
+            )
+            recipe.tag.add(self.vegan)
+        queryset = Recipe.objects.filter(user=self.user)
+
+        with CaptureQueriesContext(connection) as queries:
+            lines = list(export.export(queryset, 'ndjson', size=3))
+
+        self.assertEqual(len(lines), 7)
+        # The recipes, plus tags and ingredients for each of 3 chunks
+        self.assertEqual(len(queries), 1 + 3 * 2)
+
+    def test_command(self):
+        """Test the export_recipes command writes the same export"""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'recipes.ndjson')
+            call_command('export_recipes', 'export@api.com',
+                         output=path, chunk_size=1)
+            with open(path, 'rb') as out:
+                lines = out.read().splitlines()
+
+        self.assertEqual(
+            [json.loads(line)['title'] for line in lines],
+            ['Soup', 'Toast, buttered'],
+        )
+
+    def test_command_stdout_csv(self):
+        """Test the command writes to stdout by default"""
+        out = io.StringIO()
+        call_command('export_recipes', 'export@api.com', type='csv',
+                     stdout=out)
+
+        self.assertEqual(len(out.getvalue().splitlines()), 3)
+
+
+# The body is produced on the ORM pool, whose connections only see
+# committed data.
+@override_settings(RECIPE_EXPORT_CHUNK_SIZE=2)
+class AsgiExportTests(TransactionTestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'asgi-export@api.com', '12345'
+        )
+        self.token = Token.objects.create(user=self.user)
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        for index in range(5):
+            recipe = Recipe.objects.create(
+                user=self.user, title=f'Soup {index}', time_minutes=5,
+                price='2.00'
+            )
+            recipe.tag.add(tag)
+
+    async def get(self, path, query_string=b''):
+        """Return the status and full body of a GET over ASGI"""
+        communicator = ApplicationCommunicator(AsyncViewsASGIHandler(), {
+            'type': 'http', 'method': 'GET', 'path': path,
+            'query_string': query_string,
+            'headers': [
+                (b'host', b'testserver'),
+                (b'authorization', f'Token {self.token.key}'.encode()),
+            ],
+        })
+        await communicator.send_input({'type': 'http.request'})
+        start = await communicator.receive_output(timeout=10)
+        body = b''
+        while True:
+            message = await communicator.receive_output(timeout=10)
+            body += message.get('body', b'')
+            if not message.get('more_body'):
+                return start['status'], body
+
+    async def test_ndjson_over_asgi(self):
+        """Test the whole export streams under the ASGI handler"""
+        status_code, body = await self.get(EXPORT_URL)
+
+        self.assertEqual(status_code, 200)
+        lines = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual([line['title'] for line in lines],
+                         [f'Soup {index}' for index in range(5)])
+        self.assertEqual(lines[-1]['tag'], ['Vegan'])
+
+    async def test_csv_over_asgi(self):
+        """Test CSV exports stream under the ASGI handler too"""
+        status_code, body = await self.get(EXPORT_URL, b'type=csv')
+
+        self.assertEqual(status_code, 200)
+        self.assertEqual(len(body.decode().splitlines()), 6)
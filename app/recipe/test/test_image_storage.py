@@ -0,0 +1,239 @@
+import hashlib
+import io
+import shutil
+import tempfile
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from .. import images
+from ..models import ImageBlob, Recipe
+from ..storage import rendition_name, save_upload
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def image_upload_url(recipe_id):
+    """Return url for image upload"""
+    return reverse('recipe:recipe-upload-image', args=[recipe_id])
+
+
+def sample_recipe(user, **params):
+    """Create and return a sample recipe"""
+    defaults = {
+        'title': 'sample recipe',
+        'time_minutes': 10,
+        'price': 5.00,
+    }
+    defaults.update(params)
+    return Recipe.objects.create(user=user, **defaults)
+
+
+def jpeg_bytes(color='red'):
+    """Return the bytes of a small JPEG image"""
+    buffer = io.BytesIO()
+    Image.new('RGB', (20, 20), color).save(buffer, format='JPEG')
+    return buffer.getvalue()
+
+
+@override_settings(
+    RECIPE_IMAGE_STORAGE='content',
+    RECIPE_IMAGE_WORKERS=0,
+    MEDIA_ROOT=MEDIA_ROOT,
+)
+class ContentAddressedStorageTests(TestCase):
+    """Test deduplicated, reference counted recipe image storage"""
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'blob@api.com',
+            'testpass'
+        )
+        self.client.force_authenticate(self.user)
+
+    def upload(self, recipe, content):
+        upload = SimpleUploadedFile('photo.jpg', content, 'image/jpeg')
+        res = self.client.post(
+            image_upload_url(recipe.id), {'image': upload},
+            format='multipart'
+        )
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+        recipe.refresh_from_db()
+        return recipe.image.name
+
+    def test_identical_uploads_share_one_file(self):
+        """Test the same bytes uploaded twice are stored once"""
+        content = jpeg_bytes()
+        first = self.upload(sample_recipe(self.user), content)
+        second = self.upload(sample_recipe(self.user), content)
+
+        digest = hashlib.sha256(content).hexdigest()
+        self.assertEqual(first, second)
+        self.assertIn(digest, first)
+        blob = ImageBlob.objects.get(digest=digest)
+        self.assertEqual(blob.refcount, 2)
+        self.assertEqual(blob.size, len(content))
+
+    def test_file_removed_with_last_reference(self):
+        """Test the file outlives all but the last recipe using it"""
+        content = jpeg_bytes()
+        recipe1 = sample_recipe(self.user)
+        recipe2 = sample_recipe(self.user)
+        name = self.upload(recipe1, content)
+        self.upload(recipe2, content)
+        thumbnail = recipe2.image_renditions['thumbnail']
+
+        recipe1.delete()
+        self.assertTrue(default_storage.exists(name))
+
+        recipe2.delete()
+        self.assertFalse(default_storage.exists(name))
+        self.assertFalse(default_storage.exists(thumbnail))
+        self.assertEqual(ImageBlob.objects.get(name=name).refcount, 0)
+
+    def test_reupload_keeps_single_reference(self):
+        """Test uploading the current image again does not leak a reference"""
+        recipe = sample_recipe(self.user)
+        content = jpeg_bytes()
+        self.upload(recipe, content)
+        name = self.upload(recipe, content)
+
+        self.assertEqual(ImageBlob.objects.get(name=name).refcount, 1)
+
+    def test_replaced_image_is_released(self):
+        """Test replacing a recipe image frees the old file"""
+        recipe = sample_recipe(self.user)
+        old = self.upload(recipe, jpeg_bytes('red'))
+        new = self.upload(recipe, jpeg_bytes('blue'))
+
+        self.assertNotEqual(old, new)
+        self.assertFalse(default_storage.exists(old))
+        self.assertTrue(default_storage.exists(new))
+
+    def test_invalid_upload_is_released(self):
+        """Test bytes that fail verification do not keep a reference"""
+        recipe = sample_recipe(self.user)
+        self.upload(recipe, b'not an image at all')
+
+        blob = ImageBlob.objects.get()
+        self.assertEqual(blob.refcount, 0)
+        self.assertFalse(default_storage.exists(blob.name))
+        self.assertEqual(recipe.image_status, Recipe.IMAGE_FAILED)
+
+    def test_save_upload_without_handler(self):
+        """Test uploads that were not hashed on arrival are hashed once"""
+        content = jpeg_bytes()
+        upload = SimpleUploadedFile('photo.JPG', content, 'image/jpeg')
+
+        name = save_upload(None, upload)
+
+        digest = hashlib.sha256(content).hexdigest()
+        self.assertTrue(name.endswith(f'{digest}.jpg'))
+        with default_storage.open(name) as stored:
+            self.assertEqual(stored.read(), content)
+
+
+@override_settings(RECIPE_IMAGE_STORAGE='uuid', MEDIA_ROOT=MEDIA_ROOT)
+class ImagePipelineTests(TestCase):
+    """Test the image pool and the lifetime of uuid named images"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'pipeline@api.com',
+            'testpass'
+        )
+        self.client.force_authenticate(self.user)
+        self.recipe = sample_recipe(self.user)
+
+    def upload(self, content):
+        upload = SimpleUploadedFile('photo.jpg', content, 'image/jpeg')
+        res = self.client.post(
+            image_upload_url(self.recipe.id), {'image': upload},
+            format='multipart'
+        )
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+        self.recipe.refresh_from_db()
+        return self.recipe
+
+    @override_settings(RECIPE_IMAGE_WORKERS=1, RECIPE_IMAGE_QUEUE_SIZE=0)
+    def test_slot_taken_on_commit(self):
+        """Test an upload that never commits holds no pool slot"""
+        # TestCase never commits, so the on_commit callback never runs
+        self.upload(jpeg_bytes())
+        self.upload(jpeg_bytes())
+
+        _, slots = images._pool()
+        self.assertTrue(slots.acquire(blocking=False))
+        slots.release()
+        default_storage.delete(self.recipe.image_pending)
+
+    def test_pool_follows_settings(self):
+        """Test the pool is rebuilt when its configured size changes"""
+        with override_settings(RECIPE_IMAGE_WORKERS=1):
+            first, _ = images._pool()
+            self.assertIs(images._pool()[0], first)
+        with override_settings(RECIPE_IMAGE_WORKERS=3):
+            executor, _ = images._pool()
+
+        self.assertIsNot(executor, first)
+        self.assertEqual(executor._max_workers, 3)
+
+    @override_settings(RECIPE_IMAGE_WORKERS=1, RECIPE_IMAGE_QUEUE_SIZE=0)
+    def test_full_pool_leaves_upload_pending(self):
+        """Test a recipe the pool cannot take is requeued once stale"""
+        self.upload(jpeg_bytes())
+        _, slots = images._pool()
+        slots.acquire()
+        try:
+            with self.assertLogs('recipe.images', 'WARNING'):
+                self.assertFalse(images.submit(self.recipe.pk))
+        finally:
+            slots.release()
+        self.assertEqual(list(images.stale_uploads(60)), [])
+        Recipe.objects.filter(pk=self.recipe.pk).update(
+            updated_at=timezone.now() - timedelta(minutes=2)
+        )
+
+        out = StringIO()
+        call_command('requeue_images', '--older-than', '60', stdout=out)
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_status, Recipe.IMAGE_READY)
+        self.assertIn('Processed 1', out.getvalue())
+        images.delete_renditions(self.recipe)
+        self.recipe.image.delete()
+
+    @override_settings(RECIPE_IMAGE_WORKERS=0)
+    def test_replaced_image_is_deleted(self):
+        """Test replacing a uuid named image deletes it and its renditions"""
+        old = self.upload(jpeg_bytes('red')).image.name
+        old_renditions = list(self.recipe.image_renditions.values())
+        new = self.upload(jpeg_bytes('blue')).image.name
+
+        self.assertNotEqual(old, new)
+        self.assertFalse(default_storage.exists(old))
+        for name in old_renditions:
+            self.assertFalse(default_storage.exists(name))
+        self.assertTrue(default_storage.exists(
+            rendition_name(new, 'thumbnail')
+        ))
+
+        self.recipe.delete()
+        self.assertFalse(default_storage.exists(new))
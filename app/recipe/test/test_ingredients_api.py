@@ -129,4 +129,37 @@ class PrivateIngredientsApiTest(TestCase):
         res = self.client.get(INGREDIENTS_URL,{'assigned_only': 1})
         self.assertEqual(len(res.data),1)
     
-    
\ No newline at end of file
+    
+
+    def test_autocomplete_ingredients_by_prefix(self):
+        """Test autocomplete returns ingredients starting with the prefix"""
+        Ingredients.objects.create(user=self.user, name='Salt')
+        Ingredients.objects.create(user=self.user, name='salmon')
+        Ingredients.objects.create(user=self.user, name='Pepper')
+
+        res = self.client.get(
+            reverse('recipe:ingredients-autocomplete'), {'prefix': 'sal'}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [ingredient['name'] for ingredient in res.data],
+            ['salmon', 'Salt']
+        )
+
+    def test_list_ingredients_with_counts(self):
+        """Test with_counts combines with assigned_only"""
+        salt = Ingredients.objects.create(user=self.user, name='Salt')
+        Ingredients.objects.create(user=self.user, name='Pepper')
+        recipe = Recipe.objects.create(
+            user=self.user, title='Fries', time_minutes=5, price=2.00
+        )
+        recipe.ingredients.add(salt)
+
+        res = self.client.get(
+            INGREDIENTS_URL, {'with_counts': 1, 'assigned_only': 1}
+        )
+
+        self.assertEqual(res.data, [
+            {'id': salt.id, 'name': 'Salt', 'recipe_count': 1},
+        ])
@@ -0,0 +1,165 @@
+import base64
+import json
+import re
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from ..models import Recipe, Tag
+
+RECIPE_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+
+
+def sample_recipe(user, **params):
+    """Create and return a sample recipe"""
+    defaults = {
+        'title': 'sample recipe',
+        'time_minutes': 10,
+        'price': 5.00,
+    }
+    defaults.update(params)
+    return Recipe.objects.create(user=user, **defaults)
+
+
+def make_cursor(position):
+    """Return a hand-made cursor for position"""
+    raw = json.dumps({'p': position, 'r': 0}).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def parse_links(res):
+    """Return the rel -> url mapping from a response Link header"""
+    header = res.get('Link', '')
+    links = re.findall(r'<([^>]+)>; rel="(\w+)"', header)
+    return dict((rel, url) for url, rel in links)
+
+
+@override_settings(RECIPE_PAGE_SIZE=3, RECIPE_MAX_PAGE_SIZE=5)
+class KeysetPaginationTests(TestCase):
+    """Test cursor pagination of the recipe list endpoints"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'pager@api.com',
+            '12345'
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_pages_cover_every_recipe_once(self):
+        """Test following next links returns every recipe in -id order"""
+        recipes = [sample_recipe(self.user, title=f'r{i}') for i in range(8)]
+
+        seen = []
+        url = RECIPE_URL
+        while url:
+            res = self.client.get(url)
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            self.assertLessEqual(len(res.data), 3)
+            seen.extend(item['id'] for item in res.data)
+            url = parse_links(res).get('next')
+
+        expected = sorted((recipe.id for recipe in recipes), reverse=True)
+        self.assertEqual(seen, expected)
+
+    def test_previous_link_returns_prior_page(self):
+        """Test the prev link of the second page returns the first page"""
+        for i in range(7):
+            sample_recipe(self.user, title=f'r{i}')
+
+        first = self.client.get(RECIPE_URL)
+        second = self.client.get(parse_links(first)['next'])
+        previous = self.client.get(parse_links(second)['prev'])
+
+        self.assertEqual(previous.data, first.data)
+        self.assertNotIn('prev', parse_links(first))
+
+    def test_page_size_is_capped(self):
+        """Test ?page_size= cannot exceed the configured maximum"""
+        for i in range(8):
+            sample_recipe(self.user, title=f'r{i}')
+
+        res = self.client.get(RECIPE_URL, {'page_size': 100})
+
+        self.assertEqual(len(res.data), 5)
+        self.assertIn('next', parse_links(res))
+
+    def test_invalid_cursor(self):
+        """Test a tampered cursor is rejected"""
+        res = self.client.get(RECIPE_URL, {'cursor': 'not-a-cursor'})
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_cursor_values_are_type_checked(self):
+        """Test cursor positions of the wrong type are rejected"""
+        sample_recipe(self.user)
+        for position in (['abc'], [None], [{'a': 1}], [[1]]):
+            res = self.client.get(RECIPE_URL,
+                                  {'cursor': make_cursor(position)})
+            self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND,
+                             position)
+
+        res = self.client.get(RECIPE_URL, {
+            'q': 'sample', 'cursor': make_cursor(['abc', 1]),
+        })
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+        res = self.client.get(RECIPE_URL, {
+            'q': 'sample', 'cursor': make_cursor([1, 1000000]),
+        })
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        for position in ([None, 1], ['main', 'abc'], ['main', [1]]):
+            res = self.client.get(TAGS_URL,
+                                  {'cursor': make_cursor(position)})
+            self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND,
+                             position)
+
+    def test_cursor_values_are_coerced(self):
+        """Test well-formed values of another JSON type are accepted"""
+        sample_recipe(self.user)
+
+        res = self.client.get(RECIPE_URL,
+                              {'cursor': make_cursor(['1000000'])})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data), 1)
+
+    def test_filters_are_kept_across_pages(self):
+        """Test tag filters apply to every page and rows are not repeated"""
+        vegan = Tag.objects.create(user=self.user, name='vegan')
+        quick = Tag.objects.create(user=self.user, name='quick')
+        tagged = []
+        for i in range(5):
+            recipe = sample_recipe(self.user, title=f'tagged {i}')
+            recipe.tag.add(vegan, quick)
+            tagged.append(recipe.id)
+        sample_recipe(self.user, title='untagged')
+
+        seen = []
+        url = f'{RECIPE_URL}?tag={vegan.id},{quick.id}'
+        while url:
+            res = self.client.get(url)
+            seen.extend(item['id'] for item in res.data)
+            url = parse_links(res).get('next')
+
+        self.assertEqual(seen, sorted(tagged, reverse=True))
+
+    def test_tags_paginate_by_name_then_id(self):
+        """Test tags with equal names are paged by id without gaps"""
+        recipe = sample_recipe(self.user)
+        for name in ['b', 'a', 'b', 'c', 'b', 'a']:
+            recipe.tag.add(Tag.objects.create(user=self.user, name=name))
+        Tag.objects.create(user=self.user, name='unused')
+
+        seen = []
+        url = f'{TAGS_URL}?assigned_only=1'
+        while url:
+            res = self.client.get(url)
+            seen.extend((item['name'], item['id']) for item in res.data)
+            url = parse_links(res).get('next')
+
+        self.assertEqual(len(seen), 6)
+        self.assertEqual(seen, sorted(seen, reverse=True))
@@ -0,0 +1,161 @@
+import shutil
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from PIL import Image
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from ..models import Ingredients, Recipe, Tag
+from ..views import IngredientsViewSet, RecipeViewSet, TagViewSet
+
+RECIPE_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+INGREDIENTS_URL = reverse('recipe:ingredients-list')
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def detail_url(recipe_id):
+    """Return recipe detail url"""
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class QueryBudgetTests(TestCase):
+    """Test every endpoint stays within its per-action query budget"""
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'budget@api.com',
+            '12345'
+        )
+        self.client.force_authenticate(self.user)
+
+    def seed(self, count):
+        """Create recipes that each carry several tags and ingredients"""
+        tags = [
+            Tag.objects.create(user=self.user, name=f'tag {i}')
+            for i in range(4)
+        ]
+        ingredients = [
+            Ingredients.objects.create(user=self.user, name=f'ingredient {i}')
+            for i in range(4)
+        ]
+        recipes = []
+        for i in range(count):
+            recipe = Recipe.objects.create(
+                user=self.user,
+                title=f'recipe {i}',
+                time_minutes=10,
+                price=5.00
+            )
+            recipe.tag.add(*tags)
+            recipe.ingredients.add(*ingredients)
+            recipes.append(recipe)
+        return recipes
+
+    def assertWithinBudget(self, budget, method, url, **kwargs):
+        """Call the endpoint and fail if it runs more than budget queries"""
+        with CaptureQueriesContext(connection) as queries:
+            res = getattr(self.client, method)(url, **kwargs)
+        self.assertLessEqual(
+            len(queries), budget,
+            '\n'.join(query['sql'] for query in queries.captured_queries)
+        )
+        return res, len(queries)
+
+    def test_recipe_list_is_constant(self):
+        """Test listing recipes does not run a query per row"""
+        budget = RecipeViewSet.query_budgets['list']
+        self.seed(2)
+        _, small = self.assertWithinBudget(budget, 'get', RECIPE_URL)
+        self.seed(30)
+        res, large = self.assertWithinBudget(budget, 'get', RECIPE_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data), 32)
+        self.assertEqual(len(res.data[0]['tag']), 4)
+        self.assertEqual(small, large)
+
+    def test_recipe_retrieve(self):
+        """Test the detail endpoint loads nested objects in bulk"""
+        recipe = self.seed(1)[0]
+        res, _ = self.assertWithinBudget(
+            RecipeViewSet.query_budgets['retrieve'],
+            'get', detail_url(recipe.id)
+        )
+
+        self.assertEqual(len(res.data['ingredients']), 4)
+        self.assertIn('name', res.data['tag'][0])
+
+    def test_tag_and_ingredient_lists(self):
+        """Test tag and ingredient lists do not query per row"""
+        self.seed(3)
+        self.assertWithinBudget(
+            TagViewSet.query_budgets['list'], 'get', TAGS_URL
+        )
+        self.assertWithinBudget(
+            IngredientsViewSet.query_budgets['list'], 'get', INGREDIENTS_URL
+        )
+
+    def test_tag_and_ingredient_counts(self):
+        """Test usage counts cost one grouped query, not one per row"""
+        self.seed(3)
+        for viewset, url in ((TagViewSet, TAGS_URL),
+                             (IngredientsViewSet, INGREDIENTS_URL)):
+            res, _ = self.assertWithinBudget(
+                viewset.query_budgets['list'], 'get', url,
+                data={'with_counts': 1, 'assigned_only': 1}
+            )
+            self.assertEqual(
+                [row['recipe_count'] for row in res.data], [3] * 4
+            )
+
+    def test_autocomplete(self):
+        """Test autocomplete is a single indexed query"""
+        self.seed(1)
+        for basename, viewset in (('tag', TagViewSet),
+                                  ('ingredients', IngredientsViewSet)):
+            res, _ = self.assertWithinBudget(
+                viewset.query_budgets['autocomplete'], 'get',
+                reverse(f'recipe:{basename}-autocomplete'),
+                data={'prefix': basename[:3]}
+            )
+            self.assertEqual(len(res.data), 4)
+
+    def test_upload_image(self):
+        """Test uploads stay within budget in every storage and mode
+
+        Inline processing is left out of the budget by the timing
+        middleware, so its log line is checked rather than every query.
+        """
+        recipe = self.seed(1)[0]
+        url = reverse('recipe:recipe-upload-image', args=[recipe.id])
+        for storage in ('uuid', 'content'):
+            for workers in (0, 1):
+                with self.subTest(storage=storage, workers=workers), \
+                        override_settings(RECIPE_IMAGE_STORAGE=storage,
+                                          RECIPE_IMAGE_WORKERS=workers), \
+                        tempfile.NamedTemporaryFile(suffix='.jpg') as ntf, \
+                        self.assertLogs('core.timing', 'INFO') as logs:
+                    # A new color each time, so every upload makes a blob
+                    Image.new('RGB', (10, 10), (workers, len(storage), 0)
+                              ).save(ntf, format='JPEG')
+                    ntf.seek(0)
+                    res = self.client.post(url, {'image': ntf},
+                                           format='multipart')
+                self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+                self.assertEqual(
+                    [record.levelname for record in logs.records], ['INFO'],
+                    logs.output
+                )
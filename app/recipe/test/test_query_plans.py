@@ -0,0 +1,181 @@
+import re
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from ..models import Ingredients, Recipe, Tag
+
+RECIPE_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+INGREDIENTS_URL = reverse('recipe:ingredients-list')
+
+# Tables that grow with the number of users; a full scan of any of them
+# turns a per-user request into a per-installation one.
+LARGE_TABLES = {
+    model._meta.db_table for model in (
+        Recipe, Tag, Ingredients,
+        Recipe.tag.through, Recipe.ingredients.through,
+    )
+}
+
+
+def explain(sql):
+    """Return the plan lines of a captured query"""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('EXPLAIN ' + sql)
+        else:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+        return [str(row[-1]) for row in cursor.fetchall()]
+
+
+def full_scans(plan):
+    """Return the plan lines that read a large table from end to end"""
+    pattern = re.compile(
+        r'Seq Scan on "?(\w+)"?' if connection.vendor == 'postgresql'
+        else r'^SCAN (?:TABLE )?"?(\w+)"?'
+    )
+    scans = []
+    for line in plan:
+        match = pattern.search(line.strip())
+        if match and match.group(1) in LARGE_TABLES:
+            scans.append(line)
+    return scans
+
+
+def index_names(plan):
+    """Return the names of the indexes a plan reads"""
+    pattern = re.compile(
+        r'(?:Index|Index Only) Scan(?: Backward)? (?:using|on) (\w+)'
+        if connection.vendor == 'postgresql'
+        else r'USING (?:COVERING )?INDEX (\w+)'
+    )
+    return {
+        match.group(1)
+        for match in map(pattern.search, plan) if match
+    }
+
+
+@override_settings(RECIPE_RESPONSE_CACHE_TIMEOUT=0)
+class QueryPlanTests(TestCase):
+    """Test endpoints read large tables through the intended indexes
+
+    The seeded tables are big enough, and analyzed, for the planner to
+    choose between a scan and an index on its own.
+    """
+    USERS = 100
+    NAMES = 200
+    RECIPES = 25
+
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        User.objects.bulk_create(
+            User(email=f'plan{i}@api.com', password='!')
+            for i in range(cls.USERS)
+        )
+        users = list(User.objects.filter(email__startswith='plan'))
+        Tag.objects.bulk_create(
+            Tag(user=user, name=f'tag {i}')
+            for user in users for i in range(cls.NAMES)
+        )
+        Ingredients.objects.bulk_create(
+            Ingredients(user=user, name=f'ingredient {i}')
+            for user in users for i in range(cls.NAMES)
+        )
+        Recipe.objects.bulk_create(
+            Recipe(user=user, title=f'recipe {i}', time_minutes=10,
+                   price=5.00)
+            for user in users for i in range(cls.RECIPES)
+        )
+        for model, field in ((Tag, 'tag'), (Ingredients, 'ingredients')):
+            through = Recipe._meta.get_field(field).remote_field.through
+            names = {}
+            for pk, user_id in model.objects.values_list('pk', 'user_id'):
+                names.setdefault(user_id, []).append(pk)
+            through.objects.bulk_create(
+                through(**{'recipe_id': pk, f'{field}_id': name})
+                for i, (pk, user_id) in enumerate(
+                    Recipe.objects.order_by('pk').values_list('pk', 'user_id')
+                )
+                for name in names[user_id][i % 5:i % 5 + 3]
+            )
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        cls.user = users[0]
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def assertIndexedPlans(self, url, data=None, status=200, indexes=(),
+                           **extra):
+        """Call the endpoint and EXPLAIN every query it ran
+
+        No query may scan a large table from end to end, and together they
+        must read every index in indexes.
+        """
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(url, data, **extra)
+        self.assertEqual(res.status_code, status)
+        plans = []
+        for query in queries.captured_queries:
+            if not query['sql'].lstrip().upper().startswith('SELECT'):
+                continue
+            plan = explain(query['sql'])
+            plans.append(f'{query["sql"]}\n' + '\n'.join(plan))
+            self.assertEqual(full_scans(plan), [], plans[-1])
+        used = index_names('\n'.join(plans).splitlines())
+        for index in indexes:
+            self.assertIn(index, used, '\n\n'.join(plans))
+        return res
+
+    def test_recipe_endpoints(self):
+        """Test the recipe list, filters and detail use indexes"""
+        recipe = Recipe.objects.filter(user=self.user).first()
+        tag = recipe.tag.first()
+        ingredient = recipe.ingredients.first()
+
+        res = self.assertIndexedPlans(
+            RECIPE_URL, {'page_size': 5}, indexes=['recipe_user_id_idx']
+        )
+        self.assertIndexedPlans(res.wsgi_request.build_absolute_uri(
+            res['Link'].split(';')[0].strip('<>')
+        ), indexes=['recipe_user_id_idx'])
+        self.assertIndexedPlans(RECIPE_URL, {'tag': tag.id})
+        self.assertIndexedPlans(RECIPE_URL, {'ingredients': ingredient.id})
+        res = self.assertIndexedPlans(
+            reverse('recipe:recipe-detail', args=[recipe.id])
+        )
+        self.assertIndexedPlans(
+            reverse('recipe:recipe-detail', args=[recipe.id]),
+            status=304, HTTP_IF_NONE_MATCH=res['ETag']
+        )
+
+    def test_recipe_search(self):
+        """Test search only reads the user's recipes on PostgreSQL"""
+        if connection.vendor != 'postgresql':
+            self.skipTest('LIKE %q% cannot use an index')
+        self.assertIndexedPlans(RECIPE_URL, {'q': 'recipe'})
+
+    def test_tag_and_ingredient_endpoints(self):
+        """Test tag and ingredient lists and autocomplete use indexes"""
+        for url, autocomplete, prefix, indexes in (
+                (TAGS_URL, reverse('recipe:tag-autocomplete'), 'tag 7',
+                 ['recipe_tag_user_name_idx', 'recipe_tag_user_lower_name']),
+                (INGREDIENTS_URL, reverse('recipe:ingredients-autocomplete'),
+                 'ingredient 7',
+                 ['recipe_ingr_user_name_idx',
+                  'recipe_ingredients_user_lower_name'])):
+            with self.subTest(url=url):
+                self.assertIndexedPlans(url, indexes=indexes[:1])
+                self.assertIndexedPlans(
+                    url, {'assigned_only': 1, 'with_counts': 1}
+                )
+                self.assertIndexedPlans(
+                    autocomplete, {'prefix': prefix}, indexes=indexes[1:]
+                )
@@ -1,13 +1,19 @@
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.db import connection
+from django.core.files.storage import default_storage
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from rest_framework import status
 from rest_framework import serializers
 from rest_framework.test import APIClient
 from ..models import Recipe, Tag, Ingredients
 from ..serializers import RecipeSerializer, RecipeDetailSerializer
+from ..images import delete_renditions
 import tempfile
 import os
+import shutil
+from unittest.mock import Mock, patch
 from PIL import Image
 
 RECIPE_URL = reverse('recipe:recipe-list')
@@ -198,8 +204,141 @@ class PrivateRecipeApiTest(TestCase):
         tags = recipe.tag.all()
         self.assertEqual(tags.count(),0)
 
+    def test_create_recipe_with_other_users_tag(self):
+        """Test tags owned by another user are rejected"""
+        user2 = get_user_model().objects.create_user(
+            'other@api.com',
+            '12345'
+        )
+        foreign = sample_tag(user=user2, name='not mine')
+        payload = {
+            'title': 'chocolate cake',
+            'tag': [foreign.id],
+            'time_minutes': 30,
+            'price': 4.00
+        }
+        res = self.client.post(RECIPE_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Recipe.objects.filter(user=self.user).exists())
+
+    def test_create_recipe_reports_every_invalid_id(self):
+        """Test all unknown ingredient ids are reported in one error"""
+        ingredient = sample_ingredients(user=self.user)
+        payload = {
+            'title': 'soup',
+            'ingredients': [ingredient.id, 9998, 9999],
+            'time_minutes': 30,
+            'price': 4.00
+        }
+        res = self.client.post(RECIPE_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        error = str(res.data['ingredients'][0])
+        self.assertIn('9998', error)
+        self.assertIn('9999', error)
+
+    def test_create_recipe_validates_ids_in_one_query(self):
+        """Test validation cost does not grow with the number of ids"""
+        ingredients = [
+            sample_ingredients(user=self.user, name=f'ingredient {i}')
+            for i in range(40)
+        ]
+        payload = {
+            'title': 'stew',
+            'ingredients': [ingredient.id for ingredient in ingredients],
+            'time_minutes': 30,
+            'price': 4.00
+        }
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.post(RECIPE_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        lookups = [
+            query for query in queries.captured_queries
+            if query['sql'].startswith('SELECT')
+            and 'recipe_ingredients' in query['sql']
+            and 'recipe_recipe_ingredients' not in query['sql']
+        ]
+        self.assertEqual(len(lookups), 1)
+
+
+@override_settings(RECIPE_RESPONSE_CACHE_TIMEOUT=0)
+class SparseFieldsetTest(TestCase):
+    """Test ?fields= and ?expand= on recipe reads"""
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'fields@api.com', '12345'
+        )
+        self.client.force_authenticate(self.user)
+        self.recipe = sample_recipe(user=self.user, title='Stew')
+        self.tag = sample_tag(user=self.user, name='Vegan')
+        self.recipe.tag.add(self.tag)
+        self.recipe.ingredients.add(sample_ingredients(user=self.user))
+
+    def test_list_fields(self):
+        """Test lists return and load only the requested fields"""
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(
+                RECIPE_URL, {'fields': 'id,title,time_minutes'}
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            res.data, [{'id': self.recipe.id, 'title': 'Stew',
+                        'time_minutes': 10}]
+        )
+        sql = [query['sql'] for query in queries.captured_queries]
+        self.assertFalse(any('recipe_tag' in query for query in sql))
+        self.assertFalse(any('"price"' in query for query in sql))
+
+    def test_list_expand(self):
+        """Test lists nest the relations named in ?expand="""
+        res = self.client.get(RECIPE_URL, {'expand': 'tag'})
+
+        self.assertEqual(res.data[0]['tag'],
+                         [{'id': self.tag.id, 'name': 'Vegan'}])
+        self.assertEqual(res.data[0]['ingredients'],
+                         [self.recipe.ingredients.get().id])
+
+    def test_detail_fields_and_expand(self):
+        """Test details can drop fields and return relations as ids"""
+        res = self.client.get(
+            detail_url(self.recipe.id), {'fields': 'title,tag', 'expand': ''}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, {'title': 'Stew', 'tag': [self.tag.id]})
+
+    def test_detail_expands_by_default(self):
+        """Test details keep nesting tags and ingredients by default"""
+        res = self.client.get(detail_url(self.recipe.id))
+
+        self.assertEqual(res.data['tag'],
+                         [{'id': self.tag.id, 'name': 'Vegan'}])
+
+    def test_unknown_fields_rejected(self):
+        """Test unknown field names are reported"""
+        res = self.client.get(RECIPE_URL, {'fields': 'id,secret'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('secret', str(res.data['fields']))
+
+        res = self.client.get(RECIPE_URL, {'expand': 'title'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(RECIPE_IMAGE_WORKERS=0, MEDIA_ROOT=MEDIA_ROOT)
 class RecipeImageUploadTest(TestCase):
 
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
     def setUp(self):
         self.client = APIClient()
         self.user = get_user_model().objects.create_user(
@@ -210,6 +349,8 @@ class RecipeImageUploadTest(TestCase):
         self.recipe = sample_recipe(user=self.user)
 
     def tearDown(self):
+        self.recipe.refresh_from_db()
+        delete_renditions(self.recipe)
         self.recipe.image.delete()
 
     def test_upload_image_to_recipe(self):
@@ -222,10 +363,69 @@ class RecipeImageUploadTest(TestCase):
             res = self.client.post(url,{'image':ntf}, format='multipart')
             
             self.recipe.refresh_from_db()
-            self.assertEqual(res.status_code,status.HTTP_200_OK)
+            self.assertEqual(res.status_code,status.HTTP_202_ACCEPTED)
             self.assertIn('image',res.data)
+            self.assertEqual(res.data['image_status'], Recipe.IMAGE_READY)
             self.assertTrue(os.path.exists(self.recipe.image.path))
 
+    def test_upload_image_builds_renditions(self):
+        """Test uploading an image creates the configured renditions"""
+        url = image_upload_url(self.recipe.id)
+        with tempfile.NamedTemporaryFile(suffix='.jpg') as ntf:
+            Image.new('RGB',(1000,500)).save(ntf, format='JPEG')
+            ntf.seek(0)
+            self.client.post(url,{'image':ntf}, format='multipart')
+
+        self.recipe.refresh_from_db()
+        thumbnail = self.recipe.image_renditions['thumbnail']
+        with default_storage.open(thumbnail) as fh:
+            self.assertEqual(Image.open(fh).size, (200,100))
+
+    def test_upload_corrupt_image(self):
+        """Test a file that is not an image ends up in the failed state"""
+        url = image_upload_url(self.recipe.id)
+        with tempfile.NamedTemporaryFile(suffix='.jpg') as ntf:
+            ntf.write(b'definitely not a jpeg')
+            ntf.seek(0)
+            res = self.client.post(url,{'image':ntf}, format='multipart')
+
+        self.assertEqual(res.status_code,status.HTTP_202_ACCEPTED)
+        self.assertEqual(res.data['image_status'], Recipe.IMAGE_FAILED)
+        res = self.client.get(url)
+        self.assertEqual(res.data['image_status'], Recipe.IMAGE_FAILED)
+        self.assertIsNone(res.data['image'])
+
+    @override_settings(RECIPE_IMAGE_WORKERS=1)
+    def test_upload_is_queued(self):
+        """Test uploads return before processing when a pool is used"""
+        url = image_upload_url(self.recipe.id)
+        with patch('recipe.images.transaction.on_commit') as on_commit:
+            with tempfile.NamedTemporaryFile(suffix='.jpg') as ntf:
+                Image.new('RGB',(10,10)).save(ntf, format='JPEG')
+                ntf.seek(0)
+                res = self.client.post(url,{'image':ntf}, format='multipart')
+
+        self.assertEqual(res.status_code,status.HTTP_202_ACCEPTED)
+        self.assertEqual(res.data['image_status'], Recipe.IMAGE_PENDING)
+        self.assertEqual(on_commit.call_count, 1)
+        self.recipe.refresh_from_db()
+        default_storage.delete(self.recipe.image_pending)
+
+    @override_settings(RECIPE_IMAGE_WORKERS=1)
+    def test_upload_when_pool_is_full(self):
+        """Test uploads are refused with Retry-After when the pool is full"""
+        url = image_upload_url(self.recipe.id)
+        slots = Mock()
+        slots.acquire.return_value = False
+        with patch('recipe.images._pool', return_value=(None, slots)):
+            with tempfile.NamedTemporaryFile(suffix='.jpg') as ntf:
+                Image.new('RGB',(10,10)).save(ntf, format='JPEG')
+                ntf.seek(0)
+                res = self.client.post(url,{'image':ntf}, format='multipart')
+
+        self.assertEqual(res.status_code,status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertIn('Retry-After', res)
+
     def test_upload_bad_image(self):
         """Test uploading a bad or invalid image"""
         url = (image_upload_url(self.recipe.id))
@@ -0,0 +1,119 @@
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from ..models import Ingredients, Recipe, Tag
+
+RECIPE_URL = reverse('recipe:recipe-list')
+
+
+def sample_recipe(user, **params):
+    """Create and return a sample recipe"""
+    defaults = {
+        'title': 'sample recipe',
+        'time_minutes': 10,
+        'price': 5.00,
+    }
+    defaults.update(params)
+    return Recipe.objects.create(user=user, **defaults)
+
+
+class RecipeSearchTests(TestCase):
+    """Test the ?q= recipe search"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'search@api.com',
+            '12345'
+        )
+        self.client.force_authenticate(self.user)
+
+    def search(self, q, **params):
+        res = self.client.get(RECIPE_URL, dict(params, q=q))
+        return [item['title'] for item in res.data]
+
+    def test_search_by_title(self):
+        """Test recipes are found by words in their title"""
+        sample_recipe(self.user, title='Chocolate cake')
+        sample_recipe(self.user, title='Fish and chips')
+
+        self.assertEqual(self.search('chocolate'), ['Chocolate cake'])
+
+    def test_search_by_ingredient_name(self):
+        """Test recipes are found by the names of their ingredients"""
+        soup = sample_recipe(self.user, title='Winter soup')
+        sample_recipe(self.user, title='Salad')
+        soup.ingredients.add(
+            Ingredients.objects.create(user=self.user, name='Pumpkin')
+        )
+
+        self.assertEqual(self.search('pumpkin'), ['Winter soup'])
+
+    def test_title_matches_rank_first(self):
+        """Test a title match ranks above an ingredient match"""
+        by_ingredient = sample_recipe(self.user, title='Fruit salad')
+        by_ingredient.ingredients.add(
+            Ingredients.objects.create(user=self.user, name='Banana')
+        )
+        sample_recipe(self.user, title='Banana bread')
+
+        self.assertEqual(
+            self.search('banana'), ['Banana bread', 'Fruit salad']
+        )
+
+    def test_search_with_tag_filter(self):
+        """Test search combines with the existing tag filter"""
+        vegan = Tag.objects.create(user=self.user, name='vegan')
+        tagged = sample_recipe(self.user, title='Vegan curry')
+        tagged.tag.add(vegan)
+        sample_recipe(self.user, title='Chicken curry')
+
+        self.assertEqual(
+            self.search('curry', tag=str(vegan.id)), ['Vegan curry']
+        )
+
+    def test_search_limited_to_user(self):
+        """Test search never returns another user's recipes"""
+        other = get_user_model().objects.create_user('o@api.com', '12345')
+        sample_recipe(other, title='Chocolate cake')
+
+        self.assertEqual(self.search('chocolate'), [])
+
+    def test_search_results_paginate(self):
+        """Test ranked results page without repeats"""
+        for i in range(5):
+            sample_recipe(self.user, title=f'Pie number {i}')
+        sample_recipe(self.user, title='Pie')
+
+        first = self.client.get(RECIPE_URL, {'q': 'pie', 'page_size': 3})
+        next_url = first['Link'].split(';')[0].strip('<>')
+        second = self.client.get(next_url)
+
+        titles = [item['title'] for item in first.data + second.data]
+        self.assertEqual(len(titles), 6)
+        self.assertEqual(len(set(titles)), 6)
+        self.assertEqual(titles[0], 'Pie')
+
+    @skipUnless(connection.vendor == 'postgresql', 'needs PostgreSQL')
+    def test_search_tolerates_typos(self):
+        """Test trigram similarity finds titles with a misspelled query"""
+        sample_recipe(self.user, title='Chocolate')
+
+        self.assertEqual(self.search('chocolat'), ['Chocolate'])
+
+    @skipUnless(connection.vendor == 'postgresql', 'needs PostgreSQL')
+    def test_search_vector_follows_renames(self):
+        """Test renaming an ingredient updates the recipes using it"""
+        recipe = sample_recipe(self.user, title='Soup')
+        ingredient = Ingredients.objects.create(user=self.user, name='Leek')
+        recipe.ingredients.add(ingredient)
+        ingredient.name = 'Parsnip'
+        ingredient.save()
+
+        self.assertEqual(self.search('parsnip'), ['Soup'])
+        self.assertEqual(self.search('leek'), [])
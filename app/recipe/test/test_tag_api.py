@@ -1,6 +1,6 @@
 from django.contrib.auth import get_user_model
 from django.urls import reverse
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from rest_framework import status
 from rest_framework import serializers
 from rest_framework.test import APIClient
@@ -8,6 +8,7 @@ from ..models import Tag, Recipe
 from ..serializers import TagSerializer
 
 TAGS_URL = reverse('recipe:tag-list')
+AUTOCOMPLETE_URL = reverse('recipe:tag-autocomplete')
 
 class PublicTagsApiTests(TestCase):
     """Test the publicly avaliable tags API"""
@@ -121,4 +122,102 @@ class PrivateTagsApiTests(TestCase):
         )
         recipe2.tag.add(tag)
         res = self.client.get(TAGS_URL,{'assigned_only': 1})
-        self.assertEqual(len(res.data),1)
\ No newline at end of file
+        self.assertEqual(len(res.data),1)
+
+    def test_autocomplete_tags_by_prefix(self):
+        """Test autocomplete matches the prefix case insensitively"""
+        Tag.objects.create(user=self.user, name='Breakfast')
+        Tag.objects.create(user=self.user, name='brunch')
+        Tag.objects.create(user=self.user, name='Lunch')
+
+        res = self.client.get(AUTOCOMPLETE_URL, {'prefix': 'BR'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [tag['name'] for tag in res.data], ['Breakfast', 'brunch']
+        )
+
+    def test_autocomplete_limited_to_user(self):
+        """Test autocomplete never returns another user's tags"""
+        user2 = get_user_model().objects.create_user(
+            'other@enail.com',
+            '12345'
+        )
+        Tag.objects.create(user=user2, name='vegan')
+        tag = Tag.objects.create(user=self.user, name='vegetarian')
+
+        res = self.client.get(AUTOCOMPLETE_URL, {'prefix': 'veg'})
+
+        self.assertEqual(res.data, [{'id': tag.id, 'name': tag.name}])
+
+    @override_settings(RECIPE_AUTOCOMPLETE_LIMIT=3)
+    def test_autocomplete_limit(self):
+        """Test autocomplete returns at most the configured matches"""
+        for i in range(5):
+            Tag.objects.create(user=self.user, name=f'tag {i}')
+
+        res = self.client.get(AUTOCOMPLETE_URL, {'prefix': 'tag'})
+        self.assertEqual(len(res.data), 3)
+        res = self.client.get(AUTOCOMPLETE_URL, {'prefix': 'tag', 'limit': 2})
+        self.assertEqual(len(res.data), 2)
+        res = self.client.get(AUTOCOMPLETE_URL, {'prefix': 'tag', 'limit': 50})
+        self.assertEqual(len(res.data), 3)
+
+    def test_autocomplete_escapes_wildcards(self):
+        """Test LIKE wildcards in the prefix are matched literally"""
+        Tag.objects.create(user=self.user, name='100% rye')
+        Tag.objects.create(user=self.user, name='1000 island')
+
+        res = self.client.get(AUTOCOMPLETE_URL, {'prefix': '100%'})
+
+        self.assertEqual([tag['name'] for tag in res.data], ['100% rye'])
+
+    def test_list_tags_with_counts(self):
+        """Test with_counts reports how many recipes use each tag"""
+        tag1 = Tag.objects.create(user=self.user, name='breakfast')
+        tag2 = Tag.objects.create(user=self.user, name='dinner')
+        for title in ('Eggs', 'Toast'):
+            recipe = Recipe.objects.create(
+                user=self.user, title=title, time_minutes=5, price=2.00
+            )
+            recipe.tag.add(tag1)
+
+        res = self.client.get(TAGS_URL, {'with_counts': 1})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, [
+            {'id': tag2.id, 'name': 'dinner', 'recipe_count': 0},
+            {'id': tag1.id, 'name': 'breakfast', 'recipe_count': 2},
+        ])
+
+    def test_flags_accept_words(self):
+        """Test boolean flags accept true/false as well as 1/0"""
+        Tag.objects.create(user=self.user, name='breakfast')
+
+        res = self.client.get(TAGS_URL, {'with_counts': 'true'})
+        self.assertEqual(res.data[0]['recipe_count'], 0)
+        res = self.client.get(TAGS_URL, {'with_counts': 'false'})
+        self.assertNotIn('recipe_count', res.data[0])
+
+    def test_invalid_flag_rejected(self):
+        """Test an unparseable flag is a 400, not a server error"""
+        res = self.client.get(TAGS_URL, {'with_counts': 'maybe'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('with_counts', res.data)
+
+    def test_with_counts_etag_changes_on_recipe_write(self):
+        """Test revalidating counts misses once a recipe uses the tag"""
+        tag = Tag.objects.create(user=self.user, name='breakfast')
+        res = self.client.get(TAGS_URL, {'with_counts': 1})
+        recipe = Recipe.objects.create(
+            user=self.user, title='Eggs', time_minutes=5, price=2.00
+        )
+        recipe.tag.add(tag)
+
+        res = self.client.get(
+            TAGS_URL, {'with_counts': 1}, HTTP_IF_NONE_MATCH=res['ETag']
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data[0]['recipe_count'], 1)
@@ -1,5 +1,6 @@
 from django.urls import path,include
 from rest_framework.routers import DefaultRouter
+from core.asyncviews import async_routes
 from . import views
 
 router = DefaultRouter()
@@ -12,3 +13,8 @@ app_name= 'recipe'
 urlpatterns = [
     path('',include(router.urls))
 ]
+
+# The read-heavy routes, served as async views by app.urls_async
+async_urlpatterns = async_routes(router.urls, {
+    'recipe-list', 'recipe-detail', 'tag-list', 'ingredients-list',
+})
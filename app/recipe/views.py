@@ -1,35 +1,124 @@
-from django.db.models import query
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.http import StreamingHttpResponse
+from django.db.models import Count, Exists, OuterRef, Prefetch
+from django.db.models.functions import Lower
 from rest_framework import viewsets,mixins,status
-from rest_framework.authentication import TokenAuthentication
 from rest_framework.permissions import IsAuthenticated
-from . import serializers
+from core.authentication import CachedTokenAuthentication
+from . import bulk, export, images, serializers, storage
+from .caching import (
+    CachedListMixin, ConditionalListMixin, ConditionalRetrieveMixin,
+    get_version,
+)
 from .models import Tag , Ingredients, Recipe
+from .pagination import KeysetPagination
+from .search import search_recipes
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 
 class BaseRecipeAttrViewset(
+    CachedListMixin,
+    ConditionalListMixin,
     viewsets.GenericViewSet,
     mixins.CreateModelMixin,
     mixins.ListModelMixin):
     """Base viewset for recipe value"""
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
+    pagination_class = KeysetPagination
+    keyset_ordering = ('-name', '-id')
+    query_budgets = {'list': 3, 'autocomplete': 1}
+    FLAG_VALUES = {
+        '1': True, 'true': True, 'yes': True, 'on': True,
+        '0': False, 'false': False, 'no': False, 'off': False, '': False,
+    }
+
+    def _flag(self, name):
+        """Parse the ?name= boolean flag, accepting 1/0, true/false, etc."""
+        value = self.request.query_params.get(name, '0').strip().lower()
+        if value in self.FLAG_VALUES:
+            return self.FLAG_VALUES[value]
+        raise ValidationError({name: ['Expected 1, 0, true or false.']})
+
+    def _recipe_through(self):
+        """Return the recipe M2M through model and its column names"""
+        field = Recipe._meta.get_field(self.recipe_field)
+        return (
+            field.remote_field.through,
+            f'{field.m2m_field_name()}_id',
+            f'{field.m2m_reverse_field_name()}_id',
+        )
 
     def get_queryset(self):
         """return objects for the curent authenticated user only"""
-        assigned_only= bool(
-            int(self.request.query_params.get('assigned_only',0))
-        )
         queryset =self.queryset
-        if assigned_only:
-            queryset = queryset.filter(recipe__isnull =False)
+        if self._flag('assigned_only'):
+            # A semi-join stops at the first recipe, so unlike joining the
+            # through table there are no duplicates to collapse.
+            through, _, target = self._recipe_through()
+            queryset = queryset.filter(Exists(
+                through.objects.filter(**{target: OuterRef('pk')})
+            ))
         return queryset.filter(
             user= self.request.user
-            ).order_by('-name').distinct()
+            ).order_by(*self.keyset_ordering)
 
+    def get_serializer_class(self):
+        if self.action == 'list' and self._flag('with_counts'):
+            return self.count_serializer_class
+        return self.serializer_class
+
+    def get_etag_extra(self):
+        """Depend on the recipe version where recipe writes change the list
+
+        Usage counts, and which names are assigned at all, change when
+        recipes do, which bumps the version but leaves these rows alone.
+        """
+        if self._flag('with_counts') or self._flag('assigned_only'):
+            return (get_version(self.request.user.pk),)
+        return ()
+
+    def paginate_queryset(self, queryset):
+        page = super().paginate_queryset(queryset)
+        if page is not None and self._flag('with_counts'):
+            through, source, target = self._recipe_through()
+            counts = dict(
+                through.objects.filter(**{
+                    f'{target}__in': [obj.pk for obj in page]
+                }).values_list(target).annotate(Count(source))
+                .order_by()
+            )
+            for obj in page:
+                obj.recipe_count = counts.get(obj.pk, 0)
+        return page
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)    
+
+    def _autocomplete_limit(self):
+        """Return the requested number of matches, capped by settings"""
+        limit = settings.RECIPE_AUTOCOMPLETE_LIMIT
+        try:
+            requested = int(self.request.query_params.get('limit', limit))
+        except ValueError:
+            return limit
+        return max(1, min(requested, limit))
+
+    @action(methods=['GET'], detail=False, url_path='autocomplete')
+    def autocomplete(self, request):
+        """Return the first names starting with ?prefix=, ignoring case
+
+        Served by the (user_id, lower(name)) index, see migration 0009.
+        """
+        prefix = request.query_params.get('prefix', '').strip().lower()
+        matches = self.queryset.annotate(
+            lower_name=Lower('name')
+        ).filter(
+            user=request.user, lower_name__startswith=prefix
+        ).order_by('lower_name', 'id').values('id', 'name')
+        return Response(list(matches[:self._autocomplete_limit()]))
        
     
 
@@ -38,6 +127,8 @@ class TagViewSet(BaseRecipeAttrViewset):
     #Everything was summarized Refactor Tags and ingredient
     queryset = Tag.objects.all()
     serializer_class = serializers.TagSerializer
+    count_serializer_class = serializers.TagCountSerializer
+    recipe_field = 'tag'
 
 
 class IngredientsViewSet(BaseRecipeAttrViewset):
@@ -45,14 +136,38 @@ class IngredientsViewSet(BaseRecipeAttrViewset):
 
     queryset = Ingredients.objects.all()
     serializer_class = serializers.IngredientsSerializer
+    count_serializer_class = serializers.IngredientsCountSerializer
+    recipe_field = 'ingredients'
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(
+    CachedListMixin,
+    ConditionalListMixin,
+    ConditionalRetrieveMixin,
+    viewsets.ModelViewSet):
     """Manage recipe in the database"""
 
     serializer_class = serializers.RecipeSerializer
     queryset = Recipe.objects.all()
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
+    pagination_class = KeysetPagination
+    # Upper bound on SQL queries per action, independent of the number of
+    # recipes, tags and ingredients involved. Enforced by the test suite.
+    # Authentication and inline image processing are not counted. A new
+    # content addressed blob costs up to six more than a uuid name: its
+    # locked lookup, its insert and the transaction/savepoints around them.
+    query_budgets = {
+        'list': 4, 'retrieve': 3, 'upload_image': 9, 'bulk_write': 8,
+        'export': 0,
+    }
+
+    @property
+    def keyset_ordering(self):
+        """Order search results by rank, everything else by newest first"""
+        request = getattr(self, 'request', None)
+        if request is not None and request.query_params.get('q'):
+            return ('-search_rank', '-id')
+        return ('-id',)
 
     def _params_to_ints(self,qs):
         """Convert a list to string IDs to a list of integers"""
@@ -62,7 +177,10 @@ class RecipeViewSet(viewsets.ModelViewSet):
         """return objects for the curent authenticated user only"""
         tag = self.request.query_params.get('tag')
         ingredients = self.request.query_params.get('ingredients')
+        q = self.request.query_params.get('q', '').strip()
         queryset = self.queryset
+        if q:
+            queryset = search_recipes(queryset, q)
         if tag:
             tag_ids = self._params_to_ints(tag)
             queryset = queryset.filter(tag__id__in=tag_ids)
@@ -71,7 +189,78 @@ class RecipeViewSet(viewsets.ModelViewSet):
             ingredient_ids = self._params_to_ints(ingredients)
             queryset = queryset.filter(ingredients__id__in=ingredient_ids)
 
-        return queryset.filter(user = self.request.user)
+        if tag or ingredients:
+            queryset = queryset.distinct()
+
+        queryset = queryset.filter(
+            user = self.request.user
+            ).order_by(*self.keyset_ordering)
+        return self._apply_query_plan(queryset)
+
+    def _names_param(self, name, allowed):
+        """Parse a comma separated ?name= list, rejecting unknown entries"""
+        names = [
+            value.strip()
+            for value in self.request.query_params[name].split(',')
+            if value.strip()
+        ]
+        unknown = sorted(set(names) - set(allowed))
+        if unknown:
+            raise ValidationError({name: [
+                f'Unknown field(s): {", ".join(unknown)}. '
+                f'Choose from: {", ".join(allowed)}.'
+            ]})
+        return names
+
+    def _sparse_fieldset(self):
+        """Return the ?fields= and ?expand= of a read, None when not given"""
+        if self.action not in ('list', 'retrieve'):
+            return None, None
+        params = self.request.query_params
+        serializer_class = serializers.RecipeSerializer
+        fields = expand = None
+        if 'fields' in params:
+            fields = self._names_param('fields', serializer_class.Meta.fields)
+        if 'expand' in params:
+            expand = self._names_param(
+                'expand', tuple(serializer_class.expandable)
+            )
+        return fields, expand
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['fields'], context['expand'] = self._sparse_fieldset()
+        return context
+
+    def _apply_query_plan(self, queryset):
+        """Load exactly the columns and relations the action serializes"""
+        if self.action in ('list', 'retrieve'):
+            fields, expand = self._sparse_fieldset()
+            expandable = serializers.RecipeSerializer.expandable
+            if fields is None:
+                fields = serializers.RecipeSerializer.Meta.fields
+            if expand is None:
+                # Details nest their tags and ingredients, lists give ids
+                expand = expandable if self.action == 'retrieve' else ()
+            columns = [name for name in fields if name not in expandable]
+            if self.action == 'retrieve':
+                columns.append('updated_at')
+            queryset = queryset.only('id', *columns)
+            for name in expandable:
+                if name not in fields:
+                    continue
+                model = Recipe._meta.get_field(name).related_model
+                queryset = queryset.prefetch_related(Prefetch(
+                    name, queryset=model.objects.only(
+                        *(('id', 'name') if name in expand else ('id',))
+                    )
+                ))
+            return queryset
+        if self.action == 'upload_image':
+            return queryset.only(
+                'id', 'user', 'image', 'image_status', 'image_renditions'
+            )
+        return queryset
 
     def get_serializer_class(self):
         """Return appropriate serializer class"""
@@ -86,24 +275,78 @@ class RecipeViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(user=self.request.user) 
 
-    @action(methods=['POST'], detail=True, url_path='upload-image')
+    @action(methods=['GET', 'POST'], detail=True, url_path='upload-image')
     def upload_image(self, request, pk=None):
-        """Upload an image to a recipe"""
+        """Upload an image to a recipe, or poll its processing status"""
         recipe= self.get_object()
-        serializer = self.get_serializer(
-            recipe,
-            data = request.data
-        )
+        if request.method == 'GET':
+            serializer = self.get_serializer(recipe)
+            return Response(serializer.data)
 
-        if serializer.is_valid():
-            serializer.save()
+        if storage.content_addressed():
+            request._request.upload_handlers = [
+                storage.HashingFileUploadHandler(request._request)
+            ]
+        upload = request.data.get('image')
+        if not isinstance(upload, UploadedFile):
             return Response(
-                serializer.data,
-                status= status.HTTP_200_OK
+                {'image': ['No file was submitted.']},
+                status= status.HTTP_400_BAD_REQUEST
             )
+
+        images.store_upload(recipe, upload)
+        if images.is_inline():
+            recipe.refresh_from_db()
+        serializer = self.get_serializer(recipe)
         return Response(
-            serializer.errors,
-            status= status.HTTP_400_BAD_REQUEST
-        )    
+            serializer.data,
+            status= status.HTTP_202_ACCEPTED
+        )
 
-    
+    @action(methods=['POST', 'PATCH', 'DELETE'], detail=False,
+            url_path='bulk', url_name='bulk')
+    def bulk_write(self, request):
+        """Create, update or delete a batch of recipes in one transaction"""
+        context = self.get_serializer_context()
+        if request.method == 'DELETE':
+            if not isinstance(request.data, dict):
+                raise ValidationError(
+                    {'detail': 'Expected an object with a list of ids.'}
+                )
+            ids = request.data.get('ids')
+            bulk.check_batch(ids)
+            results, status_code = bulk.bulk_delete(ids, context)
+        elif request.method == 'PATCH':
+            bulk.check_batch(request.data)
+            results, status_code = bulk.bulk_update(request.data, context)
+        else:
+            bulk.check_batch(request.data)
+            results, status_code = bulk.bulk_create(request.data, context)
+
+        return Response({'results': results}, status=status_code)
+
+    @action(methods=['GET'], detail=False, url_path='export')
+    def export(self, request):
+        """Stream every matching recipe as ?type=ndjson (default) or csv
+
+        Rows are read with a server-side cursor while the body streams, so
+        memory stays flat however many recipes the user has. Under ASGI the
+        body is produced on the ORM pool, see core.asyncviews.
+        """
+        kind = request.query_params.get('type', 'ndjson')
+        if kind not in export.FORMATS:
+            raise ValidationError({'type': [
+                f'Choose from: {", ".join(export.FORMATS)}.'
+            ]})
+        queryset = self.get_queryset()
+        # The body is read after the request is done routing, so keep the
+        # database this request would have read from.
+        queryset = queryset.using(queryset.db)
+        response = StreamingHttpResponse(
+            export.export(queryset, kind),
+            content_type=export.CONTENT_TYPES[kind],
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="recipes.{kind}"'
+        )
+        return response
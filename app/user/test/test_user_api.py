@@ -1,4 +1,6 @@
-from django.test import TestCase
+from unittest.mock import Mock, patch
+
+from django.test import TestCase, override_settings
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 
@@ -87,6 +89,47 @@ class PublicUserApiTests(TestCase):
             self.assertNotIn('token',res.data)
             self.assertEqual(res.status_code,status.HTTP_400_BAD_REQUEST)
 
+    def test_create_token_when_hashing_pool_is_full(self):
+        """Test logins are refused with Retry-After when hashing is full"""
+        payload = {'email':'test@email.com', 'password':'test'}
+        create_user(**payload)
+        slots = Mock()
+        slots.acquire.return_value = False
+        with patch('core.hashers._pool', return_value=(None, slots)):
+            res = self.client.post(TOKEN_USER_URL,payload)
+
+        self.assertEqual(res.status_code,status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertIn('Retry-After', res)
+
+    def test_create_user_when_hashing_pool_is_full(self):
+        """Test signups are refused with Retry-After when hashing is full"""
+        payload = {'email':'test@email.com', 'password':'12345',
+                   'name':'etebo'}
+        slots = Mock()
+        slots.acquire.return_value = False
+        with patch('core.hashers._pool', return_value=(None, slots)):
+            res = self.client.post(CREATE_USER_URL,payload)
+        self.assertEqual(res.status_code,status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertIn('Retry-After', res)
+        self.assertFalse(
+            get_user_model().objects.filter(email=payload['email']).exists()
+        )
+
+    def test_create_token_upgrades_password_hash(self):
+        """Test a login rehashes a password made with an old work factor"""
+        payload = {'email':'test@email.com', 'password':'test'}
+        with override_settings(PASSWORD_HASH_ITERATIONS=1000):
+            user = create_user(**payload)
+        self.assertEqual(user.password.split('$')[1], '1000')
+
+        with override_settings(PASSWORD_HASH_ITERATIONS=2000):
+            res = self.client.post(TOKEN_USER_URL,payload)
+
+        self.assertEqual(res.status_code,status.HTTP_200_OK)
+        user.refresh_from_db()
+        self.assertEqual(user.password.split('$')[1], '2000')
+        self.assertTrue(user.check_password(payload['password']))
+
     def test_retrieve_user_unauthorized(self):
         """Test that authentication is required for users"""
         res = self.client.get(ME_URL)
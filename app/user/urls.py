@@ -1,4 +1,5 @@
 from django.urls import path
+from core.asyncviews import async_routes
 from . import views
 
 
@@ -8,4 +9,7 @@ urlpatterns=[
     path('create/',views.CreateUserView.as_view(), name='create',),
     path('token/',views.CreateAuthToken.as_view(), name='token',),
     path('me/',views.ManageUserView.as_view(), name='me',),
-]
\ No newline at end of file
+]
+
+# The read-heavy routes, served as async views by app.urls_async
+async_urlpatterns = async_routes(urlpatterns, {'me'})